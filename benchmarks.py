@@ -0,0 +1,809 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module contains benchmarks for the Visual Course Map. Each benchmark prints a short report and returns
+the measured times (in seconds) so the results can also be compared programmatically.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Optional
+import bs4
+import openpyxl
+import pandas
+import plotly.graph_objects as go
+from calendar_fixtures import fixture_path, write_fixture_pages
+from course_store import store_graph
+from data_cleaning import check_existence, clean_string, create_clean_data_file, fix_spacing
+from expression_tree_classes import Expr, _Course, Tree, combine_lists
+from file_reader import load_excel_graph, load_graph, parse_requisites
+from graph_course import Graph, Planner
+from graph_snapshot import read_snapshot, snapshot_path, write_snapshot
+from plot_class import DagPlot, Plot
+from plotly_visualization import build_figure
+from query_cache import QueryCache
+from row_writer import FORMATS, open_writer
+from webscraper import COLUMNS, HTML_BACKENDS, course_code_identifier, course_collector, parse_page
+
+
+def count_pathways(expr: Expr, counts: dict[Expr, int]) -> int:
+    """Return the number of sets expr.evaluate() would produce, without building any of them.
+    Prerequisite cycles are cut the same way as in a memoized evaluate.
+    """
+    if isinstance(expr, _Course):
+        if expr not in counts:
+            counts[expr] = 1
+            counts[expr] = max(count_pathways(expr.prerequisites, counts), 1)
+        return counts[expr]
+    elif expr.code == 'and':
+        count_so_far = 0
+        for operand in expr.operand:
+            count = count_pathways(operand, counts)
+            count_so_far = count if count_so_far == 0 else count_so_far * max(count, 1)
+        return count_so_far
+    else:
+        return sum(count_pathways(operand, counts) for operand in expr.operand)
+
+
+def legacy_evaluate(expr: Expr) -> list:
+    """Evaluate expr the way BoolOp.evaluate did before the memoized pathway engine: every operand of a BoolOp
+    is evaluated once for its type check and again for its value, and shared courses are always re-expanded.
+    """
+    if isinstance(expr, _Course):
+        return combine_lists([{expr.code}], legacy_evaluate(expr.prerequisites))
+    new_list = []
+    for operand in expr.operand:
+        if expr.code == 'and':
+            new_list = combine_lists(new_list, [legacy_evaluate(operand)]) \
+                if isinstance(legacy_evaluate(operand), set) else combine_lists(new_list, legacy_evaluate(operand))
+        else:
+            new_list = new_list + legacy_evaluate(operand) \
+                if isinstance(legacy_evaluate(operand), list) else new_list + [legacy_evaluate(operand)]
+    return new_list
+
+
+def benchmark_evaluate(excel_file: str, max_pathways: int = 20000) -> dict[str, float]:
+    """Compare the plain recursive evaluation of every course's prerequisites (and the legacy one) against the
+    memoized pathway engine, and time the memoized engine alone on the courses the plain recursion cannot finish.
+
+    The plain recursion cannot finish on a course that is part of a prerequisite cycle, or whose full expansion
+    has more than max_pathways pathways, so only the memoized engine is timed on those: evaluate(memo) on the
+    courses in a cycle, and evaluate_bits, which keeps only the minimal pathways (as Graph does), on the courses
+    with more pathways, since there are too many of them to list as sets.
+    """
+    graph = load_graph(excel_file)
+    courses = [graph._courses[code] for code in sorted(graph._courses)]
+
+    counts = {}
+    heavy = [course for course in courses if count_pathways(course.prerequisites, counts) > max_pathways]
+    plain, cyclic = [], []
+    for course in courses:
+        if count_pathways(course.prerequisites, counts) <= max_pathways:
+            try:
+                course.prerequisites.evaluate()
+                plain.append(course)
+            except RecursionError:
+                cyclic.append(course)
+
+    start = time.perf_counter()
+    for course in plain:
+        legacy_evaluate(course.prerequisites)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for course in plain:
+        course.prerequisites.evaluate()
+    plain_time = time.perf_counter() - start
+
+    memo = {}
+    start = time.perf_counter()
+    for course in plain:
+        course.prerequisites.evaluate(memo)
+    memo_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for course in cyclic:
+        course.prerequisites.evaluate(memo)
+    cyclic_time = time.perf_counter() - start
+
+    bits_memo = {}
+    start = time.perf_counter()
+    for course in heavy:
+        course.prerequisites.evaluate_bits(graph._ids, bits_memo)
+    heavy_time = time.perf_counter() - start
+
+    print(f'evaluate: {len(plain)} of {len(courses)} courses, plain {plain_time:.3f}s, memoized {memo_time:.3f}s '
+          f'({plain_time / memo_time:.2f}x), legacy {legacy_time:.3f}s; memoized only: {len(cyclic)} courses in '
+          f'a cycle {cyclic_time:.3f}s, {len(heavy)} courses over {max_pathways} pathways {heavy_time:.3f}s (bitsets)')
+    return {'legacy': legacy_time, 'plain': plain_time, 'memoized': memo_time, 'cyclic': cyclic_time,
+            'heavy': heavy_time}
+
+
+def legacy_minimal_sets(pathways: list[set]) -> list[set]:
+    """Remove every pathway that is a proper superset of another pathway, the way Graph.get_all_prerequisites did
+    before pathways were stored as bitsets.
+    """
+    for pathway in pathways.copy():
+        if any(other.issubset(pathway) and other != pathway for other in pathways.copy()):
+            pathways.remove(pathway)
+    return pathways
+
+
+def benchmark_pathways(excel_file: str, level: str = '4', max_pathways: int = 20000) -> dict[str, float]:
+    """Compare the minimal pathways of every course at the given level computed with sets of course codes
+    against the same computation with bitsets.
+
+    Courses whose full expansion has more than max_pathways pathways are skipped, since the set-based
+    computation cannot finish on them.
+    """
+    graph = load_graph(excel_file)
+    counts = {}
+    courses = [graph._courses[code] for code in sorted(graph._courses) if code[3] == level and
+               count_pathways(graph._courses[code].prerequisites, counts) <= max_pathways]
+
+    memo = {}
+    start = time.perf_counter()
+    for course in courses:
+        legacy_minimal_sets(list(course.prerequisites.evaluate(memo)))
+    set_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for course in courses:
+        graph.get_all_prerequisites(course.code)
+    bits_time = time.perf_counter() - start
+
+    print(f'pathways: {len(courses)} level {level}00 courses, '
+          f'sets {set_time:.3f}s, bitsets {bits_time:.3f}s ({set_time / bits_time:.1f}x)')
+    return {'sets': set_time, 'bitsets': bits_time}
+
+
+def benchmark_load(excel_file: str) -> dict[str, float]:
+    """Compare loading the graph from excel_file against loading it from its snapshot, and report the time
+    spent in each phase of loading the Excel file.
+    """
+    timings = {}
+    start = time.perf_counter()
+    graph = load_excel_graph(excel_file, timings)
+    excel_time = time.perf_counter() - start
+
+    write_snapshot(graph, snapshot_path(excel_file), excel_file)
+    start = time.perf_counter()
+    read_snapshot(snapshot_path(excel_file), excel_file)
+    snapshot_time = time.perf_counter() - start
+
+    phases = ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in timings.items())
+    print(f'load: excel {excel_time:.3f}s ({phases}), snapshot {snapshot_time:.3f}s '
+          f'({excel_time / snapshot_time:.1f}x)')
+    return {'excel': excel_time, 'snapshot': snapshot_time} | timings
+
+
+def legacy_parse_requisites(s: str) -> list[list]:
+    """Parse a string of requisites the way file_reader.parse_requisites did before it became a recursive descent
+    parser: by building the string a character at a time and rewriting the token list in place.
+    """
+    lst, curr_str = [], ''
+    for char in s:
+        if char in [',', '/', '(', ')']:
+            if curr_str != '':
+                lst.append(curr_str)
+                curr_str = ''
+            lst.append(char)
+        else:
+            curr_str += char
+    if curr_str != '':
+        lst.append(curr_str)
+    if not lst:
+        return []
+
+    while ')' in lst:
+        open_bracket_index = lst.index(')')
+        while lst[open_bracket_index] != '(':
+            open_bracket_index -= 1
+        _legacy_parse_brackets(lst, open_bracket_index)
+
+    lst[0] = [lst[0]]
+    i = 1
+    while i < len(lst):
+        if lst.pop(i) == '/':
+            lst[i - 1].append(lst.pop(i))
+        else:
+            lst[i] = [lst[i]]
+            i += 1
+    return lst
+
+
+def _legacy_parse_brackets(lst: list, i: int) -> None:
+    """Replace the innermost bracketed requirements starting at lst[i] with a tuple (see legacy_parse_requisites).
+    """
+    lst.pop(i)
+    lst[i] = [lst[i]]
+    i += 1
+    while lst[i] != ')':
+        if lst.pop(i) == '/':
+            if not isinstance(lst[i - 1][-1], list):
+                lst[i - 1][-1] = [lst[i - 1][-1]]
+            lst[i - 1][-1].append(lst.pop(i))
+        else:
+            lst[i - 1].append(lst.pop(i))
+    lst.pop(i)
+    lst[i - 1] = tuple(lst[i - 1])
+
+
+def benchmark_parse(excel_file: str, repeat: int = 10) -> dict[str, float]:
+    """Compare the throughput of the legacy and current requisite parsers on every prerequisite and exclusion
+    cell in excel_file, each parsed repeat times.
+    """
+    dataframe = pandas.read_excel(excel_file, usecols=['Prerequisites', 'Exclusion'])
+    cells = [cell for column in ('Prerequisites', 'Exclusion') for cell in dataframe[column] if isinstance(cell, str)]
+
+    times = {}
+    for name, parser in (('legacy', legacy_parse_requisites), ('current', parse_requisites)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for cell in cells:
+                parser(cell)
+        times[name] = time.perf_counter() - start
+
+    # a single long requisite string shows how each parser scales with the number of tokens
+    long_cell = ','.join(f'(MAT{i % 1000:03d}H1/STA{i % 1000:03d}H1,CSC{i % 1000:03d}H1)' for i in range(2000))
+    for name, parser in (('legacy long', legacy_parse_requisites), ('current long', parse_requisites)):
+        start = time.perf_counter()
+        parser(long_cell)
+        times[name] = time.perf_counter() - start
+
+    num_cells = len(cells) * repeat
+    print(f'parse: {len(cells)} cells, legacy {num_cells / times["legacy"]:.0f} cells/s, '
+          f'current {num_cells / times["current"]:.0f} cells/s ({times["legacy"] / times["current"]:.1f}x); '
+          f'{len(long_cell)} character string, legacy {times["legacy long"]:.3f}s, '
+          f'current {times["current long"]:.3f}s')
+    return times
+
+
+def scan_eligible_courses(graph: Graph, completed: set[str]) -> set[str]:
+    """Return the same courses as Graph.eligible_courses by checking the prerequisites of every course."""
+    blocked = {ex.code for code in completed for ex in graph._courses[code].exclusions}
+    return {code for code, course in graph._courses.items()
+            if code not in completed and code not in blocked and course.prerequisites.is_satisfied(completed)}
+
+
+def benchmark_planner(excel_file: str, num_students: int = 1000, num_semesters: int = 8,
+                      courses_per_semester: int = 5) -> dict[str, float]:
+    """Compare simulated students stepping through their semesters with a Planner against finding the eligible
+    courses by scanning every course each semester.
+
+    Each semester, every student completes courses_per_semester courses chosen at random from the courses they are
+    eligible for, with the same choices made in both simulations.
+    """
+    graph = load_graph(excel_file)
+    times = {}
+    for name in ('scan', 'planner'):
+        rng = random.Random(111)
+        start = time.perf_counter()
+        for _ in range(num_students):
+            planner = Planner(graph, set())
+            for _ in range(num_semesters):
+                if name == 'scan':
+                    eligible = scan_eligible_courses(graph, planner.completed)
+                else:
+                    eligible = planner.eligible_courses()
+                for code in rng.sample(sorted(eligible), min(courses_per_semester, len(eligible))):
+                    planner.mark_completed(code)
+        times[name] = time.perf_counter() - start
+
+    print(f'planner: {num_students} students, {num_semesters} semesters, scan {times["scan"]:.3f}s, '
+          f'planner {times["planner"]:.3f}s ({times["scan"] / times["planner"]:.1f}x)')
+    return times
+
+
+def benchmark_batch(excel_file: str, course_code: str = 'STA302H1', num_students: int = 200) -> dict[str, float]:
+    """Compare answering get_prerequisites for a cohort of students one at a time against answering it with a
+    single call to get_prerequisites_batch.
+
+    Every student has completed five courses chosen at random and excludes nothing.
+    """
+    graph = load_graph(excel_file)
+    rng = random.Random(111)
+    codes = sorted(graph._courses)
+    queries = [(set(rng.sample(codes, 5)), set(), 20.0) for _ in range(num_students)]
+    # numpy is imported by the first batch, so it is imported before timing
+    graph.get_prerequisites_batch(course_code, queries[:1])
+
+    start = time.perf_counter()
+    for completed, exclude, credit in queries:
+        graph.get_prerequisites(course_code, completed, exclude, credit)
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.get_prerequisites_batch(course_code, queries)
+    batch_time = time.perf_counter() - start
+
+    print(f'batch: {num_students} students for {course_code}, one at a time {single_time:.3f}s, '
+          f'batched {batch_time:.3f}s ({single_time / batch_time:.1f}x)')
+    return {'single': single_time, 'batch': batch_time}
+
+
+def benchmark_query_cache(excel_file: str, num_queries: int = 300,
+                          course_codes: tuple[str, ...] = ('CSC263H1', 'MAT237Y1', 'STA257H1')) -> dict[str, float]:
+    """Compare answering a stream of num_queries get_prerequisites queries about a few popular courses without a
+    query cache, with the default in-memory cache, and from a warm on-disk cache in a freshly loaded graph (as
+    after a restart). Each query is one of 30 distinct queries, chosen at random.
+    """
+    rng = random.Random(111)
+    graph = load_graph(excel_file)
+    codes = sorted(graph._courses)
+    distinct = [(rng.choice(course_codes), frozenset(rng.sample(codes, 3)), frozenset(), 20.0) for _ in range(30)]
+    queries = [rng.choice(distinct) for _ in range(num_queries)]
+
+    times = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, cache in (('no cache', None), ('memory', QueryCache()),
+                            ('disk', QueryCache(path=os.path.join(directory, 'queries.db')))):
+            graph.set_query_cache(cache)
+            start = time.perf_counter()
+            for course_code, completed, exclude, credit in queries:
+                graph.get_prerequisites(course_code, set(completed), set(exclude), credit)
+            times[name] = time.perf_counter() - start
+
+        restarted = load_graph(excel_file)
+        restarted.set_query_cache(cache)
+        start = time.perf_counter()
+        for course_code, completed, exclude, credit in queries:
+            restarted.get_prerequisites(course_code, set(completed), set(exclude), credit)
+        times['warm disk'] = time.perf_counter() - start
+        stats = cache.stats()
+        cache.close()
+
+    print(f'query cache: {num_queries} queries ({len(set(queries))} distinct), ' + ', '.join(
+        f'{name} {times[name]:.3f}s' for name in times) + f' ({stats["disk_hits"]} answered from disk)')
+    return times
+
+
+def legacy_mutual_exclusion_filter(graph: Graph, pathways: list[int]) -> list[int]:
+    """Return the pathway bitsets without a pair of mutual exclusions, checked the way Graph._pathway_bits used
+    to: with are_exclusions on every pair of courses in each pathway."""
+    return [bits for bits in pathways if not any(
+        graph._courses[pre].are_exclusions(graph._courses[exclusion]) for pre in graph._bits_to_set(bits)
+        for exclusion in graph._bits_to_set(bits))]
+
+
+def benchmark_exclusions(excel_file: str,
+                         course_codes: tuple[str, ...] = ('ECO475H1', 'STA302H1', 'CSC263H1', 'MAT237Y1', 'CSC373H1')
+                         ) -> dict[str, float]:
+    """Compare filtering out the pathways of the given courses that contain a pair of mutual exclusions with
+    are_exclusions on every pair of courses against the exclusion index (see Graph._has_mutual_exclusion). The
+    pathways are found before timing, so only the filtering is timed.
+    """
+    graph = load_graph(excel_file)
+    pathways = [graph._courses[code].prerequisites.evaluate_bits(graph._ids, graph._memo) for code in course_codes]
+    graph._get_exclusion_index()
+
+    start = time.perf_counter()
+    legacy = [legacy_mutual_exclusion_filter(graph, course_pathways) for course_pathways in pathways]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [[bits for bits in course_pathways if not graph._has_mutual_exclusion(bits)]
+               for course_pathways in pathways]
+    index_time = time.perf_counter() - start
+
+    assert legacy == indexed
+    print(f'exclusions: {sum(len(course_pathways) for course_pathways in pathways)} pathways of '
+          f'{len(course_codes)} courses ({sum(len(course_pathways) for course_pathways in indexed)} without a mutual '
+          f'exclusion, {bin(graph._get_exclusion_index()[2]).count("1")} courses in a mutual pair), '
+          f'pairwise {legacy_time:.3f}s, index {index_time:.4f}s')
+    return {'pairwise': legacy_time, 'index': index_time}
+
+
+def benchmark_cheapest(excel_file: str, num_courses: int = 8) -> dict[str, float]:
+    """Compare finding the cheapest pathway of the num_courses courses with the most pathways by sorting all of
+    their pathways (get_prerequisites), with a best-first search over their pathways (iter_prerequisites with k=1)
+    and with Graph.get_cheapest_prerequisites, on a graph without a query cache. A course whose pathways all
+    contain a pair of mutual exclusions has no cheapest pathway, which all three report as None.
+    """
+    graph = load_graph(excel_file)
+    graph.set_query_cache(None)
+    counts = {}
+    course_codes = sorted(graph._courses, key=lambda code: -count_pathways(graph._courses[code].prerequisites,
+                                                                           counts))[:num_courses]
+
+    start = time.perf_counter()
+    sorted_credits = [next(iter(graph.get_prerequisites(code, set(), set(), 100.0)), (None,))[0]
+                      for code in course_codes]
+    sorted_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    best_first = [next(graph.iter_prerequisites(code, set(), set(), 100.0, k=1), (None,))[0] for code in course_codes]
+    best_first_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solver = [(graph.get_cheapest_prerequisites([code], set(), set()) or (None,))[0] for code in course_codes]
+    solver_time = time.perf_counter() - start
+
+    assert sorted_credits == best_first == solver
+    most = count_pathways(graph._courses[course_codes[0]].prerequisites, counts)
+    print(f'cheapest: {len(course_codes)} courses with up to {most:.1e} pathways, all pathways '
+          f'{sorted_time:.3f}s, best-first {best_first_time:.3f}s, solver {solver_time * 1000:.1f}ms '
+          f'({sorted_time / solver_time:.0f}x)')
+    return {'sorted': sorted_time, 'best_first': best_first_time, 'solver': solver_time}
+
+
+def _time_queries(graph: Graph, course_codes: list[str]) -> dict[str, float]:
+    """Return the seconds taken to evaluate the prerequisites of every course in course_codes of graph without and
+    with a memo, and to answer get_prerequisites for each of them without a query cache."""
+    courses = [graph._courses[code] for code in course_codes]
+    times = {}
+
+    start = time.perf_counter()
+    for course in courses:
+        course.prerequisites.evaluate()
+    times['plain'] = time.perf_counter() - start
+
+    memo = {}
+    start = time.perf_counter()
+    for course in courses:
+        course.prerequisites.evaluate(memo)
+    times['memoized'] = time.perf_counter() - start
+
+    graph.set_query_cache(None)
+    start = time.perf_counter()
+    for code in course_codes:
+        graph.get_prerequisites(code, set(), set(), 100.0)
+    times['query'] = time.perf_counter() - start
+    return times
+
+
+def benchmark_normalize(excel_file: str, max_pathways: int = 20000) -> dict[str, float]:
+    """Compare the prerequisites of every course as they are read from excel_file with the same prerequisites after
+    Graph.normalize_prerequisites: the number of nodes, and the time taken to evaluate them and to answer a
+    get_prerequisites query on them (on the courses benchmark_evaluate times, for which the answers must be the same).
+    """
+    raw = load_excel_graph(excel_file)
+    normalized = load_excel_graph(excel_file)
+    start = time.perf_counter()
+    stats = normalized.normalize_prerequisites()
+    normalize_time = time.perf_counter() - start
+
+    counts = {}
+    course_codes = []
+    for code in sorted(raw._courses):
+        if count_pathways(raw._courses[code].prerequisites, counts) <= max_pathways:
+            try:
+                raw._courses[code].prerequisites.evaluate()
+                course_codes.append(code)
+            except RecursionError:
+                continue
+
+    raw_times = _time_queries(raw, course_codes)
+    normalized_times = _time_queries(normalized, course_codes)
+    assert all(sorted(raw._pathway_bits(code)) == sorted(normalized._pathway_bits(code)) for code in course_codes)
+
+    print(f'normalize: {stats["nodes_before"]} -> {stats["nodes_after"]} nodes, {stats["boolops_before"]} -> '
+          f'{stats["boolops_after"]} BoolOps in {normalize_time:.3f}s; {len(course_codes)} courses, ' + ', '.join(
+              f'{name} {raw_times[name]:.3f}s -> {normalized_times[name]:.3f}s '
+              f'({raw_times[name] / normalized_times[name]:.2f}x)' for name in raw_times))
+    return {'normalize': normalize_time} | {f'raw_{name}': raw_times[name] for name in raw_times} \
+        | {f'normalized_{name}': normalized_times[name] for name in normalized_times}
+
+
+def synthetic_tree(num_nodes: int, max_children: int = 4, seed: int = 111) -> Tree:
+    """Return a random tree with num_nodes nodes, where every node has at most max_children children.
+    Each new node is attached to a node chosen at random among those that can still take a child.
+    """
+    rng = random.Random(seed)
+    root = Tree(0, [])
+    open_nodes = [root]
+    for item in range(1, num_nodes):
+        i = rng.randrange(len(open_nodes))
+        parent = open_nodes[i]
+        child = Tree(item, [])
+        parent._subtrees.append(child)
+        open_nodes.append(child)
+        if len(parent._subtrees) == max_children:
+            open_nodes[i] = open_nodes[-1]
+            open_nodes.pop()
+    return root
+
+
+def benchmark_layout(sizes: tuple[int, ...] = (160, 10000, 50000, 100000)) -> dict[str, float]:
+    """Time the classic and tidy layouts of Plot on synthetic trees of the given sizes."""
+    times = {}
+    for size in sizes:
+        tree = synthetic_tree(size)
+        for layout in ('classic', 'tidy'):
+            start = time.perf_counter()
+            Plot(tree, layout)
+            times[f'{layout} {size}'] = time.perf_counter() - start
+
+    print('layout: ' + ', '.join(f'{name} nodes {seconds:.3f}s' for name, seconds in times.items()))
+    return times
+
+
+def benchmark_dag(excel_file: str, level: str = '4') -> dict[str, float]:
+    """Compare laying out every course at the given level as a tree with the tidy layout against laying it out
+    as a DagPlot, along with the total number of nodes in each. Courses in a prerequisite cycle cannot be made
+    into a tree, so they are only laid out as a DagPlot.
+    """
+    graph = load_graph(excel_file)
+    courses = [code for code in sorted(graph._courses) if code[3] == level]
+    times, nodes = {'tree': 0.0, 'dag': 0.0}, {'tree': 0, 'dag': 0}
+    num_cycles = 0
+    for code in courses:
+        start = time.perf_counter()
+        try:
+            nodes['tree'] += len(Plot(graph.course_to_tree(code)).to_dict())
+        except RecursionError:
+            num_cycles += 1
+        times['tree'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        nodes['dag'] += len(DagPlot(graph.get_course(code)).to_dict())
+        times['dag'] += time.perf_counter() - start
+
+    print(f'dag: {len(courses)} level {level}00 courses ({num_cycles} in a cycle), '
+          f'tree {nodes["tree"]} nodes {times["tree"]:.3f}s, dag {nodes["dag"]} nodes {times["dag"]:.3f}s')
+    return times
+
+
+def legacy_build_figure(p: Plot) -> go.Figure:
+    """Return the figure of p the way display_plot built it before all of the edges were put in one trace: a node
+    trace, then one trace for every edge with its own markers and text.
+    """
+    nodes = p.to_dict()
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=[nodes[node][0] for node in nodes], y=[nodes[node][1] for node in nodes],
+                             mode='markers+text', textfont={'family': "arial", 'size': 8, 'color': "white"},
+                             marker={'symbol': 'circle', 'size': 40}, text=[node.get_root() for node in nodes],
+                             showlegend=False))
+    for edge in p.get_edges():
+        fig.add_trace(go.Scatter(x=[nodes[e][0] for e in edge], y=[nodes[e][1] for e in edge],
+                                 mode='lines+markers+text', textfont={'family': "arial", 'size': 8, 'color': "white"},
+                                 marker={'symbol': 'circle', 'size': 40, 'color': '#00A2FF'},
+                                 text=[edge[0].get_root(), edge[1].get_root()], showlegend=False))
+    fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
+    fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
+    return fig
+
+
+def benchmark_figure(excel_file: str, num_courses: int = 5) -> dict[str, float]:
+    """Compare building the figure of the num_courses largest course trees (with the tidy layout) one trace per
+    edge against building it with one edge trace and one node trace, with and without WebGL. Reports the total
+    build time and the total size of the figures serialized to JSON.
+    """
+    graph = load_graph(excel_file)
+    plots = []
+    for code in graph._courses:
+        try:
+            plots.append(Plot(graph.course_to_tree(code)))
+        except RecursionError:
+            continue
+    plots = sorted(plots, key=lambda p: len(p.to_dict()), reverse=True)[:num_courses]
+
+    times, sizes = {}, {}
+    builders = (('per edge', legacy_build_figure), ('batched', build_figure),
+                ('webgl', lambda p: build_figure(p, webgl=True)))
+    for name, builder in builders:
+        start = time.perf_counter()
+        figures = [builder(p) for p in plots]
+        times[name] = time.perf_counter() - start
+        sizes[name] = sum(len(figure.to_json()) for figure in figures)
+
+    print(f'figure: {num_courses} largest trees ({sum(len(p.to_dict()) for p in plots)} nodes), ' + ', '.join(
+        f'{name} {times[name]:.3f}s {sizes[name] / 1000:.0f} kB' for name in times))
+    return times
+
+
+def legacy_append_rows(rows: list[dict[str, Any]]) -> pandas.DataFrame:
+    """Return a DataFrame of rows, built the way the web scraper used to build it: one .loc append per course."""
+    dataframe = pandas.DataFrame(columns=COLUMNS)
+    for row in rows:
+        dataframe.loc[len(dataframe.index)] = [row[column] for column in COLUMNS]
+    return dataframe
+
+
+def benchmark_row_writer(raw_file: str = 'output.xlsx') -> dict[str, float]:
+    """Compare appending the scraped courses in raw_file to a DataFrame one .loc append at a time and then writing
+    it to an Excel file, against writing them with each streaming row writer (see row_writer). Reports the time
+    spent appending rows and the total time including finishing the file. Parquet is skipped if pyarrow is not
+    installed.
+    """
+    rows = pandas.read_excel(raw_file, dtype=str).fillna('').to_dict('records')
+    times = {}
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        dataframe = legacy_append_rows(rows)
+        times['loc append'] = time.perf_counter() - start
+        dataframe.to_excel(os.path.join(directory, 'legacy.xlsx'), index=False)
+        times['loc append total'] = time.perf_counter() - start
+
+        for fmt in FORMATS:
+            start = time.perf_counter()
+            try:
+                writer = open_writer(os.path.join(directory, 'output.' + fmt), COLUMNS)
+            except ImportError:
+                continue
+            writer.write_rows(rows)
+            times[fmt] = time.perf_counter() - start
+            writer.close()
+            times[fmt + ' total'] = time.perf_counter() - start
+
+    print(f'row writer: {len(rows)} courses, ' + ', '.join(
+        f'{name} {times[name]:.3f}s (total {times[name + " total"]:.3f}s)' for name in times if 'total' not in name))
+    return times
+
+
+def legacy_parse_page(content: bytes) -> list[dict[str, Any]]:
+    """Return the courses on a calendar page the way the web scraper used to find them: with html.parser, searching
+    each course element once per field with the *_finder functions (see webscraper.course_collector)."""
+    courses = []
+    for element in bs4.BeautifulSoup(content, "html.parser").find_all("div", class_="views-row"):
+        collector = dict.fromkeys(COLUMNS, "")
+        course_collector(element, collector)
+        if collector["Course Name"] != "" and course_code_identifier(collector["Course Name"]):
+            courses.append(collector)
+    return courses
+
+
+def benchmark_scrape_parse(raw_file: str = 'output.xlsx') -> dict[str, float]:
+    """Compare the throughput of parsing calendar pages with the *_finder functions against the single pass
+    extractor with each HTML backend (see webscraper.parse_page), on fixture pages built from the scraped courses
+    in raw_file (see calendar_fixtures). Backends whose parser is not installed are skipped.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        num_pages = write_fixture_pages(raw_file, directory)
+        pages = []
+        for page in range(num_pages):
+            with open(fixture_path(directory, page), 'rb') as file:
+                pages.append(file.read())
+
+    parsers = [('finders', legacy_parse_page)]
+    for backend in HTML_BACKENDS:
+        try:
+            HTML_BACKENDS[backend]()
+        except ImportError:
+            continue
+        parsers.append((backend, lambda content, name=backend: parse_page(content, name)))
+
+    times = {}
+    for name, parser in parsers:
+        start = time.perf_counter()
+        num_courses = sum(len(parser(content)) for content in pages)
+        times[name] = time.perf_counter() - start
+
+    print(f'scrape parse: {num_pages} pages ({num_courses} courses), ' + ', '.join(
+        f'{name} {num_pages / times[name]:.1f} pages/s' for name in times))
+    return times
+
+
+def legacy_create_clean_data_file(filename: str, output_file: str) -> None:
+    """Write the clean data of filename to output_file the way data_cleaning used to: iterating over the rows
+    twice, looking courses up in a list, running clean_string three times on every cell, and building the whole
+    workbook in memory before saving it."""
+    new_excel_file = openpyxl.Workbook()
+    new_sheet = new_excel_file.active
+    df = pandas.read_excel(filename)
+    header = list(df.columns)
+    new_sheet.append(header)
+
+    courses = []
+    for _, row in df.iterrows():
+        courses.append(row[header[0]])
+
+    for _, row in df.iterrows():
+        cells = []
+        for column in header:
+            cell = row[column]
+            if column in ('Prerequisites', 'Corequisites', 'Exclusion'):
+                if isinstance(cell, str):
+                    cell = check_existence(courses, fix_spacing(cell, '/').replace(' ', ''))
+                    cell = clean_string(clean_string(clean_string(cell)))
+                else:
+                    cell = ''
+            cells.append(cell)
+        new_sheet.append(cells)
+
+    new_excel_file.save(output_file)
+
+
+def benchmark_cleaning(raw_file: str = 'output.xlsx', workers: Optional[int] = None) -> dict[str, float]:
+    """Compare writing the clean data of the scraped courses in raw_file with the legacy cleaning against
+    data_cleaning.create_clean_data_file, in this process and with a pool of the given number of worker processes
+    (the number of CPUs if workers is None). Also reports whether the clean data they write is the same.
+    """
+    times = {}
+    with tempfile.TemporaryDirectory() as directory:
+        outputs = {}
+        cleaners = (('legacy', lambda output: legacy_create_clean_data_file(raw_file, output)),
+                    ('one process', lambda output: create_clean_data_file(raw_file, output, workers=1)),
+                    ('process pool', lambda output: create_clean_data_file(raw_file, output, workers=workers)))
+        for name, cleaner in cleaners:
+            outputs[name] = os.path.join(directory, name.replace(' ', '_') + '.xlsx')
+            start = time.perf_counter()
+            cleaner(outputs[name])
+            times[name] = time.perf_counter() - start
+
+        legacy = pandas.read_excel(outputs['legacy'])
+        same = all(legacy.equals(pandas.read_excel(outputs[name])) for name in outputs)
+
+    print(f'cleaning: {len(legacy)} courses, ' + ', '.join(f'{name} {times[name]:.3f}s' for name in times)
+          + (', same output' if same else ', DIFFERENT output'))
+    return times
+
+
+def benchmark_memory(excel_file: str) -> dict[str, float]:
+    """Compare the memory taken up by the courses of excel_file as a Graph of course and BoolOp objects against
+    a CourseStore of flat arrays, measured with tracemalloc as the memory still allocated after building each.
+    Reports (and returns) the number of bytes per course.
+    """
+    store = store_graph(load_graph(excel_file))
+    sizes = {}
+
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    graph = store.to_graph()
+    sizes['graph'] = (tracemalloc.get_traced_memory()[0] - start) / len(store)
+
+    start = tracemalloc.get_traced_memory()[0]
+    compact = store_graph(graph)
+    sizes['course store'] = (tracemalloc.get_traced_memory()[0] - start) / len(compact)
+    tracemalloc.stop()
+
+    print(f'memory: {len(store)} courses, ' + ', '.join(f'{name} {sizes[name]:.0f} bytes/course' for name in sizes)
+          + f' ({sizes["graph"] / sizes["course store"]:.1f}x)')
+    return sizes
+
+
+def run_all(excel_file: str = 'clean_data_v4.xlsx', raw_file: str = 'output.xlsx') -> None:
+    """Run every benchmark in this module on excel_file, or on raw_file for the benchmarks of the web scraper."""
+    benchmark_evaluate(excel_file)
+    benchmark_pathways(excel_file)
+    benchmark_load(excel_file)
+    benchmark_memory(excel_file)
+    benchmark_parse(excel_file)
+    benchmark_planner(excel_file)
+    benchmark_batch(excel_file)
+    benchmark_query_cache(excel_file)
+    benchmark_exclusions(excel_file)
+    benchmark_normalize(excel_file)
+    benchmark_cheapest(excel_file)
+    benchmark_layout()
+    benchmark_dag(excel_file)
+    benchmark_figure(excel_file)
+    benchmark_row_writer(raw_file)
+    benchmark_scrape_parse(raw_file)
+    benchmark_cleaning(raw_file)
+
+
+if __name__ == '__main__':
+    run_all()
+
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'random', 'time', 'Expr', '_Course', 'Tree', 'combine_lists', 'Graph',
+                          'Planner', 'Plot', 'DagPlot', 'expression_tree_classes', 'file_reader', 'graph_course',
+                          'graph_snapshot', 'plot_class', 'plotly_visualization', 'build_figure',
+                          'plotly.graph_objects', 'pandas', 'os', 'tempfile', 'typing', 'row_writer', 'webscraper',
+                          'bs4', 'calendar_fixtures', 'data_cleaning', 'openpyxl',
+                          'query_cache', 'tracemalloc', 'course_store'],
+        # the names (strs) of imported modules
+        'allowed-io': ['benchmark_evaluate', 'benchmark_pathways', 'benchmark_load', 'benchmark_parse',
+                       'benchmark_planner', 'benchmark_batch', 'benchmark_layout',
+                       'benchmark_dag', 'benchmark_figure', 'benchmark_row_writer', 'benchmark_scrape_parse',
+                       'benchmark_cleaning', 'benchmark_query_cache', 'benchmark_memory',
+                       'benchmark_exclusions', 'benchmark_normalize', 'benchmark_cheapest'],
+        # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,239 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module builds stand-in Arts & Science calendar pages from scraped course data, and serves them from a local
+HTTP server, so the web scraper can be run and benchmarked offline.
+
+Each fixture page has the same structure the scraper expects from the calendar (one div.views-row per course, with
+the course fields in the spans and classes the *_finder functions look for), and scraping the fixture pages built
+from output.xlsx gives back the rows of output.xlsx.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import email.utils
+import hashlib
+import html
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_FIXTURE_DIR = 'fixtures'
+
+# the label of each course field on the calendar, and the class of the span it is in
+_FIELDS = [('Hours', 'Hours', 'hours'),
+           ('Prerequisites', 'Prerequisite', 'prerequisite'),
+           ('Corequisites', 'Corequisite', 'corequisite'),
+           ('Exclusion', 'Exclusion', 'exclusion'),
+           ('Distribution Requirements', 'Distribution Requirements', 'distribution-requirements'),
+           ('Breadth Requirements', 'Breadth Requirements', 'breadth-requirements')]
+
+
+def fixture_row(row: dict[str, Any]) -> str:
+    """Return the calendar HTML of one course, given its row of scraped data. Empty fields are left out, like
+    on the calendar.
+
+    >>> '<div>CSC111H1 - CSC111H1</div>' in fixture_row({'Course Name': 'CSC111H1', 'Hours': '36L'})
+    True
+    """
+    code = html.escape(str(row['Course Name']))
+    parts = ['<div class="views-row">',
+             f'<h3 class="js-views-accordion-group-header"><div>{code} - {code}</div></h3>',
+             '<div class="views-field views-field-body"><div class="field-content">'
+             f'<p>{html.escape(_text(row.get("Course Description")))}</p></div></div>']
+    for column, label, field in _FIELDS:
+        text = _text(row.get(column))
+        if text == '':
+            continue
+        if column == 'Breadth Requirements':
+            # the calendar gives the name of the breadth category followed by its number in brackets
+            text = f'Breadth Category ({text})'
+        parts.append(f'<span class="views-field views-field-field-{field}"><strong class="views-label">{label}: '
+                     f'</strong><span class="field-content">{html.escape(text)}</span></span>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+
+def _text(value: Any) -> str:
+    """Return value as the text of a calendar field: empty cells (NaN) are empty, and whole numbers (such as
+    breadth categories read back as floats) have no decimal point."""
+    if value is None or value != value:
+        return ''
+    elif isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    else:
+        return str(value)
+
+
+def fixture_page(rows: list[dict[str, Any]]) -> str:
+    """Return a calendar search results page listing the courses of the given rows."""
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Search Courses</title></head><body>'
+            '<div class="view-content">' + ''.join(fixture_row(row) for row in rows) + '</div></body></html>')
+
+
+def fixture_path(directory: str, page: int) -> str:
+    """Return the path of the fixture file of the given page number."""
+    return os.path.join(directory, f'page_{page}.html')
+
+
+def write_fixture_pages(excel_file: str = 'output.xlsx', directory: str = DEFAULT_FIXTURE_DIR,
+                        per_page: int = 30) -> int:
+    """Write the rows of excel_file (in the format the scraper writes) to fixture pages of per_page courses each
+    in directory, and return the number of pages.
+    Preconditions:
+        - per_page >= 1
+    """
+    # pandas is slow to import, so it is only imported when fixture pages are built
+    import pandas
+
+    rows = pandas.read_excel(excel_file).to_dict('records')
+    os.makedirs(directory, exist_ok=True)
+    num_pages = (len(rows) + per_page - 1) // per_page
+    for page in range(num_pages):
+        with open(fixture_path(directory, page), 'w', encoding='utf-8') as file:
+            file.write(fixture_page(rows[page * per_page:(page + 1) * per_page]))
+    return num_pages
+
+
+class FixtureServer:
+    """A local HTTP server that serves fixture pages the way the calendar serves search results pages:
+    GET /search-courses?page=<n> returns the fixture file of page n, or 404 if there is none.
+
+    Every page is sent with an ETag (a hash of its contents) and a Last-Modified header (the time its file was
+    last modified). A conditional request whose If-None-Match (or, without one, If-Modified-Since) still matches
+    gets 304 Not Modified with no body, like from a real web server.
+
+    Instance Attributes:
+        - directory: the directory of the fixture files
+        - latency: the number of seconds the server waits before answering each request
+        - num_requests: the number of requests answered so far
+        - num_not_modified: the number of those answered with 304 Not Modified
+    """
+    directory: str
+    latency: float
+    num_requests: int
+    num_not_modified: int
+    # Private Instance Attributes:
+    #   - _server:
+    #       The HTTP server, which answers each request in its own thread.
+    #   - _thread:
+    #       The thread the server runs in, or None if it is not running.
+    #   - _lock:
+    #       Guards the request counters.
+    _server: ThreadingHTTPServer
+    _thread: Optional[threading.Thread]
+    _lock: threading.Lock
+
+    def __init__(self, directory: str = DEFAULT_FIXTURE_DIR, latency: float = 0.0) -> None:
+        self.directory = directory
+        self.latency = latency
+        self.num_requests, self.num_not_modified = 0, 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """The URL that a page number is appended to, like webscraper.base_URL."""
+        return f'http://127.0.0.1:{self._server.server_address[1]}/search-courses?page='
+
+    def start(self) -> FixtureServer:
+        """Start serving in a background thread, and return this server."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the server's socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> FixtureServer:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def count_request(self, not_modified: bool = False) -> None:
+        """Record that a request was answered."""
+        with self._lock:
+            self.num_requests += 1
+            self.num_not_modified += not_modified
+
+
+def _make_handler(fixture_server: FixtureServer) -> type:
+    """Return the request handler class of fixture_server."""
+
+    class _FixtureHandler(BaseHTTPRequestHandler):
+        """Answers the requests of a FixtureServer."""
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self) -> None:
+            """Send the fixture page of the requested page number."""
+            if fixture_server.latency > 0:
+                threading.Event().wait(fixture_server.latency)
+
+            url = urlparse(self.path)
+            pages = parse_qs(url.query).get('page', [''])
+            path = fixture_path(fixture_server.directory, int(pages[0])) if pages[0].isdigit() else None
+            if url.path != '/search-courses' or path is None or not os.path.isfile(path):
+                fixture_server.count_request()
+                self.send_error(404)
+                return
+
+            with open(path, 'rb') as file:
+                content = file.read()
+            etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+            mtime = int(os.stat(path).st_mtime)
+
+            if 'If-None-Match' in self.headers:
+                not_modified = self.headers['If-None-Match'] == etag
+            elif 'If-Modified-Since' in self.headers:
+                not_modified = mtime <= email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+            else:
+                not_modified = False
+            fixture_server.count_request(not_modified)
+
+            self.send_response(304 if not_modified else 200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', email.utils.formatdate(mtime, usegmt=True))
+            if not_modified:
+                self.end_headers()
+            else:
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        def log_message(self, *args: Any) -> None:
+            """Do not log every request to stderr."""
+
+    return _FixtureHandler
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'email.utils', 'hashlib', 'html', 'os', 'threading', 'http.server',
+                          'urllib.parse', 'BaseHTTPRequestHandler', 'ThreadingHTTPServer', 'parse_qs', 'urlparse',
+                          'pandas'],
+        # the names (strs) of imported modules
+        'allowed-io': ['write_fixture_pages', 'do_GET'],
+        # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
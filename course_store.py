@@ -0,0 +1,183 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module contains a compact, read-only store of the courses in a graph, for keeping the calendars of many
+faculties in one process.
+
+Instead of an object per course and per BoolOp, the store keeps a few flat arrays (a struct of arrays), with each
+course identified by its int id (its index in the graph, see Graph._ids):
+    - codes: the 8 character codes of the courses, one after another, in order of id
+    - by_code: the ids in order of course code, so a course can be found from its code by binary search
+    - expression offsets and data: every course's prerequisites in postfix order, in compressed sparse row (CSR)
+      form, the same way a snapshot stores them (see graph_snapshot)
+    - exclusion offsets and data: the ids of every course's exclusions, in CSR form
+The store answers questions about a course straight from the arrays, and can be turned back into a Graph.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+from array import array
+from graph_course import Graph
+from graph_snapshot import decode_graph, encode_graph
+
+
+class CourseStore:
+    """The courses, prerequisites and exclusions of a graph, stored in flat arrays.
+
+    >>> g = Graph()
+    >>> g.add_courses(['CSC110Y1', 'CSC111H1', 'MAT137Y1', 'CSC236H1'])
+    >>> g.add_prerequisites(['CSC111H1'], 'CSC236H1')
+    >>> g.add_prerequisites([('CSC110Y1', 'MAT137Y1')], 'CSC236H1')
+    >>> store = store_graph(g)
+    >>> sorted(store.prerequisite_codes('CSC236H1'))
+    ['CSC110Y1', 'CSC111H1', 'MAT137Y1']
+    >>> store.is_satisfied('CSC236H1', {'CSC111H1', 'CSC110Y1'})
+    False
+    >>> store.is_satisfied('CSC236H1', {'CSC111H1', 'CSC110Y1', 'MAT137Y1'})
+    True
+
+    Representation Invariants:
+        - len(self._codes) == 8 * len(self._by_code)
+        - len(self._expr_offsets) == len(self._by_code) + 1
+        - len(self._excl_offsets) == len(self._by_code) + 1
+    """
+    __slots__ = ('_codes', '_by_code', '_expr_offsets', '_expr_data', '_excl_offsets', '_excl_data')
+    # Private Instance Attributes:
+    #   - _codes:
+    #       The ASCII course codes, 8 bytes per course, in order of id.
+    #   - _by_code:
+    #       The course ids, in order of course code.
+    #   - _expr_offsets, _expr_data:
+    #       The prerequisites of course i are _expr_data[_expr_offsets[i]:_expr_offsets[i + 1]], in postfix order:
+    #       a value v >= 0 is the course with id v, and a negative value is an 'and' (-2 * n - 1) or an 'or'
+    #       (-2 * n - 2) of the previous n expressions.
+    #   - _excl_offsets, _excl_data:
+    #       The ids of the exclusions of course i are _excl_data[_excl_offsets[i]:_excl_offsets[i + 1]].
+    _codes: bytes
+    _by_code: array
+    _expr_offsets: array
+    _expr_data: array
+    _excl_offsets: array
+    _excl_data: array
+
+    def __init__(self, codes: bytes, expr_offsets: array, expr_data: array, excl_offsets: array,
+                 excl_data: array) -> None:
+        """Initialize a store from the sections of a snapshot (see graph_snapshot.encode_graph)."""
+        self._codes = codes
+        self._expr_offsets, self._expr_data = expr_offsets, expr_data
+        self._excl_offsets, self._excl_data = excl_offsets, excl_data
+        self._by_code = array('i', sorted(range(len(codes) // 8), key=lambda i: codes[8 * i:8 * i + 8]))
+
+    def __len__(self) -> int:
+        """Return the number of courses in this store."""
+        return len(self._by_code)
+
+    def __contains__(self, course_code: str) -> bool:
+        """Return whether course_code is in this store."""
+        return self._find(course_code) >= 0
+
+    def code(self, course_id: int) -> str:
+        """Return the code of the course with the given id.
+        Preconditions:
+            - 0 <= course_id < len(self)
+        """
+        return self._codes[8 * course_id:8 * course_id + 8].decode('ascii')
+
+    def course_id(self, course_code: str) -> int:
+        """Return the id of course_code. Raises ValueError if it is not in this store."""
+        course_id = self._find(course_code)
+        if course_id < 0:
+            raise ValueError(f'{course_code} is not in this course store')
+        return course_id
+
+    def credit(self, course_code: str) -> float:
+        """Return the number of credits course_code is worth."""
+        return 1.0 if course_code[6] == 'Y' else 0.5
+
+    def prerequisite_codes(self, course_code: str) -> set[str]:
+        """Return the codes of the courses that appear in the prerequisites of course_code (see
+        Expr.referenced_courses)."""
+        i = self.course_id(course_code)
+        return {self.code(value) for value in self._expr_data[self._expr_offsets[i]:self._expr_offsets[i + 1]]
+                if value >= 0}
+
+    def exclusions(self, course_code: str) -> set[str]:
+        """Return the codes of the exclusions of course_code."""
+        i = self.course_id(course_code)
+        return {self.code(ex) for ex in self._excl_data[self._excl_offsets[i]:self._excl_offsets[i + 1]]}
+
+    def is_satisfied(self, course_code: str, completed: set[str]) -> bool:
+        """Return whether a student who has completed the courses in completed meets the prerequisites of
+        course_code, like Graph.is_satisfied, evaluating the postfix expression directly."""
+        i = self.course_id(course_code)
+        # each expression is evaluated to (whether it is met, whether it has pathways), see Expr.has_pathways
+        stack = []
+        for value in self._expr_data[self._expr_offsets[i]:self._expr_offsets[i + 1]]:
+            if value >= 0:
+                stack.append((self.code(value) in completed, True))
+            else:
+                num_operands = (-value - 1) // 2
+                operands = stack[len(stack) - num_operands:]
+                del stack[len(stack) - num_operands:]
+                has_pathways = any(operand[1] for operand in operands)
+                if value % 2 == 1:
+                    stack.append((all(operand[0] for operand in operands), has_pathways))
+                else:
+                    # an operand without pathways is not an option of an 'or' (see Expr.is_satisfied)
+                    stack.append((any(operand[0] for operand in operands if operand[1]) or not has_pathways,
+                                  has_pathways))
+        return stack[0][0]
+
+    def to_graph(self) -> Graph:
+        """Return a Graph of the courses in this store."""
+        return decode_graph(self._codes, memoryview(self._expr_offsets), memoryview(self._expr_data),
+                            memoryview(self._excl_offsets), memoryview(self._excl_data))
+
+    def nbytes(self) -> int:
+        """Return the number of bytes taken up by the arrays of this store."""
+        return len(self._codes) + sum(section.itemsize * len(section) for section in
+                                      (self._by_code, self._expr_offsets, self._expr_data, self._excl_offsets,
+                                       self._excl_data))
+
+    def _find(self, course_code: str) -> int:
+        """Return the id of course_code, or -1 if it is not in this store."""
+        key = course_code.encode('ascii')
+        low, high = 0, len(self._by_code)
+        while low < high:
+            middle = (low + high) // 2
+            course_id = self._by_code[middle]
+            if self._codes[8 * course_id:8 * course_id + 8] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._by_code) and self._codes[8 * self._by_code[low]:8 * self._by_code[low] + 8] == key:
+            return self._by_code[low]
+        return -1
+
+
+def store_graph(graph: Graph) -> CourseStore:
+    """Return a CourseStore of the courses in graph.
+    Preconditions:
+        - all(len(code) == 8 and code.isascii() for code in graph._courses)
+    """
+    return CourseStore(*encode_graph(graph))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'array', 'Graph', 'graph_course', 'graph_snapshot', 'decode_graph',
+                          'encode_graph'],
+        # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
@@ -1,67 +1,113 @@
 """
 Outputs a .csv file in a nice format.
 """
-import openpyxl
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Collection, Optional
 import pandas
+from row_writer import open_writer
 
+if TYPE_CHECKING:
+    # only needed for annotations, and importing webscraper imports requests and bs4
+    from webscraper import CalendarDelta
 
-def create_clean_data_file(filename: str) -> None:
-    """
-    Creates a new Excel file containing clean data from filename.
+# the state of a create_clean_data_file worker process
+_worker_state = {}
+
+
+def create_clean_data_file(filename: str, output_file: str = "clean_data_v4.xlsx",
+                           workers: Optional[int] = None) -> None:
     """
-    new_excel_file = openpyxl.Workbook()    # new Excel workbook/file
-    new_sheet = new_excel_file.active       # select the default sheet
+    Creates a new Excel file (output_file) containing clean data from filename.
 
+    The rows are cleaned by a pool of the given number of worker processes (the number of CPUs if workers is
+    None, and in this process if workers is 1), and written to output_file in order as they are cleaned, without
+    keeping the whole workbook in memory. If cleaning a row fails, the error is raised here and output_file is
+    left as it was (see row_writer).
+    """
     df = pandas.read_excel(filename)        # read original Excel file --> dataframe
 
     # HEADER (COLUMN NAMES):
     # ['Course Name', 'Course Description', 'Hours', 'Prerequisites', 'Corequisites',
     # 'Distribution Requirements', 'Breadth Requirements', 'Exclusion']
     header = list(df.columns)
-    new_sheet.append(header)
+    rows = df.to_dict('records')
+
+    # the courses that exist, as a set so check_existence looks each course up in constant time
+    courses = {row[header[0]] for row in rows}
+
+    workers = workers or os.cpu_count() or 1
+    with open_writer(output_file, header, 'xlsx') as new_sheet:
+        if workers == 1:
+            new_sheet.write_rows(clean_row(row, courses) for row in rows)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(courses,)) as executor:
+                new_sheet.write_rows(executor.map(_clean_row_in_worker, rows,
+                                                  chunksize=max(1, len(rows) // (4 * workers))))
+
 
-    courses = []
+def _init_worker(courses: set[str]) -> None:
+    """Store the courses that exist in a create_clean_data_file worker process."""
+    _worker_state['courses'] = courses
 
-    # adds to courses list to check if courses exist (check_existence function)
-    for index, row in df.iterrows():
-        course_code = row[header[0]]
-        courses.append(course_code)
 
-    # read data from original Excel sheet and add to new Excel sheet
-    for index, row in df.iterrows():
-        course_code = row[header[0]]
-        course_description = row[header[1]]
-        hours = row[header[2]]
-        prerequisites = parse_cell(row, header[3], courses)
-        corequisites = parse_cell(row, header[4], courses)
-        distribution_reqs = row[header[5]]
-        breadth_reqs = row[header[6]]
-        exclusions = parse_cell(row, header[7], courses)
+def _clean_row_in_worker(row: dict[str, Any]) -> dict[str, Any]:
+    """Clean one row in a create_clean_data_file worker process (see clean_row)."""
+    return clean_row(row, _worker_state['courses'])
 
-        data_row = [course_code, course_description, hours, prerequisites, corequisites,
-                    distribution_reqs, breadth_reqs, exclusions]
 
-        new_sheet.append(data_row)
+def clean_row(row: Any, courses: Collection[str]) -> dict[str, Any]:
+    """
+    Returns the cleaned data of one course, given its row of scraped data (a pandas row or a dict) and the
+    courses that exist. The keys are the column names, in the order of the columns of the clean data file.
+    """
+    return {'Course Name': row['Course Name'],
+            'Course Description': row['Course Description'],
+            'Hours': row['Hours'],
+            'Prerequisites': parse_cell(row, 'Prerequisites', courses),
+            'Corequisites': parse_cell(row, 'Corequisites', courses),
+            'Distribution Requirements': row['Distribution Requirements'],
+            'Breadth Requirements': row['Breadth Requirements'],
+            'Exclusion': parse_cell(row, 'Exclusion', courses)}
 
-    new_excel_file.save("clean_data_v4.xlsx")      # Save the workbook to a file
 
+def clean_delta(delta: CalendarDelta) -> list[dict[str, Any]]:
+    """
+    Returns the cleaned data of the courses affected by a re-scrape of the calendar (see
+    webscraper.scrape_incremental), in the order they are listed: the courses that were added or changed, and
+    the courses whose requisites mention a course that was added or removed (since check_existence keeps or
+    drops that course now).
 
-def parse_cell(row: pandas, column: str, courses: list[str]) -> str:
+    Every other course cleans to the same data as before, so it is not cleaned again.
+    """
+    courses = {course['Course Name'] for course in delta.courses}
+    mentioned = {course['Course Name'] for course in delta.added}.union(delta.removed)
+    affected = {course['Course Name'] for course in delta.added + delta.changed}
+
+    for course in delta.courses:
+        for column in ('Prerequisites', 'Corequisites', 'Exclusion'):
+            requisites = course[column]
+            if isinstance(requisites, str) and not mentioned.isdisjoint(split_string(requisites.replace(' ', ''))):
+                affected.add(course['Course Name'])
+
+    return [clean_row(course, courses) for course in delta.courses if course['Course Name'] in affected]
+
+
+def parse_cell(row: pandas, column: str, courses: Collection[str]) -> str:
     """
     Parses a specific cell (row[column]) and returns the cleaned string.
     """
     clean_cell = row[column]
 
-    if not isinstance(clean_cell, float):
+    if isinstance(clean_cell, str) and clean_cell != '':
         clean_cell = fix_spacing(clean_cell, '/')
         clean_cell = clean_cell.replace(' ', '')
 
         clean_cell = check_existence(courses, clean_cell)
 
-        # run clean_string thrice to make sure we cleaned the data thoroughly
-        clean_cell = clean_string(clean_cell)
-        clean_cell = clean_string(clean_cell)
-        clean_cell = clean_string(clean_cell)
+        # run clean_string until it makes no more changes to make sure we cleaned the data thoroughly
+        clean_cell = clean_until_stable(clean_cell)
 
     else:
         clean_cell = ''
@@ -69,6 +115,33 @@ def parse_cell(row: pandas, column: str, courses: list[str]) -> str:
     return clean_cell
 
 
+def clean_until_stable(s: str, max_rounds: int = 100) -> str:
+    """
+    Runs clean_string on s until cleaning it again would not change it, and returns the result.
+    Raises ValueError if s still changes after clean_string has run max_rounds times, so a cleaning rule that
+    keeps changing a cell cannot hang the cleaning job. The scraped data needs at most 4 rounds.
+
+    >>> clean_string('((CSC110Y1))')
+    '(CSC110Y1)'
+    >>> clean_until_stable('((CSC110Y1))')
+    'CSC110Y1'
+    >>> clean_until_stable('((CSC110Y1))', 2)
+    Traceback (most recent call last):
+    ValueError: 'CSC110Y1' still changes after 2 rounds of cleaning
+
+    Preconditions:
+        - max_rounds >= 1
+    """
+    new_s = clean_string(s)
+    rounds = 1
+    while new_s != s:
+        if rounds == max_rounds:
+            raise ValueError(f'{new_s!r} still changes after {max_rounds} rounds of cleaning')
+        s, new_s = new_s, clean_string(new_s)
+        rounds += 1
+    return new_s
+
+
 def clean_string(s: str) -> str:
     """
     Uses all the cleaning functions (below) to clean s.
@@ -260,7 +333,7 @@ def remove_string(s: str, remove_s: str, replace_s: str = '') -> str:
     return s.replace(remove_s, replace_s)
 
 
-def check_existence(courses: list[str], requisites: str) -> str:
+def check_existence(courses: Collection[str], requisites: str) -> str:
     """
     Checks if a given course exists in courses and removes it from requisites if it doesn't.
 
@@ -390,7 +463,7 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['openpyxl', 'pandas'],
+        'extra-imports': ['annotations', 'os', 'concurrent.futures', 'pandas', 'row_writer', 'webscraper'],
         # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
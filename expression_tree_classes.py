@@ -9,6 +9,7 @@ Creators:
 - Vennise Ho
 """
 from __future__ import annotations
+import math
 from typing import Any, Optional
 
 
@@ -27,6 +28,7 @@ class Tree:
     #       self._root is None (representing an empty tree). However, this attribute
     #       may be empty when self._root is not None, which represents a tree consisting
     #       of just one item.
+    __slots__ = ('_root', '_subtrees')
     _root: Optional[Any]
     _subtrees: list[Tree]
 
@@ -87,15 +89,62 @@ class Expr:
         The code used to represent this expression. In a BoolOp, this is an and/or and in a course,
         this is the course code.
     """
+    # every expression only has the attributes its class declares, so it is stored without a __dict__
+    __slots__ = ('code',)
     code: str
 
     def __init__(self) -> None:
         """Initialize an expression"""
 
-    def evaluate(self) -> Any:
+    def evaluate(self, memo: Optional[dict[Expr, list]] = None) -> Any:
         """Evaluates an expression, whether it's a course or a BoolOp. Evaluate will produce a list of sets,
         with each set containing the possible pathways to make the overall BoolOp true, or if it's a course,
-        a list of sets with pathways that satisfy prerequisites."""
+        a list of sets with pathways that satisfy prerequisites.
+
+        If memo is given, every course is expanded at most once and its pathways are stored in memo, so shared
+        prerequisites are reused instead of being re-expanded. The lists stored in memo must not be mutated.
+        """
+        raise NotImplementedError
+
+    def _evaluate_memo(self, memo: dict[Expr, list], active: dict[Expr, int]) -> tuple[list, float]:
+        """Return evaluate(memo), and the smallest depth of a course in active (the courses whose prerequisites
+        are being expanded, mapped to their depth) that the result was cut short at, or infinity if there is none.
+
+        A course reached again while it is in active (a prerequisite cycle) evaluates to just itself, so a result
+        that depends on such a course only holds while it is being expanded, and is not stored in memo.
+        """
+        raise NotImplementedError
+
+    def evaluate_bits(self, ids: dict[str, int], memo: dict[Expr, list[int]]) -> list[int]:
+        """Evaluate this expression like evaluate(memo), but encode every pathway as a bitset (an int whose bit
+        ids[code] is set for each course in the pathway) and keep only the minimal pathways, i.e. those that
+        do not contain another pathway.
+        """
+        raise NotImplementedError
+
+    def _evaluate_bits_memo(self, ids: dict[str, int], memo: dict[Expr, list[int]],
+                            active: dict[Expr, int]) -> tuple[list[int], float]:
+        """Return evaluate_bits(ids, memo), and the smallest depth of a course in active that the result was cut
+        short at, or infinity if there is none (see _evaluate_memo).
+        """
+        raise NotImplementedError
+
+    def has_pathways(self) -> bool:
+        """Return whether evaluate() would return a non-empty list. An expression without pathways
+        (such as an empty BoolOp) places no requirement on a pathway."""
+        raise NotImplementedError
+
+    def is_satisfied(self, completed: set[str]) -> bool:
+        """Return whether a student who has completed the courses in completed meets this requirement, i.e.
+        whether some pathway of evaluate() has only completed courses besides the courses that are checked.
+        A course is met if it was completed; a BoolOp is checked operand by operand, stopping as soon as the
+        result is known, without expanding it into pathways (see has_pathways for operands that place no
+        requirement)."""
+        raise NotImplementedError
+
+    def referenced_courses(self) -> set[str]:
+        """Return the codes of the courses that appear in this expression, without looking into the
+        prerequisites of those courses."""
         raise NotImplementedError
 
     def to_tree(self) -> Tree:
@@ -119,6 +168,7 @@ class _Course(Expr):
         - len(self.code) == 8
         - self.code[6:8] == 'H1' or self.code[6:8] == 'Y1'
     """
+    __slots__ = ('prerequisites', 'name', 'description', 'breadth', 'credit', 'exclusions')
     prerequisites: BoolOp
     name: str
     description: str
@@ -135,10 +185,94 @@ class _Course(Expr):
         self.credit = 1.0 if code[6] == 'Y' else 0.5
         self.exclusions = set()
 
-    def evaluate(self) -> list:
+    def evaluate(self, memo: Optional[dict[Expr, list]] = None) -> list:
         """Evaluate the course to give itself and its prerequisites
+
+        When memo is given, a course that is reached again while its own prerequisites are still being
+        expanded (a prerequisite cycle) evaluates to just itself, and the result does not depend on which
+        courses were evaluated with memo before.
+
+        >>> a, b, c, e = (_Course(code) for code in ['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1'])
+        >>> a.prerequisites = BoolOp('and', [b, e])
+        >>> b.prerequisites = BoolOp('and', [a, c])
+        >>> memo = {}
+        >>> [sorted(pathway) for pathway in b.evaluate(memo) + a.evaluate(memo)]
+        [['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1'], ['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1']]
+        >>> memo = {}
+        >>> [sorted(pathway) for pathway in a.evaluate(memo) + b.evaluate(memo)]
+        [['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1'], ['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1']]
+        """
+        if memo is None:
+            return combine_lists([{self.code}], self.prerequisites.evaluate())
+        return self._evaluate_memo(memo, {})[0]
+
+    def _evaluate_memo(self, memo: dict[Expr, list], active: dict[Expr, int]) -> tuple[list, float]:
+        """Evaluate the course with memo, cutting prerequisite cycles at the courses in active
+        (see Expr._evaluate_memo)."""
+        if self in memo:
+            return memo[self], math.inf
+        elif self in active:
+            return [{self.code}], active[self]
+
+        depth = active[self] = len(active)
+        pathways, cut = self.prerequisites._evaluate_memo(memo, active)
+        del active[self]
+        pathways = combine_lists([{self.code}], pathways)
+        if cut >= depth:
+            # the only cycles cut were back to this course itself, which is part of every one of its pathways
+            memo[self] = pathways
+            cut = math.inf
+        return pathways, cut
+
+    def evaluate_bits(self, ids: dict[str, int], memo: dict[Expr, list[int]]) -> list[int]:
+        """Evaluate the course to give the bitsets of itself and its prerequisites (see Expr.evaluate_bits)
+
+        Like evaluate, the result does not depend on which courses were evaluated with memo before, even on a
+        prerequisite cycle.
+
+        >>> a, b, c, e = (_Course(code) for code in ['AAA100H1', 'BBB100H1', 'CCC100H1', 'EEE100H1'])
+        >>> a.prerequisites = BoolOp('and', [b, e])
+        >>> b.prerequisites = BoolOp('and', [a, c])
+        >>> ids = {'AAA100H1': 0, 'BBB100H1': 1, 'CCC100H1': 2, 'EEE100H1': 3}
+        >>> def as_bits(pathways: list[set]) -> list[int]:
+        ...     return sorted(sum(1 << ids[code] for code in pathway) for pathway in pathways)
+        >>> for order in [(a, b), (b, a)]:
+        ...     memo = {}
+        ...     print([course.evaluate_bits(ids, memo) == as_bits(course.evaluate({})) for course in order])
+        [True, True]
+        [True, True]
         """
-        return combine_lists([{self.code}], self.prerequisites.evaluate())
+        return self._evaluate_bits_memo(ids, memo, {})[0]
+
+    def _evaluate_bits_memo(self, ids: dict[str, int], memo: dict[Expr, list[int]],
+                            active: dict[Expr, int]) -> tuple[list[int], float]:
+        """Evaluate the course as bitsets with memo, cutting prerequisite cycles at the courses in active
+        (see Expr._evaluate_memo)."""
+        if self in memo:
+            return memo[self], math.inf
+        elif self in active:
+            return [1 << ids[self.code]], active[self]
+
+        depth = active[self] = len(active)
+        pathways, cut = self.prerequisites._evaluate_bits_memo(ids, memo, active)
+        del active[self]
+        pathways = combine_bits([1 << ids[self.code]], pathways)
+        if cut >= depth:
+            memo[self] = pathways
+            cut = math.inf
+        return pathways, cut
+
+    def has_pathways(self) -> bool:
+        """A course is always part of its own pathways."""
+        return True
+
+    def is_satisfied(self, completed: set[str]) -> bool:
+        """Return whether this course was completed."""
+        return self.code in completed
+
+    def referenced_courses(self) -> set[str]:
+        """Return the code of this course."""
+        return {self.code}
 
     def are_exclusions(self, course: _Course) -> bool:
         """Check if self and course are exclusions of each other"""
@@ -165,7 +299,7 @@ class BoolOp(Expr):
         - self.operand != []
         - self.code == 'and' or self.code == 'or'
     """
-
+    __slots__ = ('operand',)
     operand: list[Expr]
 
     def __init__(self, operator: str, operands: list[Expr]) -> None:
@@ -174,27 +308,79 @@ class BoolOp(Expr):
         self.code = operator
         self.operand = operands
 
-    def evaluate(self) -> list:
+    def evaluate(self, memo: Optional[dict[Expr, list]] = None) -> list:
         """This function returns a list of sets of different possibilities to meet an outcome. For example, if we have
         the BoolOp tree 'and' with operands A, B, and BoolOp('or', [C, D]), then we get
         [{A, B, C}, {A, B, D}]
+
+        Each operand is evaluated exactly once.
         """
-        if not self.operand:
-            return []
+        if memo is not None:
+            return self._evaluate_memo(memo, {})[0]
+        new_list = []
+        if self.code == 'and':
+            for operand in self.operand:
+                new_list = combine_lists(new_list, operand.evaluate())
         else:
-            if self.code == 'and':
-                new_list = []
-                for operand in self.operand:
-                    new_list = combine_lists(new_list, [operand.evaluate()]) \
-                        if isinstance(operand.evaluate(), set) \
-                        else combine_lists(new_list, operand.evaluate())
-            else:
-                new_list = []
-                for operand in self.operand:
-                    new_list = new_list + operand.evaluate() \
-                        if isinstance(operand.evaluate(), list) \
-                        else new_list + [operand.evaluate()]
-            return new_list
+            for operand in self.operand:
+                new_list = new_list + operand.evaluate()
+        return new_list
+
+    def _evaluate_memo(self, memo: dict[Expr, list], active: dict[Expr, int]) -> tuple[list, float]:
+        """Evaluate this BoolOp with memo, cutting prerequisite cycles at the courses in active
+        (see Expr._evaluate_memo)."""
+        new_list, cut = [], math.inf
+        for operand in self.operand:
+            pathways, operand_cut = operand._evaluate_memo(memo, active)
+            cut = min(cut, operand_cut)
+            new_list = combine_lists(new_list, pathways) if self.code == 'and' else new_list + pathways
+        return new_list, cut
+
+    def evaluate_bits(self, ids: dict[str, int], memo: dict[Expr, list[int]]) -> list[int]:
+        """Return the minimal pathways of this BoolOp as bitsets (see Expr.evaluate_bits)."""
+        return self._evaluate_bits_memo(ids, memo, {})[0]
+
+    def _evaluate_bits_memo(self, ids: dict[str, int], memo: dict[Expr, list[int]],
+                            active: dict[Expr, int]) -> tuple[list[int], float]:
+        """Evaluate this BoolOp as bitsets with memo, cutting prerequisite cycles at the courses in active
+        (see Expr._evaluate_memo)."""
+        new_list, cut = [], math.inf
+        for operand in self.operand:
+            pathways, operand_cut = operand._evaluate_bits_memo(ids, memo, active)
+            cut = min(cut, operand_cut)
+            new_list = combine_bits(new_list, pathways) if self.code == 'and' else new_list + pathways
+        if self.code == 'or':
+            new_list = minimal_bits(new_list)
+        return new_list, cut
+
+    def has_pathways(self) -> bool:
+        """Return whether any operand of this BoolOp has pathways."""
+        return any(operand.has_pathways() for operand in self.operand)
+
+    def is_satisfied(self, completed: set[str]) -> bool:
+        """Return whether all (for 'and') or any (for 'or') of the operands are met.
+        Like in evaluate, an operand without pathways (such as an empty BoolOp) is not an option of an 'or', so it
+        does not meet the 'or' on its own, and an 'or' without any option places no requirement.
+
+        >>> a = _Course('CSC110Y1')
+        >>> expr = BoolOp('or', [a, BoolOp('or', [])])
+        >>> expr.is_satisfied(set()), expr.is_satisfied({'CSC110Y1'}), expr.evaluate()
+        (False, True, [{'CSC110Y1'}])
+        >>> BoolOp('or', []).is_satisfied(set()), BoolOp('or', []).evaluate()
+        (True, [])
+        """
+        if self.code == 'and':
+            return all(operand.is_satisfied(completed) for operand in self.operand)
+        else:
+            options = [operand for operand in self.operand if operand.has_pathways()]
+            return not options or any(operand.is_satisfied(completed) for operand in options)
+
+    def referenced_courses(self) -> set[str]:
+        """Return the codes of the courses that appear in the operands of this BoolOp."""
+        codes = set()
+        for operand in self.operand:
+            codes.update(operand.referenced_courses())
+        return codes
 
     def to_tree(self) -> Tree:
         """Turns this BoolOp into a tree."""
@@ -219,6 +405,163 @@ def combine_lists(lst1: list[set], lst2: list[set]) -> list:
         return [element1.union(element2) for element1 in lst1 for element2 in lst2]
 
 
+def combine_bits(lst1: list[int], lst2: list[int]) -> list[int]:
+    """Return the minimal unions of one bitset from lst1 with one bitset from lst2.
+    Like combine_lists, an empty list leaves the other list unchanged.
+
+    >>> combine_bits([0b001, 0b010], [0b100, 0b011])
+    [3, 5, 6]
+    """
+    if not lst1:
+        return lst2
+    elif not lst2:
+        return lst1
+    else:
+        return minimal_bits([bits1 | bits2 for bits1 in lst1 for bits2 in lst2])
+
+
+def minimal_bits(lst: list[int]) -> list[int]:
+    """Return the distinct bitsets in lst that are not a superset of another bitset in lst, ordered by
+    the number of bits set.
+
+    >>> minimal_bits([0b111, 0b011, 0b100, 0b011, 0b110])
+    [4, 3]
+    >>> minimal_bits([0b101, 0])
+    [0]
+    """
+    minimal = []
+    index = SubsetIndex()
+    for bits in sorted(set(lst), key=int.bit_count):
+        if not index.has_subset(bits):
+            minimal.append(bits)
+            index.add(bits)
+    return minimal
+
+
+def normalize(expr: Expr, interned: dict[tuple, BoolOp]) -> Optional[Expr]:
+    """Return an expression with the same minimal pathways as expr (see evaluate_bits) and the same is_satisfied,
+    or None if expr has no pathways. The returned expression is simplified bottom up:
+        - a BoolOp without pathways is removed: it places no requirement in an 'and', and it is not an option of
+          an 'or' (see BoolOp.is_satisfied)
+        - an 'and' of 'and's (or an 'or' of 'or's) is flattened into one BoolOp
+        - an operand that appears more than once is only kept the first time
+        - an operand made redundant by another is absorbed: in an 'and', an 'or' is dropped when another operand
+          has only some of its options (A and (A or B) is A), and in an 'or', an 'and' is dropped when another
+          operand requires only some of its courses (A or (A and B) is A)
+        - a BoolOp with a single operand is replaced by that operand
+    Every BoolOp returned is interned in interned (keyed by its operator and the ids of its operands), so
+    identical subexpressions normalized with the same interned dictionary are the same object. The BoolOps
+    returned must not be mutated, and expr itself is not.
+
+    >>> a, b, c = _Course('CSC110Y1'), _Course('CSC111H1'), _Course('MAT137Y1')
+    >>> interned = {}
+    >>> expr = BoolOp('and', [BoolOp('and', [a]), BoolOp('or', [a, b]), BoolOp('or', []), BoolOp('and', [c, a])])
+    >>> print(normalize(expr, interned).to_tree())
+    and
+      CSC110Y1
+      MAT137Y1
+    >>> normalize(BoolOp('or', [c, BoolOp('and', [c, b])]), interned) is c
+    True
+    >>> normalize(BoolOp('or', [a, c]), interned) is normalize(BoolOp('or', [BoolOp('or', [a]), c, a]), interned)
+    True
+
+    An 'or' with an empty BoolOp as an operand still needs one of its other operands:
+    >>> either = BoolOp('or', [a, BoolOp('or', [])])
+    >>> normalize(either, interned) is a, either.is_satisfied(set()), a.is_satisfied(set())
+    (True, False, False)
+    >>> normalize(BoolOp('or', []), interned) is None, BoolOp('or', []).is_satisfied(set())
+    (True, True)
+    """
+    if isinstance(expr, _Course):
+        return expr
+
+    operands = []
+    for operand in expr.operand:
+        operand = normalize(operand, interned)
+        if operand is None:
+            continue
+        elif isinstance(operand, BoolOp) and operand.code == expr.code:
+            operands.extend(operand.operand)
+        else:
+            operands.append(operand)
+    operands = list(dict.fromkeys(operands))
+
+    # what each operand is made of in terms of the other operator: the options of an 'or' in an 'and', or the
+    # courses of an 'and' in an 'or'
+    parts = [frozenset(operand.operand) if isinstance(operand, BoolOp) else frozenset([operand])
+             for operand in operands]
+    operands = [operand for i, operand in enumerate(operands)
+                if not any(parts[j] < parts[i] or (parts[j] == parts[i] and j < i)
+                           for j in range(len(operands)) if j != i)]
+
+    if not operands:
+        return None
+    elif len(operands) == 1:
+        return operands[0]
+    key = (expr.code, tuple(id(operand) for operand in operands))
+    if key not in interned:
+        interned[key] = BoolOp(expr.code, operands)
+    return interned[key]
+
+
+def count_nodes(exprs: list[Expr]) -> tuple[int, int]:
+    """Return the number of nodes in the trees of the BoolOps in exprs (counting a subexpression every time it
+    appears, like to_tree and evaluate without a memo do) and the number of distinct BoolOp objects among them.
+    Courses are leaves: their own prerequisites are not counted.
+
+    >>> a, b = _Course('CSC110Y1'), _Course('CSC111H1')
+    >>> either = BoolOp('or', [a, b])
+    >>> count_nodes([BoolOp('and', [either, a]), BoolOp('and', [either])])
+    (9, 3)
+    """
+    num_nodes, distinct = 0, set()
+    stack = list(exprs)
+    while stack:
+        expr = stack.pop()
+        num_nodes += 1
+        if isinstance(expr, BoolOp):
+            distinct.add(id(expr))
+            stack.extend(expr.operand)
+    return num_nodes, len(distinct)
+
+
+class SubsetIndex:
+    """A collection of bitsets that can quickly tell whether one of them is a subset of a given bitset.
+
+    >>> index = SubsetIndex()
+    >>> index.add(0b0110)
+    >>> index.has_subset(0b1110)
+    True
+    >>> index.has_subset(0b1010)
+    False
+    """
+    # Private Instance Attributes:
+    #   - _groups:
+    #       Maps a bit to the bitsets in this collection whose highest set bit it is. A subset of bits can
+    #       only be in a group whose key is one of the bits set in bits.
+    _groups: dict[int, list[int]]
+
+    def __init__(self) -> None:
+        """Initialize an empty collection of bitsets."""
+        self._groups = {}
+
+    def add(self, bits: int) -> None:
+        """Add bits to this collection."""
+        self._groups.setdefault(1 << bits.bit_length() >> 1, []).append(bits)
+
+    def has_subset(self, bits: int) -> bool:
+        """Return whether some bitset in this collection is a subset of bits."""
+        if 0 in self._groups:
+            return True
+        rest = bits
+        while rest:
+            highest = 1 << rest.bit_length() >> 1
+            if any(other & bits == other for other in self._groups.get(highest, [])):
+                return True
+            rest ^= highest
+        return False
+
+
 if __name__ == '__main__':
     import doctest
 
@@ -227,7 +570,7 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['annotations'],  # the names (strs) of imported modules
+        'extra-imports': ['annotations', 'math'],  # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
         'max-nested-blocks': 4
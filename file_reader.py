@@ -8,48 +8,174 @@ Creators:
 - Ryan Fu
 - Vennise Ho
 """
-import pandas
+import re
+import time
+from typing import Any, Optional
+from expression_tree_classes import BoolOp
 from graph_course import Graph
+from graph_snapshot import read_snapshot, snapshot_path, write_snapshot
 
+# a comma, slash or bracket, or a run of any other characters (see split_string)
+_TOKEN = re.compile(r'[,/()]|[^,/()]+')
 
-def load_graph(excel_file: str) -> Graph:
+
+def load_graph(excel_file: str, use_snapshot: bool = True, timings: Optional[dict[str, float]] = None,
+               normalize: bool = True) -> Graph:
     """
     Loads information from an excel_file into an instance of the graph class.
+
+    If use_snapshot is True, the graph is loaded from the snapshot of excel_file when that snapshot is up to date,
+    and a new snapshot is saved otherwise (see graph_snapshot).
+
+    If normalize is True, the prerequisites of every course are simplified once they are loaded, and identical
+    subexpressions are shared between courses (see Graph.normalize_prerequisites). A snapshot stores the
+    simplified prerequisites but cannot share them, so they are normalized again when a snapshot is read. Only a
+    snapshot saved with the same value of normalize is used.
+
+    If timings is given, the number of seconds spent in each phase of loading is stored in it (see
+    load_excel_graph), with the time spent reading or writing the snapshot stored under 'snapshot' and the time
+    spent normalizing stored under 'normalize'.
+    """
+    if timings is None:
+        timings = {}
+
+    if use_snapshot:
+        start = time.perf_counter()
+        graph = read_snapshot(snapshot_path(excel_file), excel_file, normalize)
+        timings['snapshot'] = time.perf_counter() - start
+        if graph is not None:
+            if normalize:
+                start = time.perf_counter()
+                graph.normalize_prerequisites()
+                timings['normalize'] = time.perf_counter() - start
+            return graph
+
+    graph = load_excel_graph(excel_file, timings)
+
+    if normalize:
+        start = time.perf_counter()
+        graph.normalize_prerequisites()
+        timings['normalize'] = time.perf_counter() - start
+
+    if use_snapshot:
+        start = time.perf_counter()
+        try:
+            write_snapshot(graph, snapshot_path(excel_file), excel_file, normalize)
+        except OSError:
+            # the snapshot is only a cache, so a read-only directory just means the next load is slow too
+            pass
+        timings['snapshot'] += time.perf_counter() - start
+
+    return graph
+
+
+def load_excel_graph(excel_file: str, timings: Optional[dict[str, float]] = None) -> Graph:
     """
+    Loads information from an excel_file into an instance of the graph class without using a snapshot.
+
+    Only the course name, prerequisite and exclusion columns are read, and each phase works on whole columns.
+    If timings is given, the number of seconds spent in each phase is stored in it under 'read' (reading the
+    Excel file), 'tokenize' (splitting every requisite string), 'parse' (parsing every prerequisite) and
+    'link' (adding the courses, prerequisites and exclusions to the graph).
+
+    Two courses that list each other as exclusions are mutual exclusions, so no pathway has both of them:
+    >>> import os, tempfile, pandas
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(directory.name, 'courses.xlsx')
+    >>> pandas.DataFrame({'Course Name': ['MAT135H1', 'MAT136H1', 'MAT137Y1', 'MAT157Y1', 'STA257H1'],
+    ...                   'Prerequisites': ['', '', '', '', 'MAT135H1/MAT137Y1,MAT136H1/MAT157Y1'],
+    ...                   'Exclusion': ['', '', 'MAT157Y1', 'MAT137Y1', '']}).to_excel(path, index=False)
+    >>> g = load_excel_graph(path)
+    >>> g.get_course('MAT137Y1').are_exclusions(g.get_course('MAT157Y1'))
+    True
+    >>> [(credits, sorted(courses)) for credits, courses in g.get_prerequisites('STA257H1', set(), set(), 4.0)]
+    [(1.0, ['MAT135H1', 'MAT136H1']), (1.5, ['MAT135H1', 'MAT157Y1']), (1.5, ['MAT136H1', 'MAT137Y1'])]
+    >>> directory.cleanup()
+    """
+    if timings is None:
+        timings = {}
+
+    # pandas is slow to import, so it is only imported when the Excel file actually needs to be read
+    import pandas
+
+    start = time.perf_counter()
+    dataframe = pandas.read_excel(excel_file, usecols=['Course Name', 'Prerequisites', 'Exclusion'])
+    course_codes = dataframe['Course Name'].to_numpy(dtype=object).tolist()
+    prerequisite_cells = dataframe['Prerequisites'].to_numpy(dtype=object).tolist()
+    exclusion_cells = dataframe['Exclusion'].to_numpy(dtype=object).tolist()
+    timings['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prerequisite_tokens = tokenize_column(prerequisite_cells)
+    exclusion_tokens = tokenize_column(exclusion_cells)
+    timings['tokenize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prerequisite_lists = [parse_tokens(tokens) for tokens in prerequisite_tokens]
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
     graph = Graph()
-    dataframe = pandas.read_excel(excel_file)
+    graph.add_courses(course_codes)
+    for course_code, prerequisites_list, exclusions_list in zip(course_codes, prerequisite_lists, exclusion_tokens):
+        for subset in prerequisites_list:
+            graph.add_prerequisites(subset, course_code)
 
-    # add courses as vertices in the graph
-    for index, row in dataframe.iterrows():
-        # course code
-        course_code = row['Course Name']
-        graph.add_course(course_code)
-
-    # add everything else (i.e. prerequisites)
-    for index, row in dataframe.iterrows():
-        # prerequisites
-        prerequisites = row['Prerequisites']
-        if not isinstance(prerequisites, float):
-            prerequisites_list = parse_requisites(prerequisites)
-
-            for subset in prerequisites_list:
-                graph.add_prerequisites(subset, row['Course Name'])
-
-        # exclusions
-        exclusions = row['Exclusion']
-        if not isinstance(exclusions, float):
-            exclusions_list = split_string(exclusions)
-            for substring in exclusions_list:
-                if substring.isalnum():
-                    graph.add_exclusion(row['Course Name'], substring)
+        exclusions = {substring for substring in exclusions_list if substring.isalnum()}
+        if exclusions:
+            graph.add_exclusion(course_code, exclusions)
+    timings['link'] = time.perf_counter() - start
 
     return graph
 
 
+def apply_delta(graph: Graph, cleaned_rows: list[dict[str, Any]], removed: list[str]) -> None:
+    """
+    Updates a graph loaded from the clean data of an earlier scrape to match a re-scrape of the calendar, given
+    the cleaned rows of the courses the re-scrape affected (see data_cleaning.clean_delta) and the codes of the
+    courses it removed.
+
+    New courses are added, the prerequisites and exclusions of every course in cleaned_rows are replaced with
+    the ones in its row (read like load_excel_graph reads them), and then the removed courses are removed.
+    Preconditions:
+        - every course that refers to a removed course is in cleaned_rows
+    """
+    graph.add_courses([row['Course Name'] for row in cleaned_rows])
+    for row in cleaned_rows:
+        course_code = row['Course Name']
+        graph.set_prerequisites(course_code, BoolOp('and', []))
+        for subset in parse_tokens(tokenize_column([row['Prerequisites']])[0]):
+            graph.add_prerequisites(subset, course_code)
+
+        graph.set_exclusions(course_code, {substring for substring in tokenize_column([row['Exclusion']])[0]
+                                           if substring.isalnum()})
+
+    # a removed course may be a prerequisite of another removed course, so no course is removed until none of
+    # them have prerequisites
+    for course_code in removed:
+        graph.set_prerequisites(course_code, BoolOp('and', []))
+    for course_code in removed:
+        graph.remove_course(course_code)
+
+
+def tokenize_column(cells: list) -> list[list[str]]:
+    """
+    Splits every requisite string in cells like split_string. Empty cells (which pandas reads as NaN floats)
+    produce no tokens.
+
+    >>> tokenize_column(['(MAT135,MAT136)/MAT137', float('nan')])
+    [['(', 'MAT135', ',', 'MAT136', ')', '/', 'MAT137'], []]
+    """
+    return [_TOKEN.findall(cell) if isinstance(cell, str) else [] for cell in cells]
+
+
 def parse_requisites(s: str) -> list[list]:
     """
     Parses a string of requisites into the format we want.
 
+    Commas separate requirements that all need to be met, slashes separate alternatives, and brackets group a
+    comma separated list of requirements into a tuple (which can itself be one of several alternatives).
+
     >>> parse_requisites('MAT137,CSC110,CSC111')
     [['MAT137'], ['CSC110'], ['CSC111']]
     >>> parse_requisites('MAT137/CSC110/CSC111')
@@ -60,110 +186,78 @@ def parse_requisites(s: str) -> list[list]:
     [[('MAT135', 'MAT136')]]
     >>> parse_requisites('MAT137/(MAT135,MAT136),CSC110,CSC111')
     [['MAT137', ('MAT135', 'MAT136')], ['CSC110'], ['CSC111']]
+    >>> parse_requisites('(MAT135/MAT137,(CSC110,CSC111)/CSC148)')
+    [[(['MAT135', 'MAT137'], [('CSC110', 'CSC111'), 'CSC148'])]]
     """
+    return parse_tokens(split_string(s))
 
-    if s in '':
-        return []
-
-    lst = split_string(s)
-    i = 1
-
-    if not lst:
-        return []
-
-    parse_brackets(lst)
-    check_or(lst)
-
-    lst[0] = [lst[0]]
-
-    while i < len(lst):
 
-        if lst[i] == '/':
-            lst.pop(i)
-            course = lst.pop(i)
-            lst[i - 1].append(course)
-
-        elif lst[i] == ',':
-            lst.pop(i)
-            lst[i] = [lst[i]]
-            i += 1
-
-    return lst
+def parse_tokens(tokens: list[str]) -> list[list]:
+    """
+    Parses a list of requisite tokens, as produced by split_string, into the format parse_requisites returns.
+    Each token is looked at once, so this takes time linear in the number of tokens.
 
+    Raises ValueError if the tokens are not a valid list of requisites.
 
-def parse_brackets(lst: list) -> None:
-    """
-    Helper function to parse_requisites that parses brackets specifically.
-    Calls parse_brackets_helper as a helper.
+    >>> parse_tokens(['MAT137', '/'])
+    Traceback (most recent call last):
+    ValueError: expected a course or '(' at token 3, not the end of the requisites
     """
+    if not tokens:
+        return []
 
+    groups, i = [], 0
     while True:
-        try:
-            i = lst.index(')')
-        except ValueError:
-            return lst
-
-        close_bracket_index = i
-        open_bracket_index = close_bracket_index
+        group, i = _parse_alternatives(tokens, i)
+        groups.append(group)
+        if i == len(tokens):
+            return groups
+        _expect(tokens, i, ',')
+        i += 1
 
-        while lst[open_bracket_index] != '(':
-            open_bracket_index -= 1
 
-        parse_brackets_helper(lst, open_bracket_index)
-
-
-def parse_brackets_helper(lst: list, start: int) -> None:
+def _parse_alternatives(tokens: list[str], i: int) -> tuple[list, int]:
     """
-    Recursive helper for parse_brackets.
-    Takes in a list where start is the index of an open bracket recursively parses through the list
-    until it hits its corresponding closing bracket.
-
-    Preconditions:
-    - lst[start] == '('
+    Parses the slash separated alternatives starting at tokens[i].
+    Returns the list of alternatives and the index of the first token after them.
     """
-    i = start
-    lst.pop(i)
+    item, i = _parse_item(tokens, i)
+    alternatives = [item]
+    while i < len(tokens) and tokens[i] == '/':
+        item, i = _parse_item(tokens, i + 1)
+        alternatives.append(item)
+    return alternatives, i
 
-    lst[i] = [lst[i]]
 
-    i += 1
+def _parse_item(tokens: list[str], i: int) -> tuple[Any, int]:
+    """
+    Parses the course or bracketed requirements starting at tokens[i].
+    Returns the course code or the tuple of requirements (where each requirement is a single item, or a list if
+    it has alternatives) and the index of the first token after it.
+    """
+    if i == len(tokens) or tokens[i] in (',', '/', ')'):
+        found = repr(tokens[i]) if i < len(tokens) else 'the end of the requisites'
+        raise ValueError(f"expected a course or '(' at token {i + 1}, not {found}")
+    elif tokens[i] != '(':
+        return tokens[i], i + 1
 
+    requirements, i = [], i + 1
     while True:
-        if lst[i] == ')':
-            break
-
-        if lst[i] == '/':
-            lst.pop(i)
-            if lst[i] == '(':
-                parse_brackets_helper(lst, i)
-
-            if not isinstance(lst[i - 1][-1], list):
-                lst[i - 1][-1] = [lst[i - 1][-1]]
+        alternatives, i = _parse_alternatives(tokens, i)
+        requirements.append(alternatives[0] if len(alternatives) == 1 else alternatives)
+        if i < len(tokens) and tokens[i] == ')':
+            return tuple(requirements), i + 1
+        _expect(tokens, i, ',')
+        i += 1
 
-            course = lst.pop(i)
-            lst[i - 1][-1].append(course)
-            continue
 
-        elif lst[i] == ',':
-            lst.pop(i)
-            if lst[i] == '(':
-                parse_brackets_helper(lst, i)
-            course = lst.pop(i)
-            lst[i - 1].append(course)
-
-    lst.pop(i)
-    lst[i - 1] = tuple(lst[i - 1])
-
-
-def check_or(lst: list) -> None:
+def _expect(tokens: list[str], i: int, token: str) -> None:
     """
-    If any elements of the list are tuples containing only one list, drop the tuple brackets.
-    - tuples are 'and' but sometimes there is only a slash (meaning or).
+    Raises ValueError if tokens[i] is not token.
     """
-    for i in range(len(lst)):
-        element = lst[i]
-        if ((isinstance(element, list)) and len(element) == 1 and isinstance(element[0], list)):
-            lst[i] = lst[i][0]
+    if i == len(tokens) or tokens[i] != token:
+        found = repr(tokens[i]) if i < len(tokens) else 'the end of the requisites'
+        raise ValueError(f'expected {token!r} at token {i + 1}, not {found}')
 
 
 def split_string(s: str) -> list:
@@ -173,23 +267,7 @@ def split_string(s: str) -> list:
     >>> split_string('(MAT135,MAT136)/MAT137')
     ['(', 'MAT135', ',', 'MAT136', ')', '/', 'MAT137']
     """
-    split_lst = []
-    curr_str = ''
-    for char in s:
-        if char in [',', '/', '(', ')']:
-            if curr_str != '':
-                split_lst.append(curr_str)
-                curr_str = ''
-
-            split_lst.append(char)
-
-        else:
-            curr_str += char
-
-    if curr_str != '':
-        split_lst.append(curr_str)
-
-    return split_lst
+    return _TOKEN.findall(s)
 
 
 if __name__ == '__main__':
@@ -200,7 +278,8 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['pandas', 'graph_course'],    # the names (strs) of imported modules
+        'extra-imports': ['re', 'time', 'pandas', 'expression_tree_classes', 'graph_course', 'graph_snapshot'],
+        # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
         'max-nested-blocks': 4
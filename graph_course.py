@@ -9,8 +9,14 @@ Creators:
 - Vennise Ho
 """
 from __future__ import annotations
-from typing import Any
-from expression_tree_classes import _Course, Tree, BoolOp
+import functools
+import heapq
+import itertools
+import math
+import operator
+from typing import Any, Iterator, Optional
+from expression_tree_classes import Expr, _Course, Tree, BoolOp, SubsetIndex, count_nodes, minimal_bits, normalize
+from query_cache import QueryCache
 
 
 class Graph:
@@ -24,11 +30,66 @@ class Graph:
     #   - _courses:
     #       A collection of the courses contained in this graph.
     #       Maps course code to _Course object.
+    #   - _ids:
+    #       Maps course code to the index of the bit representing that course in a pathway bitset.
+    #   - _codes:
+    #       The course codes in this graph, in order of their bit index (the inverse of _ids).
+    #   - _full_year_bits:
+    #       A bitset of every full year (Y) course in this graph.
+    #   - _dependents:
+    #       Maps course code to the codes of the courses whose prerequisites refer to that course directly.
+    #   - _entry_courses:
+    #       The courses whose prerequisites are met without completing any course, or None if they have not been
+    #       found since the last change.
+    #   - _exclusion_index:
+    #       For each course id, the bitset of the exclusions of that course and the bitset of the courses it is a
+    #       mutual exclusion with (each is an exclusion of the other), and the bitset of every course that is in
+    #       such a pair; or None if they have not been found since the last change (see _get_exclusion_index).
+    #   - _closures:
+    #       Maps each course whose closure was needed since the last change to the bitset of every course that can
+    #       be reached from it through prerequisites, itself included (see CreditSolver).
+    #   - _version:
+    #       The number of times the courses, prerequisites or exclusions in this graph have changed.
+    #   - _memo:
+    #       Maps each course expanded since the last change to its minimal pathway bitsets
+    #       (see Expr.evaluate_bits).
+    #   - _query_cache:
+    #       The cache get_prerequisites answers repeated queries from, or None if every query is answered again.
 
     _courses: dict[str, _Course]
+    _ids: dict[str, int]
+    _codes: list[str]
+    _full_year_bits: int
+    _dependents: dict[str, set[str]]
+    _entry_courses: Optional[set[str]]
+    _exclusion_index: Optional[tuple[list[int], list[int], int]]
+    _closures: dict[_Course, int]
+    _version: int
+    _memo: dict[Expr, list[int]]
+    _query_cache: Optional[QueryCache]
 
     def __init__(self) -> None:
         self._courses = {}
+        self._ids = {}
+        self._codes = []
+        self._full_year_bits = 0
+        self._dependents = {}
+        self._entry_courses = None
+        self._exclusion_index = None
+        self._closures = {}
+        self._version = 0
+        self._memo = {}
+        self._query_cache = QueryCache()
+
+    def _invalidate(self) -> None:
+        """Record that the courses, prerequisites or exclusions in this graph changed, discarding every memoized
+        pathway (and, since _version changes, every cached query result).
+        """
+        self._version += 1
+        self._memo.clear()
+        self._entry_courses = None
+        self._exclusion_index = None
+        self._closures.clear()
 
     def valid_course(self, course: str) -> bool:
         """Returns True if course in self._courses.
@@ -45,7 +106,52 @@ class Graph:
             - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
         """
         if course_code not in self._courses:
+            self._invalidate()
             self._courses[course_code] = _Course(course_code)
+            self._ids[course_code] = len(self._codes)
+            self._codes.append(course_code)
+            if course_code[6] == 'Y':
+                self._full_year_bits |= 1 << self._ids[course_code]
+
+    def add_courses(self, course_codes: list[str]) -> None:
+        """Add every course in course_codes to this graph at once, in order (see add_course).
+        Preconditions:
+            - all(len(course_code) == 8 for course_code in course_codes)
+            - all(course_code[6:8] == 'H1' or course_code[6:8] == 'Y1' for course_code in course_codes)
+        """
+        new_codes = [code for code in dict.fromkeys(course_codes) if code not in self._courses]
+        if new_codes:
+            self._invalidate()
+        self._courses.update((code, _Course(code)) for code in new_codes)
+        self._ids.update(zip(new_codes, range(len(self._codes), len(self._codes) + len(new_codes))))
+        self._codes.extend(new_codes)
+        for code in new_codes:
+            if code[6] == 'Y':
+                self._full_year_bits |= 1 << self._ids[code]
+
+    def remove_course(self, course_code: str) -> None:
+        """Remove a course from this graph, along with its prerequisites and every exclusion that refers to it.
+        Raises ValueError if the course is not in this graph, or if another course still has it in its
+        prerequisites.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        """
+        if course_code not in self._courses or self._dependents.get(course_code):
+            raise ValueError
+
+        self._invalidate()
+        course = self._courses.pop(course_code)
+        for code in course.prerequisites.referenced_courses():
+            self._dependents[code].discard(course_code)
+        self._dependents.pop(course_code, None)
+        for other in self._courses.values():
+            other.exclusions.discard(course)
+
+        # every course after the removed one moves down a bit, so the bitsets are numbered again
+        self._codes.remove(course_code)
+        self._ids = {code: i for i, code in enumerate(self._codes)}
+        self._full_year_bits = self._set_to_bits({code for code in self._codes if code[6] == 'Y'})
 
     def add_exclusion(self, course_code: str, exclusion: set[str]) -> None:
         """Add an exclusion to course code
@@ -55,12 +161,26 @@ class Graph:
             - all(ex in self._courses for ex in exclusion)
         """
         if course_code in self._courses:
+            self._invalidate()
             for ex in exclusion:
                 if ex in self._courses:
                     self._courses[course_code].exclusions.add(self._courses[ex])
         else:
             raise ValueError
 
+    def set_exclusions(self, course_code: str, exclusions: set[str]) -> None:
+        """Replaces the exclusions of course code with the given courses. Codes that are not in this graph are
+        ignored, like in add_exclusion.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        """
+        if course_code in self._courses:
+            self._invalidate()
+            self._courses[course_code].exclusions = {self._courses[ex] for ex in exclusions if ex in self._courses}
+        else:
+            raise ValueError
+
     def add_prerequisites(self, prereq: list, course: str) -> None:
         """Updates a courses prerequisites. This funcitons takes in a set of related courses or "options"
         to meet a prerequisite requirement. The function will add one of these courses to all the current sets
@@ -71,11 +191,167 @@ class Graph:
             - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
         """
         if course in self._courses:
+            self._invalidate()
             course_v = self._courses[course]
-            course_v.prerequisites.operand.append(self.create_boolop(prereq))
+            prerequisites = self.create_boolop(prereq)
+            course_v.prerequisites.operand.append(prerequisites)
+            self._add_dependents(course, prerequisites)
+        else:
+            raise ValueError
+
+    def set_prerequisites(self, course: str, prerequisites: BoolOp) -> None:
+        """Replaces a courses prerequisites with the given BoolOp.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+            - all courses in prerequisites are in this graph
+        """
+        if course in self._courses:
+            self._invalidate()
+            for code in self._courses[course].prerequisites.referenced_courses():
+                self._dependents[code].discard(course)
+            self._courses[course].prerequisites = prerequisites
+            self._add_dependents(course, prerequisites)
         else:
             raise ValueError
 
+    def normalize_prerequisites(self) -> dict[str, int]:
+        """Simplify the prerequisites of every course in this graph without changing what they require (see
+        expression_tree_classes.normalize), interning identical subexpressions across courses so each is stored
+        once. A course's own prerequisites BoolOp is never shared, so it can still be added to.
+
+        Return the number of nodes in the prerequisite trees ('nodes_before', 'nodes_after', see count_nodes)
+        and the number of distinct BoolOps ('boolops_before', 'boolops_after') before and after.
+
+        >>> g = Graph()
+        >>> g.add_courses(['CSC110Y1', 'CSC111H1', 'MAT137Y1', 'CSC236H1'])
+        >>> g.add_prerequisites([('CSC110Y1', 'CSC111H1')], 'CSC236H1')
+        >>> g.add_prerequisites(['CSC111H1', 'MAT137Y1'], 'CSC236H1')
+        >>> g.add_prerequisites(['CSC110Y1'], 'CSC236H1')
+        >>> g.normalize_prerequisites()
+        {'nodes_before': 13, 'nodes_after': 6, 'boolops_before': 8, 'boolops_after': 4}
+        >>> print(g.course_to_tree('CSC236H1'))
+        CSC236H1
+          and
+            CSC110Y1
+            CSC111H1
+        """
+        courses = list(self._courses.values())
+        nodes_before, boolops_before = count_nodes([course.prerequisites for course in courses])
+
+        interned = {}
+        for course in courses:
+            prerequisites = normalize(course.prerequisites, interned)
+            if prerequisites is None:
+                course.prerequisites = BoolOp('and', [])
+            elif prerequisites.code == 'and':
+                course.prerequisites = BoolOp('and', list(prerequisites.operand))
+            else:
+                course.prerequisites = BoolOp('and', [prerequisites])
+
+        # absorption can drop a course from a course's prerequisites
+        self._dependents = {}
+        for course in courses:
+            self._add_dependents(course.code, course.prerequisites)
+        self._invalidate()
+
+        nodes_after, boolops_after = count_nodes([course.prerequisites for course in courses])
+        return {'nodes_before': nodes_before, 'nodes_after': nodes_after,
+                'boolops_before': boolops_before, 'boolops_after': boolops_after}
+
+    def _add_dependents(self, course: str, prerequisites: Expr) -> None:
+        """Record course as a dependent of every course that prerequisites refers to."""
+        for code in prerequisites.referenced_courses():
+            self._dependents.setdefault(code, set()).add(course)
+
+    def get_dependents(self, course_code: str, depth: Optional[int] = 1) -> set[str]:
+        """Returns the courses that have the given course in their prerequisites, either directly (depth 1) or
+        through a chain of at most depth prerequisites. If depth is None, every course that depends on the given
+        course through any chain of prerequisites is returned.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+            - depth is None or depth >= 0
+        """
+        dependents = set()
+        level = {course_code}
+        while level and (depth is None or depth > 0):
+            level = {dependent for code in level for dependent in self._dependents.get(code, ())} - dependents
+            dependents.update(level)
+            if depth is not None:
+                depth -= 1
+        return dependents
+
+    def unlocked_by(self, completed: set[str]) -> set[str]:
+        """Returns the courses that refer to a completed course in their prerequisites, have not been completed
+        and whose prerequisites are met by the completed courses (see Expr.is_satisfied).
+        Only the direct dependents of the completed courses are checked, not every course in this graph.
+        Preconditions:
+            - all(code in self._courses for code in completed)
+        """
+        candidates = {dependent for code in completed for dependent in self._dependents.get(code, ())}
+        return {code for code in candidates - completed
+                if self._courses[code].prerequisites.is_satisfied(completed)}
+
+    def is_satisfied(self, course_code: str, completed: set[str]) -> bool:
+        """Returns whether the completed courses meet the prerequisites of the given course.
+        The prerequisite BoolOp is checked directly (see Expr.is_satisfied), without expanding it into pathways.
+
+        >>> g = Graph()
+        >>> g.add_courses(['MAT135H1', 'MAT136H1', 'MAT137Y1', 'MAT237Y1'])
+        >>> g.add_prerequisites(['MAT137Y1', ('MAT135H1', 'MAT136H1')], 'MAT237Y1')
+        >>> g.is_satisfied('MAT237Y1', {'MAT135H1'})
+        False
+        >>> g.is_satisfied('MAT237Y1', {'MAT135H1', 'MAT136H1'})
+        True
+
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        """
+        return self._courses[course_code].prerequisites.is_satisfied(completed)
+
+    def courses_satisfied(self, course_codes: list[str], completed: set[str]) -> dict[str, bool]:
+        """Returns whether the completed courses meet the prerequisites of each of the given courses.
+        Preconditions:
+            - all(code in self._courses for code in course_codes)
+        """
+        return {code: self._courses[code].prerequisites.is_satisfied(completed) for code in course_codes}
+
+    def students_satisfied(self, course_code: str, completed_sets: list[set[str]]) -> list[bool]:
+        """Returns whether each student's completed courses meet the prerequisites of the given course.
+        Only the courses that appear in the prerequisites matter, so students who completed the same of those
+        courses share one check.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        """
+        prerequisites = self._courses[course_code].prerequisites
+        referenced = prerequisites.referenced_courses()
+        results = {}
+        satisfied = []
+        for completed in completed_sets:
+            relevant = frozenset(referenced.intersection(completed))
+            if relevant not in results:
+                results[relevant] = prerequisites.is_satisfied(relevant)
+            satisfied.append(results[relevant])
+        return satisfied
+
+    def entry_courses(self) -> set[str]:
+        """Returns the courses whose prerequisites are met without completing any course."""
+        if self._entry_courses is None:
+            self._entry_courses = {code for code, course in self._courses.items()
+                                   if course.prerequisites.is_satisfied(set())}
+        return set(self._entry_courses)
+
+    def eligible_courses(self, completed: set[str]) -> set[str]:
+        """Returns every course that has not been completed, whose prerequisites are met by the completed courses
+        and that is not an exclusion of a completed course.
+        Preconditions:
+            - all(code in self._courses for code in completed)
+        """
+        return Planner(self, completed).eligible_courses()
+
     def tuple_to_bool(self, tup: tuple) -> BoolOp:
         """Takes in a tuple of tuples and turns it into a BoolOp"""
         bool_so_far = BoolOp('and', [])
@@ -95,17 +371,7 @@ class Graph:
             - len(course_code) == 8
             - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
         """
-        prereqs = self._courses[course_code].prerequisites.evaluate()
-        prereq_exclusions = [set_prereq for set_prereq in prereqs if not any(
-            self._courses[pre].are_exclusions(self._courses[exclusion]) for pre in set_prereq for exclusion in
-            set_prereq)]
-
-        for ex_prereqs in prereq_exclusions.copy():
-            if any(ex_prereq_pathway.issubset(ex_prereqs) and ex_prereq_pathway != ex_prereqs for ex_prereq_pathway in
-                   prereq_exclusions.copy()):
-                prereq_exclusions.remove(ex_prereqs)
-
-        return prereq_exclusions
+        return [self._bits_to_set(bits) for bits in self._pathway_bits(course_code)]
 
     def get_prerequisites(self, course_code: str, completed: set[str], exclude: set[str], credit: float) -> list:
         """Returns the pathways under the specified number of credits to meet the prerequisite for a given course
@@ -117,21 +383,298 @@ class Graph:
             - all(ex in self._courses for ex in exclusion)
             - all(code in self._courses for code in completed)
         """
-        prereqs = self.get_all_prerequisites(course_code)
-        new_prereqs = [prereq_set for prereq_set in prereqs if not any(prereq in exclude for prereq in prereq_set)]
-        not_completed = [{prereq for prereq in prereq_set if prereq not in completed} for prereq_set in new_prereqs]
-        all_exclusions = {course_ex.code for completed_course in completed for course_ex in
-                          self._courses[completed_course].exclusions}
-        excluded = [prereq_set for prereq_set in not_completed if
-                    not any(prereq in all_exclusions for prereq in prereq_set)]
+        key = (course_code, frozenset(completed), frozenset(exclude), credit)
+        if self._query_cache is not None:
+            result = self._query_cache.get(self, key)
+            if result is not None:
+                return result
+
+        exclude_bits = self._set_to_bits(exclude)
+        completed_bits = self._set_to_bits(completed)
+        all_exclusions = self._blocked_bits(completed)
+
+        not_completed = [bits & ~completed_bits for bits in self._pathway_bits(course_code)
+                         if not bits & exclude_bits]
+        excluded = minimal_bits([bits for bits in not_completed if not bits & all_exclusions])
+
+        pathways = [(self._count_credits_bits(bits), self._bits_to_set(bits)) for bits in excluded]
+        result = sorted([pathway for pathway in pathways if pathway[0] <= credit],
+                        key=lambda pathway: (pathway[0], sorted(pathway[1])))
+
+        if self._query_cache is not None:
+            self._query_cache.put(self, key, result)
+        return result
+
+    def set_query_cache(self, cache: Optional[QueryCache]) -> None:
+        """Answer repeated get_prerequisites queries from cache from now on (see query_cache), or answer every
+        query again if cache is None. Every graph starts with its own in-memory cache.
+
+        >>> g = Graph()
+        >>> g.add_courses(['CSC110Y1', 'CSC111H1'])
+        >>> g.add_prerequisites(['CSC110Y1'], 'CSC111H1')
+        >>> g.set_query_cache(QueryCache(max_entries=16))
+        >>> g.get_prerequisites('CSC111H1', set(), set(), 2.0)
+        [(1.0, {'CSC110Y1'})]
+        >>> g.get_prerequisites('CSC111H1', set(), set(), 2.0)
+        [(1.0, {'CSC110Y1'})]
+        >>> g.get_query_cache().stats()['hits']
+        1
+        """
+        self._query_cache = cache
+
+    def get_query_cache(self) -> Optional[QueryCache]:
+        """Returns the cache get_prerequisites answers repeated queries from, or None if there is none."""
+        return self._query_cache
+
+    def get_prerequisites_batch(self, course_code: str,
+                                queries: list[tuple[set[str], set[str], float]]) -> list[list]:
+        """Returns get_prerequisites(course_code, completed, exclude, credit) for every (completed, exclude, credit)
+        tuple in queries, in the same order.
+
+        The course's pathways are found once and stored as the rows of a matrix over the courses that appear in
+        them, with every student encoded the same way, so removing completed courses, filtering out excluded
+        pathways and applying the credit cap are a few matrix products for the whole batch. Only the search for
+        minimal pathways is done per student, on the pathways that are left.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+            - all(all(code in self._courses for code in completed) for completed, _, _ in queries)
+        """
+        # numpy is slow to import, so it is only imported when a batch of queries is answered
+        import numpy
+
+        pathways = self._pathway_bits(course_code)
+        codes = sorted(self._bits_to_set(functools.reduce(operator.or_, pathways, 0)), key=self._ids.get)
+        if not pathways or not queries:
+            return [[] for _ in queries]
+        columns = {code: column for column, code in enumerate(codes)}
+
+        matrix = numpy.zeros((len(pathways), len(codes)))
+        for row, bits in enumerate(pathways):
+            matrix[row, [columns[code] for code in self._bits_to_set(bits)]] = 1
+        weights = numpy.array([1.0 if code[6] == 'Y' else 0.5 for code in codes])
+
+        # one row per student: the courses they completed, want to avoid, and cannot take because of an
+        # exclusion of a completed course
+        completed, exclude, blocked = (numpy.zeros((len(queries), len(codes))) for _ in range(3))
+        for student, (completed_set, exclude_set, _) in enumerate(queries):
+            all_exclusions = self._bits_to_set(self._blocked_bits(completed_set))
+            for student_matrix, course_set in ((completed, completed_set), (exclude, exclude_set),
+                                               (blocked, all_exclusions)):
+                student_matrix[student, [columns[code] for code in course_set if code in columns]] = 1
+        remaining = 1 - completed
+
+        credits = (matrix @ weights)[:, None] - matrix @ (completed * weights).T
+        caps = numpy.array([credit for _, _, credit in queries])
+        keep = ((matrix @ exclude.T == 0) & (matrix @ (blocked * remaining).T == 0) & (credits <= caps)).T
 
-        for with_excluded in excluded.copy():
-            if any(excluded_pathway.issubset(with_excluded) and excluded_pathway != with_excluded for excluded_pathway
-                   in excluded.copy()):
-                excluded.remove(with_excluded)
+        results = []
+        for student in range(len(queries)):
+            rows = numpy.unique(matrix[keep[student]] * remaining[student], axis=0)
+            # a row is a subset of another if it has no course the other does not have
+            subsets = rows @ (1 - rows).T == 0
+            rows = rows[subsets.sum(axis=0) == 1]
+            pathways = [(credit, set(itertools.compress(codes, row)))
+                        for credit, row in zip((rows @ weights).tolist(), rows.astype(bool).tolist())]
+            results.append(sorted(pathways, key=lambda pathway: (pathway[0], sorted(pathway[1]))))
+        return results
 
-        return [pathway for pathway in sorted([(count_credits(course_set), course_set) for course_set in excluded]) if
-                pathway[0] <= credit]
+    def iter_prerequisites(self, course_code: str, completed: set[str], exclude: set[str], credit: float,
+                           k: Optional[int] = None) -> Iterator[tuple[float, set[str]]]:
+        """Yields the same pathways as get_prerequisites, in ascending order of credits, stopping once the next
+        pathway would be over credit or k pathways have been yielded.
+
+        Pathways are found with a best-first search over the choices in the course's prerequisite BoolOp, so only
+        the partial pathways cheaper than the last pathway yielded are ever built.
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+            - all(ex in self._courses for ex in exclusion)
+            - all(code in self._courses for code in completed)
+            - k is None or k >= 0
+        """
+        if not self._courses[course_code].prerequisites.has_pathways():
+            return
+
+        completed_bits = self._set_to_bits(completed)
+        all_exclusions = self._blocked_bits(completed)
+        blocked_bits = self._set_to_bits(exclude) | (all_exclusions & ~completed_bits)
+        counter = itertools.count()
+
+        # each state is (credits, tie breaker, courses chosen so far, expressions still to be satisfied)
+        heap = [(0.0, next(counter), 0, (self._courses[course_code].prerequisites,))]
+        seen = set()
+        found = SubsetIndex()
+        num_found = 0
+        while heap and (k is None or num_found < k) and heap[0][0] <= credit:
+            cost, _, bits, pending = heapq.heappop(heap)
+            if (bits, pending) in seen:
+                continue
+            seen.add((bits, pending))
+
+            if not pending:
+                pathway = bits & ~completed_bits
+                if not found.has_subset(pathway):
+                    found.add(pathway)
+                    num_found += 1
+                    yield cost, self._bits_to_set(pathway)
+                continue
+
+            for new_bits, new_pending in self._expand_state(bits, pending, blocked_bits):
+                # every pathway reached from a state that contains a pathway already yielded is not minimal
+                if new_bits == bits or not found.has_subset(new_bits & ~completed_bits):
+                    heapq.heappush(heap, (self._count_credits_bits(new_bits & ~completed_bits), next(counter),
+                                          new_bits, new_pending))
+
+    def get_cheapest_prerequisites(self, course_codes: list[str], completed: set[str],
+                                   exclude: set[str]) -> Optional[tuple[float, set[str]]]:
+        """Returns the pathway with the fewest credits that meets the prerequisites of every course in course_codes,
+        as a (credits, courses) tuple like get_prerequisites, or None if there is no such pathway. For a single
+        course, this has as many credits as the first pathway iter_prerequisites yields (when several pathways
+        are tied, any one of them may be returned).
+
+        Completed courses are worth no credits, and pathways with an excluded course, an exclusion of a completed
+        course or a pair of mutual exclusions are not allowed. Only the partial pathways that might still be the
+        cheapest are looked at (see CreditSolver), so this does not depend on how many pathways there are.
+
+        >>> g = Graph()
+        >>> g.add_courses(['CSC110Y1', 'CSC111H1', 'CSC108H1', 'CSC148H1', 'CSC236H1'])
+        >>> g.add_prerequisites(['CSC111H1', 'CSC148H1'], 'CSC236H1')
+        >>> g.add_prerequisites(['CSC110Y1', 'CSC108H1'], 'CSC236H1')
+        >>> g.add_prerequisites(['CSC110Y1'], 'CSC111H1')
+        >>> g.add_prerequisites(['CSC108H1'], 'CSC148H1')
+        >>> credits, courses = g.get_cheapest_prerequisites(['CSC236H1'], set(), set())
+        >>> credits, sorted(courses)
+        (1.0, ['CSC108H1', 'CSC148H1'])
+        >>> g.get_cheapest_prerequisites(['CSC236H1'], {'CSC110Y1'}, set())
+        (0.5, {'CSC111H1'})
+        >>> g.get_cheapest_prerequisites(['CSC236H1'], set(), {'CSC108H1', 'CSC110Y1'}) is None
+        True
+
+        A course that is an exclusion of itself is never in a pathway, like in get_prerequisites:
+        >>> g.add_exclusion('CSC148H1', {'CSC148H1'})
+        >>> credits, courses = g.get_cheapest_prerequisites(['CSC236H1'], set(), set())
+        >>> credits, sorted(courses)
+        (1.5, ['CSC110Y1', 'CSC111H1'])
+        >>> [(credits, sorted(courses)) for credits, courses in g.get_prerequisites('CSC236H1', set(), set(), 2.0)]
+        [(1.5, ['CSC110Y1', 'CSC111H1'])]
+
+        Preconditions:
+            - all(code in self._courses for code in course_codes)
+            - all(code in self._courses for code in completed)
+        """
+        return CreditSolver(self, completed, exclude).solve(course_codes)
+
+    def _expand_state(self, bits: int, pending: tuple[Expr, ...],
+                      blocked_bits: int) -> list[tuple[int, tuple[Expr, ...]]]:
+        """Returns the search states reached by satisfying the first expression in pending (see iter_prerequisites).
+        Courses in blocked_bits, courses that are exclusions of a course already in bits, and courses that are
+        exclusions of themselves cannot be added to a pathway.
+        """
+        expr, rest = pending[0], pending[1:]
+        if isinstance(expr, _Course):
+            course_bit = 1 << self._ids[expr.code]
+            mutual_row = self._get_exclusion_index()[1][self._ids[expr.code]]
+            if bits & course_bit:
+                return [(bits, rest)]
+            elif course_bit & blocked_bits or mutual_row & (bits | course_bit):
+                return []
+            else:
+                return [(bits | course_bit, (expr.prerequisites,) + rest)]
+        elif expr.code == 'and':
+            return [(bits, tuple(expr.operand) + rest)]
+        else:
+            options = [operand for operand in expr.operand if operand.has_pathways()]
+            if not options:
+                return [(bits, rest)]
+            return [(bits, (operand,) + rest) for operand in options]
+
+    def _pathway_bits(self, course_code: str) -> list[int]:
+        """Returns the minimal pathway bitsets for the given course that do not contain a pair of courses that are
+        exclusions of each other.
+        """
+        prereqs = self._courses[course_code].prerequisites.evaluate_bits(self._ids, self._memo)
+        return [bits for bits in prereqs if not self._has_mutual_exclusion(bits)]
+
+    def _get_exclusion_index(self) -> tuple[list[int], list[int], int]:
+        """Returns the exclusion index of this graph (see _exclusion_index), building it if it has not been built
+        since the last change. Building it takes time linear in the number of exclusions.
+        """
+        if self._exclusion_index is None:
+            exclusion_rows = [0] * len(self._codes)
+            for i, code in enumerate(self._codes):
+                for ex in self._courses[code].exclusions:
+                    exclusion_rows[i] |= 1 << self._ids[ex.code]
+
+            mutual_rows = [0] * len(self._codes)
+            mutual_bits = 0
+            for i, row in enumerate(exclusion_rows):
+                for ex in self._bits_to_ids(row):
+                    if exclusion_rows[ex] >> i & 1:
+                        mutual_rows[i] |= 1 << ex
+                if mutual_rows[i]:
+                    mutual_bits |= 1 << i
+            self._exclusion_index = (exclusion_rows, mutual_rows, mutual_bits)
+        return self._exclusion_index
+
+    def _has_mutual_exclusion(self, bits: int) -> bool:
+        """Returns whether the pathway bitset contains a pair of courses that are exclusions of each other.
+        Only the courses of the pathway that are in such a pair at all are looked at, one bitwise and each.
+        """
+        _, mutual_rows, mutual_bits = self._get_exclusion_index()
+        return any(mutual_rows[i] & bits for i in self._bits_to_ids(bits & mutual_bits))
+
+    def _blocked_bits(self, completed: set[str]) -> int:
+        """Returns the bitset of the exclusions of the completed courses, which a student who completed them
+        cannot take."""
+        exclusion_rows = self._get_exclusion_index()[0]
+        bits = 0
+        for code in completed:
+            bits |= exclusion_rows[self._ids[code]]
+        return bits
+
+    def blocked_by(self, completed: set[str]) -> set[str]:
+        """Returns the courses that are exclusions of at least one of the completed courses.
+        Preconditions:
+            - all(code in self._courses for code in completed)
+        """
+        return self._bits_to_set(self._blocked_bits(completed))
+
+    def _bits_to_ids(self, bits: int) -> Iterator[int]:
+        """Yields the ids of the courses in a bitset, in increasing order."""
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length() - 1
+            bits ^= lowest
+
+    def _set_to_bits(self, course_set: set[str]) -> int:
+        """Returns the bitset of the courses in course_set. Courses that are not in this graph are ignored."""
+        bits = 0
+        for course in course_set:
+            if course in self._ids:
+                bits |= 1 << self._ids[course]
+        return bits
+
+    def _bits_to_set(self, bits: int) -> set[str]:
+        """Returns the set of course codes in the given bitset."""
+        course_set = set()
+        while bits:
+            lowest = bits & -bits
+            course_set.add(self._codes[lowest.bit_length() - 1])
+            bits ^= lowest
+        return course_set
+
+    def _count_credits_bits(self, bits: int) -> float:
+        """Count the number of credits in a bitset of courses (see count_credits)."""
+        return (bits.bit_count() + (bits & self._full_year_bits).bit_count()) / 2
+
+    def get_course(self, course_code: str) -> _Course:
+        """Returns the vertex of the given course
+        Preconditions:
+            - len(course_code) == 8
+            - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        """
+        return self._courses[course_code]
 
     def course_to_tree(self, course_code: str) -> Tree:
         """Returns a tree of prerequisites based on the course code
@@ -155,6 +698,283 @@ class Graph:
         return bool_so_far
 
 
+class Planner:
+    """The courses a student has completed in a graph, and the courses they are eligible to take next
+    (see Graph.eligible_courses).
+
+    Completing a course only changes whether its dependents and its exclusions are eligible, so mark_completed
+    updates the eligible courses without checking the prerequisites of any other course. If the prerequisites or
+    exclusions in the graph change, the eligible courses are found again from scratch.
+
+    >>> g = Graph()
+    >>> g.add_courses(['CSC110Y1', 'CSC111H1', 'CSC207H1', 'CSC148H1'])
+    >>> g.add_prerequisites(['CSC110Y1'], 'CSC111H1')
+    >>> g.add_prerequisites(['CSC111H1', 'CSC148H1'], 'CSC207H1')
+    >>> planner = Planner(g, set())
+    >>> sorted(planner.eligible_courses())
+    ['CSC110Y1', 'CSC148H1']
+    >>> planner.mark_completed('CSC110Y1')
+    >>> sorted(planner.eligible_courses())
+    ['CSC111H1', 'CSC148H1']
+
+    Representation Invariants:
+        - all(code in self.graph._courses for code in self.completed)
+    """
+    # Private Instance Attributes:
+    #   - _eligible:
+    #       The courses the student is eligible to take, as of _version.
+    #   - _blocked:
+    #       The exclusions of the completed courses.
+    #   - _version:
+    #       The version of graph that _eligible was found for.
+    graph: Graph
+    completed: set[str]
+    _eligible: set[str]
+    _blocked: set[str]
+    _version: int
+
+    def __init__(self, graph: Graph, completed: set[str]) -> None:
+        self.graph = graph
+        self.completed = set(completed)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Find the eligible courses from scratch, from the entry courses of the graph and the dependents of
+        every completed course."""
+        graph = self.graph
+        self._blocked = graph.blocked_by(self.completed)
+        candidates = graph.entry_courses() | graph.unlocked_by(self.completed)
+        self._eligible = candidates - self.completed - self._blocked
+        self._version = graph._version
+
+    def eligible_courses(self) -> set[str]:
+        """Returns the courses the student is eligible to take next."""
+        if self._version != self.graph._version:
+            self._refresh()
+        return set(self._eligible)
+
+    def mark_completed(self, course_code: str) -> None:
+        """Record that the student completed the given course, updating the eligible courses.
+        Preconditions:
+            - course_code in self.graph._courses
+        """
+        if course_code in self.completed:
+            return
+        self.completed.add(course_code)
+        if self._version != self.graph._version:
+            self._refresh()
+            return
+
+        courses = self.graph._courses
+        self._eligible.discard(course_code)
+        for ex in courses[course_code].exclusions:
+            self._blocked.add(ex.code)
+            self._eligible.discard(ex.code)
+        for dependent in self.graph._dependents.get(course_code, ()):
+            if (dependent not in self._eligible and dependent not in self.completed and dependent not in self._blocked
+                    and courses[dependent].prerequisites.is_satisfied(self.completed)):
+                self._eligible.add(dependent)
+
+
+class CreditSolver:
+    """A search for the pathway with the fewest credits that meets the prerequisites of some courses, for a student
+    who has completed some courses and wants to avoid others (see Graph.get_cheapest_prerequisites).
+
+    This is an A* search over the prerequisite AND/OR graph. A state is the courses chosen so far and the 'or's
+    they do not meet yet: every course an 'and' or a chosen course requires is chosen straight away, so the search
+    only branches on the options of an 'or', and an 'or' that the chosen courses already meet is dropped. States
+    are expanded in order of their credits plus a lower bound on the credits still needed, so the first state
+    with no 'or' left is a cheapest pathway.
+
+    The lower bound of an expression is found once per search, bottom up: a course needs its own credits plus
+    those of its prerequisites, an 'and' at least as many as its most expensive operand and an 'or' at least as
+    many as its cheapest option. Courses that are already chosen are taken off the bound of the 'or's they can
+    be reached from, and the bounds of 'or's that share no course are added up.
+
+    >>> g = Graph()
+    >>> g.add_courses(['MAT135H1', 'MAT136H1', 'MAT137Y1', 'MAT223H1', 'MAT235Y1', 'MAT237Y1'])
+    >>> g.add_prerequisites(['MAT135H1'], 'MAT136H1')
+    >>> g.add_prerequisites(['MAT136H1', 'MAT137Y1'], 'MAT237Y1')
+    >>> g.add_prerequisites(['MAT136H1', 'MAT223H1'], 'MAT235Y1')
+    >>> credits, courses = CreditSolver(g, set(), set()).solve(['MAT237Y1', 'MAT235Y1'])
+    >>> credits, sorted(courses)
+    (1.0, ['MAT135H1', 'MAT136H1'])
+
+    Instance Attributes:
+        - graph: the graph the courses are in
+    """
+    # Private Instance Attributes:
+    #   - _completed_bits:
+    #       The bitset of the completed courses, which are worth no credits.
+    #   - _blocked_bits:
+    #       The bitset of the courses that cannot be chosen: the excluded courses, and the exclusions of the
+    #       completed courses that were not completed themselves.
+    #   - _bounds:
+    #       Maps each expression looked at so far to a lower bound on the credits of the courses needed to meet it
+    #       (infinity if it cannot be met).
+    #   - _closures:
+    #       Maps each BoolOp looked at so far to the bitset of every course that can be reached from it (the
+    #       closures of courses are kept in the graph, see Graph._closures).
+    graph: Graph
+    _completed_bits: int
+    _blocked_bits: int
+    _bounds: dict[Expr, float]
+    _closures: dict[Expr, int]
+
+    def __init__(self, graph: Graph, completed: set[str], exclude: set[str]) -> None:
+        self.graph = graph
+        self._completed_bits = graph._set_to_bits(completed)
+        self._blocked_bits = graph._set_to_bits(exclude) | (graph._blocked_bits(completed) & ~self._completed_bits)
+        self._bounds = {}
+        self._closures = {}
+
+    def solve(self, course_codes: list[str]) -> Optional[tuple[float, set[str]]]:
+        """Returns the pathway with the fewest credits that meets the prerequisites of every course in course_codes,
+        or None if there is no such pathway (see Graph.get_cheapest_prerequisites).
+        Preconditions:
+            - all(code in self.graph._courses for code in course_codes)
+        """
+        start = self._settle(0, [self.graph._courses[code].prerequisites for code in course_codes])
+        if start is None:
+            return None
+        counter = itertools.count()
+
+        # each state is (credits plus lower bound, -credits, tie breaker, courses chosen, 'or's not met yet); of
+        # two states with the same estimate, the one further along is expanded first
+        heap = [(self._remaining_bound(*start), 0.0, next(counter)) + start]
+        seen = set()
+        while heap:
+            _, _, _, bits, pending = heapq.heappop(heap)
+            if (bits, pending) in seen:
+                continue
+            seen.add((bits, pending))
+            if not pending:
+                return self._credits(bits), self.graph._bits_to_set(bits & ~self._completed_bits)
+
+            # branching on the 'or' with the fewest options keeps the number of states down
+            choice = min(pending, key=lambda expr: len(expr.operand))
+            rest = [expr for expr in pending if expr is not choice]
+            for option in choice.operand:
+                if not option.has_pathways():
+                    # an operand without pathways is not an option (see Expr.is_satisfied)
+                    continue
+                state = self._settle(bits, rest + [option])
+                if state is not None:
+                    bound = self._remaining_bound(*state)
+                    if bound != math.inf:
+                        credits = self._credits(state[0])
+                        heapq.heappush(heap, (credits + bound, -credits, next(counter)) + state)
+        return None
+
+    def _settle(self, bits: int, pending: list[Expr]) -> Optional[tuple[int, frozenset[BoolOp]]]:
+        """Returns the state reached by choosing every course that bits and pending require, until only 'or's are
+        left: the courses chosen, and the 'or's they do not meet. Returns None if a course that must be chosen is
+        blocked or a mutual exclusion of a chosen course.
+        """
+        ids, mutual_rows = self.graph._ids, self.graph._get_exclusion_index()[1]
+        ors = []
+        while pending:
+            expr = pending.pop()
+            if isinstance(expr, _Course):
+                course_id = ids[expr.code]
+                if bits >> course_id & 1:
+                    continue
+                elif self._blocked_bits >> course_id & 1 or mutual_rows[course_id] & (bits | 1 << course_id):
+                    # a course that is an exclusion of itself is a mutual exclusion on its own
+                    return None
+                bits |= 1 << course_id
+                pending.append(expr.prerequisites)
+            elif expr.code == 'and':
+                pending.extend(expr.operand)
+            else:
+                ors.append(expr)
+
+        chosen = self.graph._bits_to_set(bits)
+        return bits, frozenset(expr for expr in ors if not expr.is_satisfied(chosen))
+
+    def _remaining_bound(self, bits: int, pending: frozenset[BoolOp]) -> float:
+        """Returns a lower bound on the credits still needed to meet every 'or' in pending, given that the courses
+        in bits are already chosen."""
+        bounds = []
+        for expr in pending:
+            bound = self._lower_bound(expr)
+            if bound == math.inf:
+                return math.inf
+            closure = self._closure(expr)
+            bounds.append((bound - self._credits(closure & bits), closure))
+
+        # the courses that meet 'or's which share no course are all different, so their bounds can be added up
+        total, used = 0.0, 0
+        for bound, closure in sorted(bounds, key=lambda item: item[0], reverse=True):
+            if bound > 0 and not closure & used:
+                total += bound
+                used |= closure
+        return total
+
+    def _lower_bound(self, expr: Expr) -> float:
+        """Returns a lower bound on the credits of the courses needed to meet expr, or infinity if it cannot be
+        met. A course reached again while its own bound is being found (a prerequisite cycle) counts as 0.
+        """
+        if expr not in self._bounds:
+            if isinstance(expr, _Course):
+                course_bit = 1 << self.graph._ids[expr.code]
+                if course_bit & self._blocked_bits:
+                    self._bounds[expr] = math.inf
+                else:
+                    self._bounds[expr] = 0.0
+                    own = 0.0 if course_bit & self._completed_bits else expr.credit
+                    self._bounds[expr] = own + self._lower_bound(expr.prerequisites)
+            else:
+                bounds = [self._lower_bound(operand) for operand in expr.operand if operand.has_pathways()]
+                if not bounds:
+                    self._bounds[expr] = 0.0
+                elif expr.code == 'and':
+                    self._bounds[expr] = max(bounds)
+                else:
+                    self._bounds[expr] = min(bounds)
+        return self._bounds[expr]
+
+    def _closure(self, expr: Expr) -> int:
+        """Returns the bitset of every course that can be reached from expr through operands and prerequisites."""
+        if isinstance(expr, _Course):
+            return self._course_closure(expr)
+        elif expr not in self._closures:
+            bits = 0
+            for operand in expr.operand:
+                bits |= self._closure(operand)
+            self._closures[expr] = bits
+        return self._closures[expr]
+
+    def _course_closure(self, course: _Course) -> int:
+        """Returns the bitset of course and every course that can be reached from it, storing it in the graph.
+        The closures of the courses reached are not stored, since a course on a prerequisite cycle may be reached
+        before its own closure is complete; closures stored earlier are reused.
+        """
+        closures = self.graph._closures
+        if course not in closures:
+            bits, seen, stack = 0, {course}, [course]
+            while stack:
+                current = stack.pop()
+                if current is not course and current in closures:
+                    bits |= closures[current]
+                    continue
+                bits |= 1 << self.graph._ids[current.code]
+                exprs = [current.prerequisites]
+                while exprs:
+                    expr = exprs.pop()
+                    if isinstance(expr, BoolOp):
+                        exprs.extend(expr.operand)
+                    elif expr not in seen:
+                        seen.add(expr)
+                        stack.append(expr)
+            closures[course] = bits
+        return closures[course]
+
+    def _credits(self, bits: int) -> float:
+        """Returns the number of credits of the courses in bits that were not completed."""
+        return self.graph._count_credits_bits(bits & ~self._completed_bits)
+
+
 def count_credits(course_set: set[str]) -> int:
     """Count the number of credits in a set of strings
     Preconditions:
@@ -172,7 +992,9 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['annotations', '_Course', 'Tree', 'BoolOp', 'expression_tree_classes'],
+        'extra-imports': ['annotations', 'functools', 'heapq', 'itertools', 'math', 'operator', 'numpy', 'Expr',
+                          '_Course', 'Tree', 'BoolOp', 'SubsetIndex', 'count_nodes', 'minimal_bits', 'normalize',
+                          'expression_tree_classes', 'QueryCache', 'query_cache'],
         # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
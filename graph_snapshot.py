@@ -0,0 +1,207 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module saves a Graph to a compact binary snapshot file and loads it back, so the course data does not have
+to be read from Excel every time the program starts.
+
+A snapshot consists of a header followed by five sections. Besides the source file the snapshot was built
+from, the header records whether its prerequisites were normalized (see Graph.normalize_prerequisites), so a
+snapshot of normalized prerequisites is never returned when the original ones were asked for, or the reverse.
+
+The sections are:
+    - codes: the 8 character code of every course, in order of course id
+    - expression offsets: for each course id, where its prerequisites start in the expression data
+    - expression data: every course's prerequisites in postfix order, where a value v >= 0 is the course with
+      id v and a negative value is an 'and' (-2 * n - 1) or an 'or' (-2 * n - 2) of the previous n expressions
+    - exclusion offsets: for each course id, where its exclusions start in the exclusion data
+    - exclusion data: the course ids of every course's exclusions
+All numbers are stored as 32 bit integers in the byte order of the machine that wrote the snapshot.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+from expression_tree_classes import Expr, _Course, BoolOp
+from graph_course import Graph
+
+# Increase whenever the snapshot layout, or the way the graph is built from the source file, changes.
+SNAPSHOT_VERSION = 5
+
+_MAGIC = b'UTCMAP\0\0'
+# magic, version, byte order, whether the prerequisites are normalized (padded so the sections stay 4 byte
+# aligned), source size, source mtime (ns), source sha256, number of courses, length of the expression data,
+# length of the exclusion data
+_HEADER = struct.Struct('<8sIc?2xQq32sIII')
+
+
+def snapshot_path(source_file: str) -> str:
+    """Return the path of the snapshot for the given source file."""
+    return source_file + '.snapshot'
+
+
+def source_digest(source_file: str) -> bytes:
+    """Return the sha256 digest of the contents of source_file."""
+    sha = hashlib.sha256()
+    with open(source_file, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    return sha.digest()
+
+
+def encode_graph(graph: Graph) -> tuple[bytes, array, array, array, array]:
+    """Return the sections of a snapshot of graph: the course codes, the expression offsets and data, and
+    the exclusion offsets and data.
+
+    Preconditions:
+        - all(len(code) == 8 and code.isascii() for code in graph._courses)
+    """
+    ids = graph._ids
+    expr_offsets, expr_data = array('i', [0]), array('i')
+    excl_offsets, excl_data = array('i', [0]), array('i')
+    for code in graph._codes:
+        course = graph._courses[code]
+        _encode_expr(course.prerequisites, ids, expr_data)
+        expr_offsets.append(len(expr_data))
+        excl_data.extend(sorted(ids[exclusion.code] for exclusion in course.exclusions))
+        excl_offsets.append(len(excl_data))
+    return ''.join(graph._codes).encode('ascii'), expr_offsets, expr_data, excl_offsets, excl_data
+
+
+def graph_digest(graph: Graph) -> str:
+    """Return the sha256 hex digest of the snapshot sections of graph (see encode_graph), which changes whenever
+    the courses, prerequisites or exclusions in the graph do."""
+    sha = hashlib.sha256(SNAPSHOT_VERSION.to_bytes(4, 'little'))
+    for section in encode_graph(graph):
+        sha.update(section)
+    return sha.hexdigest()
+
+
+def _encode_expr(expr: Expr, ids: dict[str, int], data: array) -> None:
+    """Append expr to data in postfix order (see the module description)."""
+    if isinstance(expr, _Course):
+        data.append(ids[expr.code])
+    else:
+        for operand in expr.operand:
+            _encode_expr(operand, ids, data)
+        data.append(-2 * len(expr.operand) - (1 if expr.code == 'and' else 2))
+
+
+def decode_graph(codes: bytes, expr_offsets: memoryview, expr_data: memoryview,
+                 excl_offsets: memoryview, excl_data: memoryview) -> Graph:
+    """Return the graph stored in the given snapshot sections (see encode_graph)."""
+    graph = Graph()
+    course_codes = [codes[i:i + 8].decode('ascii') for i in range(0, len(codes), 8)]
+    for code in course_codes:
+        graph.add_course(code)
+
+    courses = [graph._courses[code] for code in course_codes]
+    for i, code in enumerate(course_codes):
+        stack = []
+        for value in expr_data[expr_offsets[i]:expr_offsets[i + 1]]:
+            if value >= 0:
+                stack.append(courses[value])
+            else:
+                num_operands = (-value - 1) // 2
+                operands = stack[len(stack) - num_operands:]
+                del stack[len(stack) - num_operands:]
+                stack.append(BoolOp('and' if value % 2 == 1 else 'or', operands))
+        graph.set_prerequisites(code, stack[0])
+
+        exclusions = excl_data[excl_offsets[i]:excl_offsets[i + 1]]
+        if len(exclusions) > 0:
+            graph.add_exclusion(code, {course_codes[ex] for ex in exclusions})
+    return graph
+
+
+def write_snapshot(graph: Graph, path: str, source_file: str, normalized: bool = False) -> None:
+    """Save a snapshot of graph, which was built from source_file, to path. normalized is whether the
+    prerequisites of graph have been normalized.
+    The file is replaced atomically, so a reader never sees a partially written snapshot.
+    """
+    codes, expr_offsets, expr_data, excl_offsets, excl_data = encode_graph(graph)
+    stat = os.stat(source_file)
+    header = _HEADER.pack(_MAGIC, SNAPSHOT_VERSION, sys.byteorder[0].encode(), normalized, stat.st_size,
+                          stat.st_mtime_ns, source_digest(source_file), len(graph._codes), len(expr_data),
+                          len(excl_data))
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(header)
+        file.write(codes)
+        for section in (expr_offsets, expr_data, excl_offsets, excl_data):
+            section.tofile(file)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path: str, source_file: str, normalized: bool = False) -> Optional[Graph]:
+    """Return the graph saved at path, or None if there is no usable snapshot there.
+
+    A snapshot is only usable if it was written by this version of the program on a machine with the same byte
+    order, its prerequisites were normalized if and only if normalized is True, and source_file has not changed
+    since: either its size and modification time are the same as when the snapshot was written, or its contents
+    hash to the same digest.
+    """
+    try:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return _read_buffer(buffer, source_file, normalized)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def _read_buffer(buffer: mmap.mmap, source_file: str, normalized: bool) -> Optional[Graph]:
+    """Return the graph in the snapshot mapped into buffer, or None if it is not usable (see read_snapshot)."""
+    magic, version, byte_order, was_normalized, size, mtime_ns, digest, num_courses, num_expr, num_excl = \
+        _HEADER.unpack_from(buffer)
+    if magic != _MAGIC or version != SNAPSHOT_VERSION or byte_order != sys.byteorder[0].encode():
+        return None
+    elif was_normalized != normalized:
+        return None
+
+    stat = os.stat(source_file)
+    if (stat.st_size != size or stat.st_mtime_ns != mtime_ns) and source_digest(source_file) != digest:
+        return None
+
+    view = memoryview(buffer)
+    sections = []
+    try:
+        start = _HEADER.size
+        codes = bytes(view[start:start + 8 * num_courses])
+        start += 8 * num_courses
+        for length in (num_courses + 1, num_expr, num_courses + 1, num_excl):
+            sections.append(view[start:start + 4 * length].cast('i'))
+            start += 4 * length
+        if start != len(buffer):
+            return None
+        return decode_graph(codes, *sections)
+    finally:
+        # the memory map can only be closed once no views into it are left
+        for section in sections:
+            section.release()
+        view.release()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'hashlib', 'mmap', 'os', 'struct', 'sys', 'array', 'Expr', '_Course',
+                          'BoolOp', 'Graph', 'expression_tree_classes', 'graph_course'],
+        # the names (strs) of imported modules
+        'allowed-io': ['source_digest', 'write_snapshot', 'read_snapshot'],
+        # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
@@ -42,7 +42,11 @@ def run_commands(g: Graph) -> None:
         elif user_input == "prerequisites":
             course = input("Which course do you want the prerequisites for?").upper()
             if g.valid_course(course):
-                pprint.pp(g.get_prerequisites(course, set(), set(), 20.0))
+                amount = input("How many of the cheapest pathways would you like to see? (leave blank for all)")
+                if amount.isdigit():
+                    pprint.pp(list(g.iter_prerequisites(course, set(), set(), 20.0, int(amount))))
+                else:
+                    pprint.pp(g.get_prerequisites(course, set(), set(), 20.0))
             else:
                 print("Not a valid course name!")
         user_input = input('What would you like to do? ').lower()
@@ -61,9 +65,10 @@ def course_map_help(commands: list) -> None:
 
     if user_input == 'prerequisites':
         print('Gets the prerequisites needed for a given course.\n '
-              'Once you type this command in, you will be prompted to provide a course.\n'
-              'The algorithm will provide a list of possible pathways as prerequisites for the course you typed in\n'
-              'along with the credits each pathway will take.')
+              'Once you type this command in, you will be prompted to provide a course and how many pathways\n'
+              'you would like to see.\n'
+              'The algorithm will provide a list of the cheapest pathways as prerequisites for the course you typed\n'
+              'in along with the credits each pathway will take.')
 
     elif user_input == 'display':
         print('Displays the given course visually, along with its prerequisites and dependents.\n'
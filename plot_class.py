@@ -10,7 +10,7 @@ Creators:
 """
 from __future__ import annotations
 from typing import Optional, Any
-from expression_tree_classes import Tree
+from expression_tree_classes import Expr, _Course, BoolOp, Tree
 
 
 class Plot():
@@ -35,22 +35,38 @@ class Plot():
     #   -_mod:
     #       A temporary shift value.
     #       This is used to tabulate shifts needed to ensure the tree is centered and non-overlapping.
+    #   -_offset:
+    #       A shift of this tree node and all of its descendants that has not been added to their x coordinates yet.
+    #   -_contour:
+    #       The (min, max) x coordinate at each level of this tree, indexed by level, or None for a level with no
+    #       nodes. These do not include _offset, and are only known once third_pass has laid out this tree.
+    __slots__ = ('_root', '_x', '_mod', '_offset', '_contour', '_y', '_subtrees')
     _root: Optional[Any]
     _x: float
     _mod: float
+    _offset: float
+    _contour: list[Optional[tuple[float, float]]]
     _y: int
     _subtrees: list[Plot]
 
-    def __init__(self, tree: Tree) -> None:
-        """Takes in a tree and converts it to a plot with assigned x and y values
+    def __init__(self, tree: Tree, layout: Optional[str] = 'tidy') -> None:
+        """Takes in a tree and converts it to a plot with x and y values assigned by the given layout:
+            - 'tidy': tidy_layout, which takes time linear in the size of the tree
+            - 'classic': assign_coordinates
+            - None: no coordinates are assigned (used for the subtrees, which are laid out with the whole tree)
         Preconditions:
             - tree.is_empty() == False
+            - layout in {'tidy', 'classic', None}
         """
         self._root = tree._root
         self._x, self._mod = -1, -1
-        self._subtrees = [Plot(subtree) for subtree in tree._subtrees]
+        self._offset, self._contour = 0, []
+        self._subtrees = [Plot(subtree, None) for subtree in tree._subtrees]
         self._y = -1
-        self.assign_coordinates()
+        if layout == 'tidy':
+            tidy_layout(self)
+        elif layout == 'classic':
+            self.assign_coordinates()
 
     def get_root(self) -> Any:
         """Return the root of this tree"""
@@ -67,6 +83,7 @@ class Plot():
         self.first_pass()
         self.second_pass()
         self.third_pass()
+        self.apply_offsets()
 
     def to_dict(self) -> dict:
         """Return a dictionary mapping a node to its coordinate in our plot"""
@@ -119,78 +136,98 @@ class Plot():
                 subtree.second_pass()
 
     def shift(self, degree: float) -> None:
-        """Shift itself and its children by a degree"""
-        if self._subtrees == []:
-            self._x += degree
-        else:
-            self._x += degree
+        """Shift itself and its children by a degree.
+        The shift is recorded in _offset and only passed down to the children when they are laid out or the
+        coordinates are read (see push_offset), so this takes constant time."""
+        self._offset += degree
+
+    def push_offset(self) -> None:
+        """Add the pending shift of this tree node to its coordinates and pass it down to its children."""
+        if self._offset != 0:
+            self._x += self._offset
+            self._contour = [None if pair is None else (pair[0] + self._offset, pair[1] + self._offset)
+                             for pair in self._contour]
             for subtree in self._subtrees:
-                subtree.shift(degree)
+                subtree._offset += self._offset
+            self._offset = 0
+
+    def apply_offsets(self) -> None:
+        """Push the pending shifts of every node in this tree down to the leaves, so every x coordinate is final."""
+        self.push_offset()
+        for subtree in self._subtrees:
+            subtree.apply_offsets()
+
+    def update_contour(self) -> None:
+        """Find the min and max x coordinate at each level of this tree from the contours of its subtrees."""
+        contour = [None] * (self._y + 1)
+        contour[self._y] = (self._x, self._x)
+        for subtree in self._subtrees:
+            for level, pair in enumerate(subtree._contour):
+                if pair is not None:
+                    low, high = pair[0] + subtree._offset, pair[1] + subtree._offset
+                    if contour[level] is not None:
+                        low, high = min(low, contour[level][0]), max(high, contour[level][1])
+                    contour[level] = (low, high)
+        self._contour = contour
 
     def third_pass(self) -> None:
         """Peforms the third pass of assign coordinates.
         This pass checks for overlap between subtrees and shifts them accordingly to ensure at each level,
-        all trees are 1 unti apart"""
-        if self._subtrees == []:
-            return
-        else:
+        all trees are 1 unti apart.
+        Each subtree's contour is found once, after it is laid out, so checking for overlap at a level is a lookup."""
+        self.push_offset()
+        if self._subtrees != []:
             for subtree in self._subtrees:
                 subtree.third_pass()
 
             for i in range(1, len(self._subtrees)):
                 max_shift_so_far = 0
-                max_index = 0
                 for d in range(self._y):
                     for s in range(i):
-                        max_shift_so_far = self._subtrees[s].get_shift_at_level(self._subtrees[i],
-                                                                                d) if max_shift_so_far < self._subtrees[
-                            s].get_shift_at_level(self._subtrees[i], d) else max_shift_so_far
-                        max_index = s
+                        max_shift_so_far = max(max_shift_so_far, self._subtrees[s].get_shift_at_level(
+                            self._subtrees[i], d))
 
                 for k in range(1, len(self._subtrees)):
-                    shift = max_shift_so_far / (i - max_index)
-                    self._subtrees[k].shift(shift * k)
+                    self._subtrees[k].shift(max_shift_so_far * k)
 
             self._x = self.midpoint()
+        self.update_contour()
 
     def get_shift_at_level(self, other: Plot, level: int) -> float:
         """Gets the shift needed at a particular level"""
-        if self.max_at_level(level) is None or other.min_at_level(level) is None:
+        self_max, other_min = self.max_at_level(level), other.min_at_level(level)
+        if self_max is None or other_min is None:
             return 0
-        elif self.max_at_level(level) + 1 > other.min_at_level(level):
-            return self.max_at_level(level) + 1 - other.min_at_level(level)
+        elif self_max + 1 > other_min:
+            return self_max + 1 - other_min
         else:
             return 0
 
     def max_at_level(self, level: int) -> Any:
-        """Finds the max x value at a level"""
+        """Finds the max x value at a level.
+        Below this tree node, the max is never less than 0.
+        Preconditions:
+            - this tree has been laid out by third_pass
+        """
         if self._y == level:
-            return self._x
-        elif self._subtrees == [] or self._y < level or all(
-                sub.max_at_level(level) is None for sub in self._subtrees):
+            return self._x + self._offset
+        elif not 0 <= level < len(self._contour) or self._contour[level] is None:
             return None
         else:
-            max_so_far = 0
-            for subtree in self._subtrees:
-                if subtree.max_at_level(level) is not None:
-                    if max_so_far < subtree.max_at_level(level):
-                        max_so_far = subtree.max_at_level(level)
-            return max_so_far
+            return max(0, self._contour[level][1] + self._offset)
 
     def min_at_level(self, level: int) -> Any:
-        """Finds the min x value at a level"""
+        """Finds the min x value at a level.
+        Below this tree node, the min is never more than 1000000.
+        Preconditions:
+            - this tree has been laid out by third_pass
+        """
         if self._y == level:
-            return self._x
-        elif self._subtrees == [] or self._y < level or all(
-                sub.min_at_level(level) is None for sub in self._subtrees):
+            return self._x + self._offset
+        elif not 0 <= level < len(self._contour) or self._contour[level] is None:
             return None
         else:
-            min_so_far = 1000000
-            for subtree in self._subtrees:
-                if subtree.min_at_level(level) is not None:
-                    if min_so_far > subtree.min_at_level(level):
-                        min_so_far = subtree.min_at_level(level)
-            return min_so_far
+            return min(1000000, self._contour[level][0] + self._offset)
 
     def depth(self) -> int:
         """Return the number of items contained in this tree.
@@ -210,7 +247,7 @@ class Plot():
         if self._subtrees == []:
             return 0.0
         else:
-            return sum([subtree._x for subtree in self._subtrees]) / len(self._subtrees)
+            return sum([subtree._x + subtree._offset for subtree in self._subtrees]) / len(self._subtrees)
 
     def is_empty(self) -> bool:
         """Return whether this tree is empty.
@@ -243,6 +280,356 @@ class Plot():
             return str_so_far
 
 
+def tidy_layout(plot: Plot) -> None:
+    """Assign coordinates to every node of plot with the tidy tree layout of Walker, as improved to run in linear
+    time by Buchheim, Junger and Leipert. Like assign_coordinates, the y coordinate of a node is the depth of the
+    tree minus its distance from the root, minus 1, and nodes at the same level are at least 1 apart.
+
+    Buchheim, C., Junger, M., & Leipert, S. (2002). Improving Walker's algorithm to run in linear time.
+    In Graph Drawing (pp. 344-353). Springer.
+
+    The nodes are numbered level by level, so every node comes after its parent and siblings are numbered
+    consecutively. The algorithm's per-node values are kept in lists indexed by that number and both walks visit
+    the nodes in (reverse) order of their numbers, so neither walk recurses.
+
+    >>> p = Plot(Tree('a', [Tree('b', [Tree('d', []), Tree('e', [])]), Tree('c', [])]))
+    >>> sorted((node.get_root(), coordinates) for node, coordinates in p.to_dict().items())
+    [('a', (1.0, 2)), ('b', (0.5, 1)), ('c', (1.5, 1)), ('d', (0.0, 0)), ('e', (1.0, 0))]
+    """
+    nodes, parents, levels = [plot], [-1], [0]
+    children = []
+    i = 0
+    while i < len(nodes):
+        first_child = len(nodes)
+        for subtree in nodes[i]._subtrees:
+            nodes.append(subtree)
+            parents.append(i)
+            levels.append(levels[i] + 1)
+        children.append(range(first_child, len(nodes)))
+        i += 1
+
+    walk = _TidyWalk(children)
+    for v in reversed(range(len(nodes))):
+        walk.first_walk(v)
+    # the root has no parent to place it, so it goes above the middle of its children
+    walk.prelim[0] = walk.midpoint[0]
+
+    height = max(levels)
+    offsets = [0.0] * len(nodes)
+    for v in range(len(nodes)):
+        if parents[v] >= 0:
+            offsets[v] = offsets[parents[v]] + walk.mod[parents[v]]
+        nodes[v]._x = walk.prelim[v] + offsets[v]
+        nodes[v]._y = height - levels[v]
+        nodes[v]._mod = 0
+
+
+class _TidyWalk:
+    """The state of the first walk of tidy_layout over a tree whose nodes are numbered level by level.
+
+    Instance Attributes:
+        - children: the numbers of the children of each node, in order
+        - parent: the number of the parent of each node, or -1 for the root
+        - number: the position of each node among its siblings, starting at 0
+        - prelim: the preliminary x coordinate of each node, relative to its parent's subtree
+        - mod: the amount every descendant of each node is shifted by
+        - thread: the next node on the contour of each leaf, or -1
+        - ancestor: the greatest uncommon ancestor candidate of each node
+        - change, shift: the shifts of each node that are spread over its siblings in execute_shifts
+        - midpoint: the midpoint of the children of each node that has children
+    """
+    children: list[range]
+    parent: list[int]
+    number: list[int]
+    prelim: list[float]
+    mod: list[float]
+    thread: list[int]
+    ancestor: list[int]
+    change: list[float]
+    shift: list[float]
+    midpoint: list[float]
+
+    def __init__(self, children: list[range]) -> None:
+        n = len(children)
+        self.children = children
+        self.parent, self.number = [-1] * n, [0] * n
+        for v in range(n):
+            for i, w in enumerate(children[v]):
+                self.parent[w], self.number[w] = v, i
+        self.prelim, self.mod, self.change, self.shift, self.midpoint = ([0.0] * n for _ in range(5))
+        self.thread = [-1] * n
+        self.ancestor = list(range(n))
+
+    def first_walk(self, v: int) -> None:
+        """Place the children of v next to each other, given that the subtree of every child has already been
+        placed, and record where v goes relative to them.
+        """
+        children = self.children[v]
+        if not children:
+            return
+        default_ancestor = children[0]
+        for w in children:
+            if self.number[w] > 0:
+                self.prelim[w] = self.prelim[w - 1] + 1
+                if self.children[w]:
+                    self.mod[w] = self.prelim[w] - self.midpoint[w]
+            elif self.children[w]:
+                self.prelim[w] = self.midpoint[w]
+            default_ancestor = self.apportion(w, default_ancestor)
+        self.execute_shifts(v)
+        self.midpoint[v] = (self.prelim[children[0]] + self.prelim[children[-1]]) / 2
+
+    def next_left(self, v: int) -> int:
+        """Return the next node on the left contour of the subtree of v, or -1 if there is none."""
+        return self.children[v][0] if self.children[v] else self.thread[v]
+
+    def next_right(self, v: int) -> int:
+        """Return the next node on the right contour of the subtree of v, or -1 if there is none."""
+        return self.children[v][-1] if self.children[v] else self.thread[v]
+
+    def apportion(self, v: int, default_ancestor: int) -> int:
+        """Move the subtree of v right until it is at least 1 away from the subtrees of its left siblings at
+        every level, and return the new default ancestor.
+        """
+        if self.number[v] == 0:
+            return default_ancestor
+        siblings = self.children[self.parent[v]]
+        inner_right = outer_right = v
+        inner_left, outer_left = v - 1, siblings[0]
+        sum_inner_right = sum_outer_right = self.mod[v]
+        sum_inner_left, sum_outer_left = self.mod[inner_left], self.mod[outer_left]
+        while self.next_right(inner_left) >= 0 and self.next_left(inner_right) >= 0:
+            inner_left, inner_right = self.next_right(inner_left), self.next_left(inner_right)
+            outer_left, outer_right = self.next_left(outer_left), self.next_right(outer_right)
+            self.ancestor[outer_right] = v
+            shift = self.prelim[inner_left] + sum_inner_left - self.prelim[inner_right] - sum_inner_right + 1
+            if shift > 0:
+                ancestor = self.ancestor[inner_left]
+                if self.parent[ancestor] != self.parent[v]:
+                    ancestor = default_ancestor
+                self.move_subtree(ancestor, v, shift)
+                sum_inner_right += shift
+                sum_outer_right += shift
+            sum_inner_left += self.mod[inner_left]
+            sum_inner_right += self.mod[inner_right]
+            sum_outer_left += self.mod[outer_left]
+            sum_outer_right += self.mod[outer_right]
+
+        if self.next_right(inner_left) >= 0 and self.next_right(outer_right) < 0:
+            self.thread[outer_right] = self.next_right(inner_left)
+            self.mod[outer_right] += sum_inner_left - sum_outer_right
+        if self.next_left(inner_right) >= 0 and self.next_left(outer_left) < 0:
+            self.thread[outer_left] = self.next_left(inner_right)
+            self.mod[outer_left] += sum_inner_right - sum_outer_left
+            default_ancestor = v
+        return default_ancestor
+
+    def move_subtree(self, left: int, right: int, shift: float) -> None:
+        """Move the subtree of right by shift, and record that the siblings between left and right should be
+        moved by an even share of it (see execute_shifts)."""
+        share = shift / (self.number[right] - self.number[left])
+        self.change[right] -= share
+        self.shift[right] += shift
+        self.change[left] += share
+        self.prelim[right] += shift
+        self.mod[right] += shift
+
+    def execute_shifts(self, v: int) -> None:
+        """Apply the shifts recorded by move_subtree to every child of v."""
+        shift = change = 0.0
+        for w in reversed(self.children[v]):
+            self.prelim[w] += shift
+            self.mod[w] += shift
+            change += self.change[w]
+            shift += self.shift[w] + change
+
+
+class DagNode:
+    """A node of a DagPlot: a course, or an and/or of prerequisites, with its coordinates.
+
+    Instance Attributes:
+        - expr: the course or BoolOp this node stands for
+        - x: the x coordinate of this node
+        - y: the y coordinate of this node
+    """
+    expr: Expr
+    x: float
+    y: int
+
+    def __init__(self, expr: Expr) -> None:
+        self.expr = expr
+        self.x, self.y = 0.0, 0
+
+    def get_root(self) -> str:
+        """Return the label of this node: a course code, 'and' or 'or'."""
+        return self.expr.code
+
+
+class DagPlot:
+    """A plot of the prerequisites of a course as a directed acyclic graph, where every course appears once no
+    matter how many of the courses above it need it.
+
+    The nodes and edges are the same as those of Plot(course.to_tree()), except that a shared course or BoolOp is a
+    single node with several edges into it. The layout is layered (Sugiyama style):
+        1. every node goes on the layer of its longest path from the course, so every edge points down
+        2. an edge that skips layers gets a placeholder node on each layer in between
+        3. the nodes on each layer are ordered by the barycenter of their neighbours, sweeping down and up
+        4. each layer is placed under the average of the nodes above it, at least 1 apart
+    Prerequisite cycles are broken by leaving out the edges that close them when assigning layers; those edges
+    are still drawn.
+
+    >>> math = _Course('MAT137Y1')
+    >>> stats = _Course('STA247H1')
+    >>> stats.prerequisites = BoolOp('and', [math])
+    >>> course = _Course('STA302H1')
+    >>> course.prerequisites = BoolOp('and', [math, stats])
+    >>> dag = DagPlot(course)
+    >>> sorted((node.get_root(), coordinates) for node, coordinates in dag.to_dict().items())
+    [('MAT137Y1', (0.0, 0)), ('STA247H1', (-0.5, 1)), ('STA302H1', (0.0, 3)), ('and', (0.0, 2))]
+    >>> len(dag.get_edges())
+    4
+    """
+    # Private Instance Attributes:
+    #   - _nodes:
+    #       Maps each course or BoolOp in the plot to its node, in the order they were found from the course.
+    #   - _edges:
+    #       The edges of the plot, from a node to one of its prerequisites.
+    _nodes: dict[Expr, DagNode]
+    _edges: list[tuple[DagNode, DagNode]]
+
+    def __init__(self, course: _Course, sweeps: int = 4) -> None:
+        """Lay out the prerequisites of course, with the given number of down and up ordering sweeps."""
+        children = _dag_children(course)
+        self._nodes = {expr: DagNode(expr) for expr in children}
+        self._edges = [(self._nodes[expr], self._nodes[child]) for expr in children for child in children[expr]]
+
+        layers = _longest_path_layers(course, children)
+        height = max(layers.values())
+        order, above = _order_layers(children, layers, height + 1, sweeps)
+        positions = _place_layers(order, above)
+        for expr, node in self._nodes.items():
+            node.x, node.y = positions[expr], height - layers[expr]
+
+    def to_dict(self) -> dict:
+        """Return a dictionary mapping a node to its coordinate in our plot"""
+        return {node: (node.x, node.y) for node in self._nodes.values()}
+
+    def get_edges(self) -> list:
+        """Return a list of all the edges in this plot"""
+        return list(self._edges)
+
+
+def _dag_children(course: _Course) -> dict[Expr, list[Expr]]:
+    """Return the nodes reachable from course in a DagPlot, in the order they are found, mapped to their children.
+    Like the to_tree methods, a BoolOp with a single operand is replaced by that operand.
+    """
+    def resolve(expr: Expr) -> Expr:
+        while isinstance(expr, BoolOp) and len(expr.operand) == 1:
+            expr = expr.operand[0]
+        return expr
+
+    children = {}
+    stack = [course]
+    while stack:
+        expr = stack.pop()
+        if expr in children:
+            continue
+        if isinstance(expr, _Course):
+            children[expr] = [resolve(expr.prerequisites)] if expr.prerequisites.operand != [] else []
+        else:
+            children[expr] = [resolve(operand) for operand in expr.operand]
+        stack.extend(reversed(children[expr]))
+    return children
+
+
+def _longest_path_layers(course: _Course, children: dict[Expr, list[Expr]]) -> dict[Expr, int]:
+    """Return the layer of every node: the length of the longest path to it from course, ignoring the edges that
+    close a cycle (found by a depth first search)."""
+    postorder, state = [], {course: 0}
+    stack = [(course, iter(children[course]))]
+    while stack:
+        expr, remaining = stack[-1]
+        child = next(remaining, None)
+        if child is None:
+            state[expr] = 1
+            postorder.append(expr)
+            stack.pop()
+        elif child not in state:
+            state[child] = 0
+            stack.append((child, iter(children[child])))
+
+    layers = dict.fromkeys(postorder, 0)
+    position = {expr: i for i, expr in enumerate(postorder)}
+    for expr in reversed(postorder):
+        for child in children[expr]:
+            # in a depth first search, an edge that does not close a cycle ends earlier in postorder
+            if position[child] < position[expr]:
+                layers[child] = max(layers[child], layers[expr] + 1)
+    return layers
+
+
+def _order_layers(children: dict[Expr, list[Expr]], layers: dict[Expr, int], num_layers: int,
+                  sweeps: int) -> tuple[list[list[Any]], dict[Any, list[Any]]]:
+    """Return the nodes on each layer, with a placeholder (a tuple) on every layer an edge skips, ordered to
+    reduce edge crossings with the barycenter heuristic. Also return the items on the layer above each item that
+    it has an edge from."""
+    order = [[] for _ in range(num_layers)]
+    above, below = {}, {}
+    for expr in children:
+        order[layers[expr]].append(expr)
+        above.setdefault(expr, [])
+        below.setdefault(expr, [])
+
+    for expr in children:
+        for i, child in enumerate(children[expr]):
+            if layers[child] <= layers[expr]:
+                continue
+            previous = expr
+            for layer in range(layers[expr] + 1, layers[child]):
+                placeholder = (expr, i, layer)
+                order[layer].append(placeholder)
+                above[placeholder], below[placeholder] = [previous], []
+                below[previous].append(placeholder)
+                previous = placeholder
+            below[previous].append(child)
+            above[child].append(previous)
+
+    position = {item: i for layer in order for i, item in enumerate(layer)}
+    for sweep in range(2 * sweeps):
+        downwards = sweep % 2 == 0
+        neighbours = above if downwards else below
+        layer_range = range(1, num_layers) if downwards else range(num_layers - 2, -1, -1)
+        changed = False
+        for layer in layer_range:
+            if len(order[layer]) < 2:
+                continue
+            barycenters = {item: sum(position[n] for n in neighbours[item]) / len(neighbours[item])
+                           if neighbours[item] else position[item] for item in order[layer]}
+            new_order = sorted(order[layer], key=barycenters.__getitem__)
+            if new_order != order[layer]:
+                changed = True
+                order[layer] = new_order
+                position.update((item, i) for i, item in enumerate(new_order))
+        # once a whole sweep leaves every layer as it was, every later sweep would too
+        if not changed and sweep > 0:
+            break
+    return order, above
+
+
+def _place_layers(order: list[list[Any]], above: dict[Any, list[Any]]) -> dict[Any, float]:
+    """Return the x coordinate of every item in order. Each layer keeps its order, with the items at least 1 apart
+    and, on average, under the average x coordinate of the items above them that they have an edge from."""
+    positions = {item: float(i) for i, item in enumerate(order[0])}
+    for layer in order[1:]:
+        targets = [sum(positions[parent] for parent in above[item]) / len(above[item]) for item in layer]
+        xs = []
+        for target in targets:
+            xs.append(target if not xs else max(target, xs[-1] + 1))
+        adjustment = sum(target - x for target, x in zip(targets, xs)) / len(xs)
+        positions.update((item, x + adjustment) for item, x in zip(layer, xs))
+    return positions
+
+
 if __name__ == '__main__':
     import doctest
 
@@ -251,7 +638,7 @@ if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['annotations', '_Course', 'Tree', 'BoolOp', 'expression_tree_classes'],
+        'extra-imports': ['annotations', 'Expr', '_Course', 'Tree', 'BoolOp', 'expression_tree_classes'],
         # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
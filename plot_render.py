@@ -0,0 +1,158 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module renders the plots of the Visual Course Map without displaying them, for batch jobs and web backends.
+
+Rendered figures are saved in an on-disk cache, keyed by the course, a digest of the graph (see
+graph_snapshot.graph_digest) and the rendering options, so a figure is only laid out and built once for each
+version of the course data. pre_render fills the cache for many courses at once with a pool of worker processes.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import hashlib
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from file_reader import load_graph
+from graph_course import Graph
+from graph_snapshot import graph_digest
+from plotly_visualization import build_figure, plot_course
+
+# Increase whenever the way a figure is laid out or built changes, so older cached figures are not used.
+RENDER_VERSION = 1
+
+DEFAULT_CACHE_DIR = '.plot_cache'
+
+FORMATS = ('html', 'json', 'svg')
+
+# the digest of each graph rendered so far, along with the version of the graph it was found for
+_digests = weakref.WeakKeyDictionary()
+
+# the graph loaded by each pre_render worker process, under 'graph'
+_worker_state = {}
+
+
+def render_plot(g: Graph, course_code: str, fmt: str = 'html', layout: str = 'dag', webgl: bool = False,
+                cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> str:
+    """Return the figure of course_code (see display_plot) serialized as a standalone HTML page, plotly JSON or
+    an SVG image, without displaying it.
+
+    If cache_dir is not None, the figure is read from the cache in that directory when it has already been
+    rendered with the same graph and options, and saved there otherwise. Rendering an SVG image requires the
+    kaleido package.
+    Preconditions:
+        - len(course_code) == 8
+        - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        - fmt in FORMATS
+        - layout in {'dag', 'tidy', 'classic'}
+    """
+    path = None
+    if cache_dir is not None:
+        path = cache_path(cache_dir, course_code, _graph_digest(g), fmt, layout, webgl)
+        try:
+            with open(path, encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            pass
+
+    fig = build_figure(plot_course(g, course_code, layout), webgl)
+    if fmt == 'html':
+        rendered = fig.to_html(include_plotlyjs='cdn', config={'scrollZoom': True})
+    elif fmt == 'json':
+        rendered = fig.to_json()
+    else:
+        rendered = fig.to_image(format='svg').decode('utf-8')
+
+    if path is not None:
+        try:
+            _write_atomically(path, rendered)
+        except OSError:
+            # like the graph snapshot, the cache only saves time, so a failed write is not an error
+            pass
+    return rendered
+
+
+def cache_path(cache_dir: str, course_code: str, digest: str, fmt: str, layout: str, webgl: bool) -> str:
+    """Return the path in cache_dir of the figure of course_code rendered with the given options from the graph
+    with the given digest."""
+    key = f'{RENDER_VERSION}/{course_code}/{digest}/{layout}/{webgl}'
+    return os.path.join(cache_dir, f'{course_code}-{hashlib.sha256(key.encode()).hexdigest()[:32]}.{fmt}')
+
+
+def _graph_digest(g: Graph) -> str:
+    """Return graph_digest(g), only finding it again when g has changed since the last time."""
+    version, digest = _digests.get(g, (None, ''))
+    if version != g._version:
+        digest = graph_digest(g)
+        _digests[g] = (g._version, digest)
+    return digest
+
+
+def _write_atomically(path: str, contents: str) -> None:
+    """Write contents to path, replacing the file atomically so a reader never sees a partially written figure."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(contents)
+    os.replace(temp_path, path)
+
+
+def pre_render(excel_file: str, course_codes: Optional[list[str]] = None, fmt: str = 'html', layout: str = 'dag',
+               webgl: bool = False, cache_dir: str = DEFAULT_CACHE_DIR, workers: Optional[int] = None) -> int:
+    """Render the figures of the given courses (every course if course_codes is None) into the cache in cache_dir,
+    with a pool of the given number of worker processes (the number of CPUs if workers is None), and return the
+    number of figures rendered.
+
+    Each worker loads the graph from excel_file itself (usually from its snapshot, see load_graph), so only
+    course codes are sent to the workers and only their number comes back.
+    Preconditions:
+        - fmt in FORMATS
+        - layout in {'dag', 'tidy', 'classic'}
+        - workers is None or workers >= 1
+    """
+    if course_codes is None:
+        course_codes = sorted(load_graph(excel_file)._courses)
+    else:
+        # writing the snapshot before the workers start means none of them has to read the Excel file
+        load_graph(excel_file)
+
+    workers = workers or os.cpu_count() or 1
+    options = [(code, fmt, layout, webgl, cache_dir) for code in course_codes]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(excel_file,)) as executor:
+        return sum(executor.map(_render_in_worker, options, chunksize=max(1, len(options) // (4 * workers))))
+
+
+def _init_worker(excel_file: str) -> None:
+    """Load the graph of a pre_render worker process."""
+    _worker_state['graph'] = load_graph(excel_file)
+
+
+def _render_in_worker(options: tuple[str, str, str, bool, str]) -> int:
+    """Render one figure in a pre_render worker process, returning 1."""
+    course_code, fmt, layout, webgl, cache_dir = options
+    render_plot(_worker_state['graph'], course_code, fmt, layout, webgl, cache_dir)
+    return 1
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'hashlib', 'os', 'weakref', 'concurrent.futures', 'ProcessPoolExecutor',
+                          'file_reader', 'graph_course', 'graph_snapshot', 'plotly_visualization', 'load_graph',
+                          'Graph', 'graph_digest', 'build_figure', 'plot_course'],
+        # the names (strs) of imported modules
+        'allowed-io': ['render_plot', '_write_atomically'],
+        # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
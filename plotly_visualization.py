@@ -8,58 +8,86 @@ Creators:
 - Ryan Fu
 - Vennise Ho
 """
-
+from typing import Union
 import plotly.graph_objects as go
-from plot_class import Plot
+from plot_class import DagPlot, Plot
 from graph_course import Graph
 
 
-def display_plot(g: Graph, course_code: str) -> None:
-    """Given a graph of courses and a course_code, display it visually
+def plot_course(g: Graph, course_code: str, layout: str = 'tidy') -> Union[Plot, DagPlot]:
+    """Lay out the prerequisites of course_code with the given layout: 'tidy' or 'classic' for a Plot of the
+    course's prerequisite tree, or 'dag' for a DagPlot, where every course appears once (and which, unlike the
+    tree, can show a course whose prerequisites form a cycle).
     Preconditions:
         - len(course_code) == 8
         - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        - layout in {'dag', 'tidy', 'classic'}
+    """
+    if layout == 'dag':
+        return DagPlot(g.get_course(course_code))
+    else:
+        return Plot(g.course_to_tree(course_code), layout)
+
+
+def display_plot(g: Graph, course_code: str, layout: str = 'tidy', webgl: bool = False) -> None:
+    """Given a graph of courses and a course_code, display it visually (see plot_course for the layouts and
+    build_figure for webgl)
+    Preconditions:
+        - len(course_code) == 8
+        - course_code[6:8] == 'H1' or course_code[6:8] == 'Y1'
+        - layout in {'dag', 'tidy', 'classic'}
+    """
+    config = {'scrollZoom': True}
+    fig = build_figure(plot_course(g, course_code, layout), webgl)
+    fig.show(config=config)
+
+
+def build_figure(p: Union[Plot, DagPlot], webgl: bool = False) -> go.Figure:
+    """Return the figure of a laid out plot.
+    All of the edges are drawn by a single line trace, with None between the coordinates of consecutive edges so
+    they are not joined, and all of the nodes by a single marker trace drawn on top of it. If webgl is True, the
+    traces are drawn with WebGL (go.Scattergl), which stays responsive for plots with thousands of nodes.
     """
-    p = Plot(g.course_to_tree(course_code))
     nodes = p.to_dict()
     edges = p.get_edges()
+    scatter = go.Scattergl if webgl else go.Scatter
+
+    edge_x, edge_y = [], []
+    for edge in edges:
+        edge_x.extend((nodes[edge[0]][0], nodes[edge[1]][0], None))
+        edge_y.extend((nodes[edge[0]][1], nodes[edge[1]][1], None))
+
     node_x, node_y, node_text = [], [], []
-    config = {'scrollZoom': True}
     for node in nodes:
         node_x.append(nodes[node][0])
         node_y.append(nodes[node][1])
         node_text.append(node.get_root())
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=node_x,
-                             y=node_y,
-                             mode='markers+text',
-                             textfont={
-                                 'family': "arial",
-                                 'size': 8,
-                                 'color': "white"},
-                             marker={'symbol': 'circle', 'size': 40},
-                             text=node_text,
-                             showlegend=False,
-                             ))
-    for edge in edges:
-        fig.add_trace(go.Scatter(x=[nodes[e][0] for e in edge],
-                                 y=[nodes[e][1] for e in edge],
-                                 mode='lines+markers+text',
-                                 textfont={
-                                     'family': "arial",
-                                     'size': 8,
-                                     'color': "white"},
-                                 marker={'symbol': 'circle', 'size': 40, 'color': '#00A2FF'},
-                                 text=[edge[0].get_root(), edge[1].get_root()],
-                                 showlegend=False,
-                                 ))
+    fig.add_trace(scatter(x=edge_x,
+                          y=edge_y,
+                          mode='lines',
+                          line={'color': '#7F7F7F', 'width': 1},
+                          hoverinfo='skip',
+                          showlegend=False,
+                          ))
+    fig.add_trace(scatter(x=node_x,
+                          y=node_y,
+                          mode='markers+text',
+                          textfont={
+                              'family': "arial",
+                              'size': 8,
+                              'color': "white"},
+                          marker={'symbol': 'circle', 'size': 40, 'color': '#00A2FF'},
+                          text=node_text,
+                          showlegend=False,
+                          ))
 
     fig.update_xaxes(showgrid=False,
                      zeroline=False,
                      visible=False,)
     fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
-    fig.show(config=config)
+    return fig
 
 
 if __name__ == '__main__':
@@ -71,7 +99,7 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'extra-imports': ['annotations', 'Graph', '_Course', 'Tree', 'BoolOp', 'expression_tree_classes',
-                          'plotly.graph_objects', 'Plot', 'graph_course', 'plot_class'],
+                          'plotly.graph_objects', 'Plot', 'DagPlot', 'graph_course', 'plot_class', 'typing'],
         # the names (strs) of imported modules
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
@@ -0,0 +1,276 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module contains the cache of pathway query results that Graph.get_prerequisites answers repeated queries from.
+
+The results are kept in memory in least recently used order, and the least recently used results are evicted once
+there are more than a maximum number of them or they take up more than a maximum (estimated) number of bytes. All
+of the results in memory are dropped as soon as the graph they were found in changes (see Graph._version).
+
+A cache can also be given a file (an SQLite database), where every result is saved under the digest of the graph it
+was found in (see graph_snapshot.graph_digest), so the results found by one run of the program are still there in
+the next run, for as long as the course data is the same. New results are committed to the file in batches, and
+whatever is left when the cache is closed (or garbage collected, or the program exits) is committed then.
+
+A cache can be used from several threads at once: every lookup, store and maintenance call holds the lock of the
+cache from start to end, so the results in memory, the counters and the on-disk tier are always consistent.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import json
+import sqlite3
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional
+
+# a query: (course code, completed courses, excluded courses, credit limit)
+QueryKey = tuple[str, frozenset, frozenset, float]
+
+# a query result as stored in the cache: a tuple of (number of credits, courses) pathways
+_Result = tuple[tuple[float, frozenset], ...]
+
+
+class QueryCache:
+    """A bounded least recently used cache of the results of pathway queries on one graph at a time, with an
+    optional on-disk tier.
+
+    Instance Attributes:
+        - max_entries: the maximum number of results kept in memory
+        - max_bytes: the maximum estimated number of bytes of the results kept in memory
+        - path: the file of the on-disk tier, or None if there is none
+        - commit_every: the number of results saved to the on-disk tier between commits
+        - hits: the number of lookups answered from memory
+        - disk_hits: the number of lookups answered from the on-disk tier
+        - misses: the number of lookups that were not in the cache
+        - evictions: the number of results evicted from memory to stay within the bounds
+
+    Representation Invariants:
+        - self.max_entries >= 1
+        - self.max_bytes >= 1
+        - self.commit_every >= 1
+    """
+    max_entries: int
+    max_bytes: int
+    path: Optional[str]
+    commit_every: int
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+    # Private Instance Attributes:
+    #   - _results:
+    #       Maps each query in memory to its result and the estimated size of the result in bytes, from least to
+    #       most recently used.
+    #   - _num_bytes:
+    #       The total estimated size of the results in _results.
+    #   - _graph:
+    #       A weak reference to the graph the results in _results were found in, or None if there are none.
+    #   - _version:
+    #       The version of that graph the results in _results were found in.
+    #   - _digest:
+    #       The digest of that version of the graph, or None if it has not been needed yet.
+    #   - _db:
+    #       The connection to the on-disk tier, or None if there is none.
+    #   - _lock:
+    #       The lock held by every method that reads or changes the other attributes (including _db), so the cache
+    #       can be used from several threads. It is reentrant because the finalizer holds it too.
+    #   - _uncommitted:
+    #       The number of results saved to _db since it was last committed.
+    #   - _finalizer:
+    #       Commits and closes _db when this cache is closed or garbage collected, or the program exits, or None
+    #       if there is no on-disk tier.
+    _results: OrderedDict[QueryKey, tuple[_Result, int]]
+    _num_bytes: int
+    _graph: Optional[weakref.ref]
+    _version: int
+    _digest: Optional[str]
+    _db: Optional[sqlite3.Connection]
+    _lock: threading.RLock
+    _uncommitted: int
+    _finalizer: Optional[weakref.finalize]
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 2 ** 20, path: Optional[str] = None,
+                 commit_every: int = 64) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.commit_every = commit_every
+        self.hits, self.disk_hits, self.misses, self.evictions = 0, 0, 0, 0
+        self._results = OrderedDict()
+        self._num_bytes = 0
+        self._graph, self._version, self._digest = None, -1, None
+        self._db, self._lock, self._uncommitted, self._finalizer = None, threading.RLock(), 0, None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                             '(digest TEXT, query TEXT, result TEXT, PRIMARY KEY (digest, query))')
+            self._db.commit()
+            self._finalizer = weakref.finalize(self, _close_db, self._db, self._lock)
+
+    def get(self, graph: Any, key: QueryKey) -> Optional[list]:
+        """Return the result of the query key on graph (in the format Graph.get_prerequisites returns it), or None
+        if it is not in the cache."""
+        key = _normalize_key(key)
+        with self._lock:
+            self._check_graph(graph)
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return _unfreeze(self._results[key][0])
+
+            if self._db is not None:
+                row = self._db.execute('SELECT result FROM results WHERE digest = ? AND query = ?',
+                                       (self._graph_digest(graph), _encode_key(key))).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    result = tuple((credits, frozenset(codes)) for credits, codes in json.loads(row[0]))
+                    self._store(key, result)
+                    return _unfreeze(result)
+
+            self.misses += 1
+            return None
+
+    def put(self, graph: Any, key: QueryKey, result: list) -> None:
+        """Store the result of the query key on graph (in the format Graph.get_prerequisites returns it)."""
+        key = _normalize_key(key)
+        frozen = tuple((credits, frozenset(codes)) for credits, codes in result)
+        with self._lock:
+            self._check_graph(graph)
+            self._store(key, frozen)
+            if self._db is not None:
+                encoded = json.dumps([[credits, sorted(codes)] for credits, codes in frozen])
+                self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                                 (self._graph_digest(graph), _encode_key(key), encoded))
+                self._uncommitted += 1
+                if self._uncommitted >= self.commit_every:
+                    self._db.commit()
+                    self._uncommitted = 0
+
+    def flush(self) -> None:
+        """Commit the results saved to the on-disk tier since the last commit, if there is an on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the counters of this cache, and the number of results and estimated bytes in memory, for
+        monitoring."""
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'entries': len(self._results), 'bytes': self._num_bytes}
+
+    def clear(self) -> None:
+        """Remove every result from memory and from the on-disk tier."""
+        with self._lock:
+            self._results.clear()
+            self._num_bytes = 0
+            if self._db is not None:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
+                self._uncommitted = 0
+
+    def close(self) -> None:
+        """Commit and close the on-disk tier, if there is one. Results are only kept in memory afterwards."""
+        with self._lock:
+            if self._finalizer is not None:
+                self._finalizer()
+                self._db, self._finalizer = None, None
+
+    def _check_graph(self, graph: Any) -> None:
+        """Drop every result in memory if it was found in a graph other than graph or an earlier version of it.
+        The caller holds _lock."""
+        if self._graph is None or self._graph() is not graph or self._version != graph._version:
+            self._results.clear()
+            self._num_bytes = 0
+            self._graph, self._version, self._digest = weakref.ref(graph), graph._version, None
+
+    def _graph_digest(self, graph: Any) -> str:
+        """Return the digest of the current version of graph, finding it only once per version. The caller holds
+        _lock."""
+        if self._digest is None:
+            # graph_snapshot imports graph_course, which imports this module
+            from graph_snapshot import graph_digest
+
+            self._digest = graph_digest(graph)
+        return self._digest
+
+    def _store(self, key: QueryKey, result: _Result) -> None:
+        """Store result in memory as the most recently used result, evicting the least recently used results
+        until this cache is within its bounds again. The caller holds _lock."""
+        if key in self._results:
+            self._num_bytes -= self._results.pop(key)[1]
+        size = _estimate_size(key, result)
+        self._results[key] = (result, size)
+        self._num_bytes += size
+        while len(self._results) > 1 and (len(self._results) > self.max_entries or self._num_bytes > self.max_bytes):
+            self._num_bytes -= self._results.popitem(last=False)[1][1]
+            self.evictions += 1
+
+
+def _normalize_key(key: QueryKey) -> QueryKey:
+    """Return key with its credit limit as a float, so that queries with equal credit limits of different types
+    (such as 2 and 2.0) are the same query.
+
+    >>> _normalize_key(('CSC263H1', frozenset(), frozenset(), 2)) == ('CSC263H1', frozenset(), frozenset(), 2.0)
+    True
+    """
+    course_code, completed, exclude, credit = key
+    return course_code, completed, exclude, float(credit)
+
+
+def _encode_key(key: QueryKey) -> str:
+    """Return key as a string that is the same for equal queries.
+
+    >>> _encode_key(('CSC263H1', frozenset({'MAT137Y1', 'CSC111H1'}), frozenset(), 2.0))
+    '["CSC263H1", ["CSC111H1", "MAT137Y1"], [], 2.0]'
+    >>> _encode_key(('CSC263H1', frozenset({'MAT137Y1', 'CSC111H1'}), frozenset(), 2))
+    '["CSC263H1", ["CSC111H1", "MAT137Y1"], [], 2.0]'
+    """
+    course_code, completed, exclude, credit = key
+    return json.dumps([course_code, sorted(completed), sorted(exclude), float(credit)])
+
+
+def _close_db(db: sqlite3.Connection, lock: threading.RLock) -> None:
+    """Commit and close the connection db to the on-disk tier of a cache, while holding the lock of the cache."""
+    with lock:
+        db.commit()
+        db.close()
+
+
+def _unfreeze(result: _Result) -> list:
+    """Return a stored result in the format Graph.get_prerequisites returns it, as new sets the caller can
+    change without changing the cache."""
+    return [(credits, set(codes)) for credits, codes in result]
+
+
+def _estimate_size(key: QueryKey, result: _Result) -> int:
+    """Return an estimate of the number of bytes taken up by a query and its result, counting the containers but
+    not the course code strings, which are shared with the graph."""
+    size = sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(key[2]) + sys.getsizeof(result)
+    for pathway in result:
+        size += sys.getsizeof(pathway) + sys.getsizeof(pathway[1])
+    return size
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'json', 'sqlite3', 'sys', 'threading', 'weakref', 'collections', 'OrderedDict',
+                          'graph_snapshot'],
+        # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,281 @@
+"""CSC111 - Project 2: U of T Visual Course Map
+
+Module Description:
+This module contains the output sinks the web scraper writes courses to. A sink writes each row to its file as soon
+as it is given, so the memory used does not grow with the number of courses scraped.
+
+The rows can be written as an Excel file (with openpyxl's write-only workbook, which streams rows to disk), a CSV
+file, a JSON Lines file (one JSON object per course), or a Parquet file (written in row groups of a fixed number of
+rows, and only available if pyarrow is installed).
+
+The rows are written to a temporary file next to the output file, which only replaces the output file once every
+row has been written, so a scrape or cleaning job that fails partway leaves the previous output file as it was.
+
+Creators:
+- Chris Cao
+- Ryan Fu
+- Vennise Ho
+"""
+from __future__ import annotations
+import csv
+import json
+import os
+from typing import Any, Iterable, Optional
+
+FORMATS = ('xlsx', 'csv', 'jsonl', 'parquet')
+
+
+class RowWriter:
+    """An output file that rows are written to one at a time.
+    This is an abstract class. Only subclasses should be instantiated.
+
+    Instance Attributes:
+        - path: the file the rows are written to
+        - columns: the names of the columns, in the order they are written
+        - num_rows: the number of rows written so far
+
+    Representation Invariants:
+        - len(self.columns) > 0
+    """
+    path: str
+    columns: list[str]
+    num_rows: int
+    # Private Instance Attributes:
+    #   - _temp_path:
+    #       The file the rows are actually written to, which replaces path when the writer is closed.
+    _temp_path: str
+
+    def __init__(self, path: str, columns: list[str]) -> None:
+        self.path = path
+        self.columns = columns
+        self.num_rows = 0
+        self._temp_path = path + '.tmp'
+
+    def write(self, row: dict[str, Any]) -> None:
+        """Write one row, given as a dict from column name to value. Columns missing from row are left empty.
+        """
+        raise NotImplementedError
+
+    def write_rows(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Write every row in rows, in order."""
+        for row in rows:
+            self.write(row)
+
+    def close(self) -> None:
+        """Finish writing the file, and replace path with it. No rows can be written afterwards."""
+        self._finish()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        """Stop writing the file and delete it, leaving path as it was before this writer was opened. No rows can
+        be written afterwards."""
+        try:
+            self._finish()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+    def _finish(self) -> None:
+        """Finish writing the temporary file."""
+        raise NotImplementedError
+
+    def __enter__(self) -> RowWriter:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Close this writer if the with block finished, and abort it if the block raised an exception.
+
+        >>> import tempfile
+        >>> directory = tempfile.TemporaryDirectory()
+        >>> path = os.path.join(directory.name, 'output.csv')
+        >>> with open_writer(path, ['Course Name']) as writer:
+        ...     writer.write_rows([{'Course Name': 'CSC110Y1'}, {'Course Name': 'CSC111H1'}])
+        >>> with open_writer(path, ['Course Name']) as writer:
+        ...     writer.write({'Course Name': 'CSC148H1'})
+        ...     raise RuntimeError('the scrape failed')
+        Traceback (most recent call last):
+        RuntimeError: the scrape failed
+        >>> with open(path, encoding='utf-8') as file:
+        ...     file.read().split()
+        ['Course', 'Name', 'CSC110Y1', 'CSC111H1']
+        >>> os.listdir(directory.name)
+        ['output.csv']
+        >>> directory.cleanup()
+        """
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CsvWriter(RowWriter):
+    """Writes rows to a CSV file with a header row."""
+    # Private Instance Attributes:
+    #   - _file:
+    #       The open output file.
+    #   - _writer:
+    #       Writes rows to _file.
+    _file: Any
+    _writer: csv.DictWriter
+
+    def __init__(self, path: str, columns: list[str]) -> None:
+        RowWriter.__init__(self, path, columns)
+        self._file = open(self._temp_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, columns, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, row: dict[str, Any]) -> None:
+        """Write one row (see RowWriter.write)."""
+        self._writer.writerow(row)
+        self.num_rows += 1
+
+    def _finish(self) -> None:
+        """Finish writing the temporary file (see RowWriter._finish)."""
+        self._file.close()
+
+
+class JsonlWriter(RowWriter):
+    """Writes rows to a JSON Lines file, as one JSON object per line."""
+    # Private Instance Attributes:
+    #   - _file:
+    #       The open output file.
+    _file: Any
+
+    def __init__(self, path: str, columns: list[str]) -> None:
+        RowWriter.__init__(self, path, columns)
+        self._file = open(self._temp_path, 'w', encoding='utf-8')
+
+    def write(self, row: dict[str, Any]) -> None:
+        """Write one row (see RowWriter.write)."""
+        self._file.write(json.dumps({column: row.get(column, '') for column in self.columns}) + '\n')
+        self.num_rows += 1
+
+    def _finish(self) -> None:
+        """Finish writing the temporary file (see RowWriter._finish)."""
+        self._file.close()
+
+
+class XlsxWriter(RowWriter):
+    """Writes rows to an Excel file with a header row, in the layout DataFrame.to_excel(index=False) gives.
+
+    The workbook is opened in openpyxl's write-only mode, which writes each row to a temporary file straight away
+    instead of keeping every cell in memory, and puts the workbook together when it is closed.
+    """
+    # Private Instance Attributes:
+    #   - _workbook:
+    #       The write-only workbook.
+    #   - _sheet:
+    #       The only sheet of _workbook.
+    _workbook: Any
+    _sheet: Any
+
+    def __init__(self, path: str, columns: list[str]) -> None:
+        # openpyxl is slow to import, so it is only imported when an Excel file is written
+        import openpyxl
+
+        RowWriter.__init__(self, path, columns)
+        self._workbook = openpyxl.Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self._sheet.append(columns)
+
+    def write(self, row: dict[str, Any]) -> None:
+        """Write one row (see RowWriter.write). Empty strings are written as empty cells, like to_excel does."""
+        self._sheet.append([None if row.get(column, '') == '' else row[column] for column in self.columns])
+        self.num_rows += 1
+
+    def _finish(self) -> None:
+        """Finish writing the temporary file (see RowWriter._finish)."""
+        self._workbook.save(self._temp_path)
+
+
+class ParquetWriter(RowWriter):
+    """Writes rows to a Parquet file, every column as strings.
+    The rows are kept until there are batch_size of them, and then written to the file as one row group.
+
+    Raises ImportError if pyarrow is not installed.
+    """
+    batch_size: int
+    # Private Instance Attributes:
+    #   - _batch:
+    #       The rows not written to the file yet.
+    #   - _schema:
+    #       The pyarrow schema of the file.
+    #   - _writer:
+    #       The pyarrow Parquet writer.
+    #   - _pyarrow:
+    #       The pyarrow module.
+    _batch: list[dict[str, Any]]
+    _schema: Any
+    _writer: Any
+    _pyarrow: Any
+
+    def __init__(self, path: str, columns: list[str], batch_size: int = 1000) -> None:
+        # pyarrow is an optional dependency, only needed to write Parquet files
+        import pyarrow
+        import pyarrow.parquet
+
+        RowWriter.__init__(self, path, columns)
+        self.batch_size = batch_size
+        self._batch = []
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([(column, pyarrow.string()) for column in columns])
+        self._writer = pyarrow.parquet.ParquetWriter(self._temp_path, self._schema)
+
+    def write(self, row: dict[str, Any]) -> None:
+        """Write one row (see RowWriter.write)."""
+        self._batch.append(row)
+        self.num_rows += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Write the rows in _batch to the file as one row group."""
+        if self._batch:
+            data = {column: [str(row.get(column, '')) for row in self._batch] for column in self.columns}
+            self._writer.write_table(self._pyarrow.table(data, schema=self._schema))
+            self._batch = []
+
+    def _finish(self) -> None:
+        """Finish writing the temporary file (see RowWriter._finish)."""
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path: str, columns: list[str], fmt: Optional[str] = None) -> RowWriter:
+    """Return a RowWriter that writes rows with the given columns to path, in the format fmt. If fmt is None, the
+    format is the extension of path.
+    Raises ValueError if the format is not one of FORMATS.
+
+    >>> open_writer('courses.txt', ['Course Name'])
+    Traceback (most recent call last):
+    ValueError: unknown output format 'txt' (expected one of xlsx, csv, jsonl, parquet)
+    """
+    if fmt is None:
+        fmt = os.path.splitext(path)[1].lstrip('.')
+    if fmt == 'xlsx':
+        return XlsxWriter(path, columns)
+    elif fmt == 'csv':
+        return CsvWriter(path, columns)
+    elif fmt == 'jsonl':
+        return JsonlWriter(path, columns)
+    elif fmt == 'parquet':
+        return ParquetWriter(path, columns)
+    else:
+        raise ValueError(f'unknown output format {fmt!r} (expected one of {", ".join(FORMATS)})')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['annotations', 'csv', 'json', 'os', 'openpyxl', 'pyarrow', 'pyarrow.parquet'],
+        # the names (strs) of imported modules
+        'allowed-io': ['CsvWriter.__init__', 'JsonlWriter.__init__'],
+        # the names (strs) of functions that call print/open/input
+        'max-line-length': 120,
+        'max-nested-blocks': 4
+    })
@@ -1,8 +1,16 @@
 """Web scraper for Art Sci Course Calendar"""
-from typing import Any, Union
-import pandas as pd
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Iterator, Optional, Union
 import requests
+import requests.adapters
 import bs4
+from row_writer import FORMATS, RowWriter, open_writer
 
 
 def name_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
@@ -50,23 +58,41 @@ def course_code_identifier(potential: str) -> bool:
     return True
 
 
+# a bracket, slash, comma or semicolon, or a run of any other characters up to whitespace
+_REQUISITE_TOKEN = re.compile(r"[()\[\]/,;]|[^\s()\[\]/,;]+")
+
+# the separator each separator token is written as
+_REQUISITE_SEPARATORS = {"(": "(", ")": ")", "[": "(", "]": ")", "/": "/", ",": ",", ";": ","}
+
+
+def clean_requisites(text: str, label: str) -> str:
+    """Returns the course codes in the text of a requisite field (the prerequisites, corequisites or exclusions
+    of a course, with the given label), with the brackets, slashes and commas between them, separated by spaces.
+    Square brackets are written as round brackets and semicolons as commas.
+
+    >>> clean_requisites('Prerequisite: CSC110Y1 (minimum grade 70%)/ [CSC108H1; CSC148H1].', 'Prerequisite: ')
+    'CSC110Y1 / ( CSC108H1 , CSC148H1 )'
+    """
+    # a minimum grade such as "(minimum grade 70%)" becomes "{70}", which is dropped with every other word that is
+    # not a course code
+    text = (text.replace(label, "").replace("(minimum ", "{").replace("grade ", "").replace("%)", "}")
+            .replace(".", ""))
+    tokens = []
+    for token in _REQUISITE_TOKEN.findall(text):
+        if token in _REQUISITE_SEPARATORS:
+            tokens.append(_REQUISITE_SEPARATORS[token])
+        elif course_code_identifier(token):
+            tokens.append(token)
+    return " ".join(tokens)
+
+
 def prerequisite_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
     """
     Given an BeautifulSoup Element, appends a list of prereq codes to the collection.
     """
     value = html_value.find("span", class_="views-field views-field-field-prerequisite")
     if value is not None:
-        clean_text = value.get_text()
-        clean_text_remove_tag = clean_text.replace("Prerequisite: ", "")
-        clean_text_min_grade_clean = (clean_text_remove_tag.replace("(minimum ", "{").replace("grade ", "")
-                                      .replace("%)", "}")).replace(".", "")
-        clean_text_separation = ((clean_text_min_grade_clean.replace("/", " / ").replace(",", " , ")
-                                  .replace(";", " , ")).replace("(", " ( ").replace(")", " ) ")
-                                 .replace("[", " ( ").replace("]", " ) ").split())
-        clean_text_separation = [item for item in clean_text_separation if item in "()/,"
-                                 or course_code_identifier(item)]
-
-        collection["Prerequisites"] = " ".join(clean_text_separation)
+        collection["Prerequisites"] = clean_requisites(value.get_text(), "Prerequisite: ")
 
 
 def corequisite_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
@@ -75,16 +101,7 @@ def corequisite_finder(collection: dict[str, Any], html_value: bs4.PageElement)
     """
     value = html_value.find("span", class_="views-field views-field-field-corequisite")
     if value is not None:
-        clean_text = value.get_text()
-        clean_text_remove_tag = clean_text.replace("Corequisite: ", "")
-        clean_text_min_grade_clean = (clean_text_remove_tag.replace("(minimum ", "{").replace("grade ", "")
-                                      .replace("%)", "}")).replace(".", "")
-        clean_text_separation = ((clean_text_min_grade_clean.replace("/", " / ").replace(",", " , ")
-                                  .replace(";", " , ")).replace("(", " ( ").replace(")", " ) ")
-                                 .replace("[", " ( ").replace("]", " ) ").split())
-        clean_text_separation = [item for item in clean_text_separation if item in "()/,"
-                                 or course_code_identifier(item)]
-        collection["Corequisites"] = " ".join(clean_text_separation)
+        collection["Corequisites"] = clean_requisites(value.get_text(), "Corequisite: ")
 
 
 def exclusion_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
@@ -93,16 +110,7 @@ def exclusion_finder(collection: dict[str, Any], html_value: bs4.PageElement) ->
     """
     value = html_value.find("span", class_="views-field views-field-field-exclusion")
     if value is not None:
-        clean_text = value.get_text()
-        clean_text_remove_tag = clean_text.replace("Exclusion: ", "")
-        clean_text_min_grade_clean = (clean_text_remove_tag.replace("(minimum ", "{").replace("grade ", "")
-                                      .replace("%)", "}")).replace(".", "")
-        clean_text_separation = ((clean_text_min_grade_clean.replace("/", " / ").replace(",", " , ")
-                                  .replace(";", " , ")).replace("(", " ( ").replace(")", " ) ")
-                                 .replace("[", " ( ").replace("]", " ) ").split())
-        clean_text_separation = [item for item in clean_text_separation if item in "()/,"
-                                 or course_code_identifier(item)]
-        collection["Exclusion"] = " ".join(clean_text_separation)
+        collection["Exclusion"] = clean_requisites(value.get_text(), "Exclusion: ")
 
 
 def distribution_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
@@ -111,10 +119,17 @@ def distribution_finder(collection: dict[str, Any], html_value: bs4.PageElement)
     """
     value = html_value.find("span", class_="views-field views-field-field-distribution-requirements")
     if value is not None:
-        clean_text = value.get_text()
-        clean_text_remove_tag = (clean_text.replace(" ", "").replace("Distribution", "")
-                                 .replace("Requirements", "").replace(":", "")).replace(".", "")
-        collection["Distribution Requirements"] = clean_text_remove_tag
+        collection["Distribution Requirements"] = clean_distribution(value.get_text())
+
+
+def clean_distribution(text: str) -> str:
+    """Returns the distribution requirement in the text of a distribution requirements field.
+
+    >>> clean_distribution('Distribution Requirements: Science.')
+    'Science'
+    """
+    return (text.replace(" ", "").replace("Distribution", "").replace("Requirements", "").replace(":", "")
+            .replace(".", ""))
 
 
 def breadth_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> None:
@@ -123,12 +138,35 @@ def breadth_finder(collection: dict[str, Any], html_value: bs4.PageElement) -> N
     """
     value = html_value.find("span", class_="views-field views-field-field-breadth-requirements")
     if value is not None:
-        clean_text = value.get_text().replace("(", "").replace(")", "").replace(".", "").split()[-1]
-        collection["Breadth Requirements"] = clean_text
+        collection["Breadth Requirements"] = clean_breadth(value.get_text())
+
+
+def clean_breadth(text: str) -> str:
+    """Returns the breadth category number in the text of a breadth requirements field.
+
+    >>> clean_breadth('Breadth Requirements: Living Things and Their Environment (4)')
+    '4'
+    """
+    return text.replace("(", "").replace(")", "").replace(".", "").split()[-1]
 
 
 base_URL = "https://artsci.calendar.utoronto.ca/search-courses?page="
 
+NUM_PAGES = 170
+
+COLUMNS = ["Course Name", "Course Description", "Hours", "Prerequisites", "Corequisites",
+           "Distribution Requirements", "Breadth Requirements", "Exclusion"]
+
+# the columns of a delta file: whether the course was 'added', 'changed' or 'removed', then the course's columns
+DELTA_COLUMNS = ["Change"] + COLUMNS
+
+USER_AGENT = "UofT-Visual-Course-Map/1.0 (course calendar scraper)"
+
+PAGE_CACHE_FILE = ".page_cache/pages.json"
+
+# Increase whenever the courses parsed from a page would change, so older cached pages are parsed again.
+PAGE_CACHE_VERSION = 1
+
 
 def course_collector(element: bs4.PageElement, collector: dict[str, str]) -> Union[dict[str, Any], None]:
     """given a page element, returns all contained elements within the course"""
@@ -142,41 +180,491 @@ def course_collector(element: bs4.PageElement, collector: dict[str, str]) -> Uni
     exclusion_finder(collector, element)
     distribution_finder(collector, element)
     breadth_finder(collector, element)
-    names.append(collector)
     return collector
 
 
+# the column of each field of a course that is in a span, by the class of the span
+_SPAN_FIELDS = {"views-field views-field-field-hours": "Hours",
+                "views-field views-field-field-prerequisite": "Prerequisites",
+                "views-field views-field-field-corequisite": "Corequisites",
+                "views-field views-field-field-exclusion": "Exclusion",
+                "views-field views-field-field-distribution-requirements": "Distribution Requirements",
+                "views-field views-field-field-breadth-requirements": "Breadth Requirements"}
+
+# the label at the start of each requisite field
+_REQUISITE_LABELS = {"Prerequisites": "Prerequisite: ", "Corequisites": "Corequisite: ", "Exclusion": "Exclusion: "}
+
+
+class HtmlBackend:
+    """An HTML parser the courses on a calendar page can be extracted with (see parse_page).
+    This is an abstract class. Only subclasses should be instantiated.
+
+    Elements are given as (tag name, class, element) tuples, where the class is the element's class attribute
+    with its classes separated by single spaces.
+    """
+
+    def rows(self, content: bytes) -> list[Any]:
+        """Returns the course elements (div.views-row) of a calendar page, in order."""
+        raise NotImplementedError
+
+    def descendants(self, element: Any) -> Iterator[tuple[str, str, Any]]:
+        """Yields every element inside element (but not element itself), in document order."""
+        raise NotImplementedError
+
+    def text(self, element: Any) -> str:
+        """Returns all of the text inside element."""
+        raise NotImplementedError
+
+    def find(self, element: Any, tag: str, class_: Optional[str] = None) -> Any:
+        """Returns the first element inside element with the given tag name that has class_ as one of its
+        classes (or as its whole class attribute), or None if there is none. If class_ is None, any class matches.
+        """
+        for name, classes, descendant in self.descendants(element):
+            if name == tag and (class_ is None or _has_class(classes, class_)):
+                return descendant
+        return None
+
+
+class SoupBackend(HtmlBackend):
+    """Extracts courses with BeautifulSoup and Python's built-in html.parser (slow, but always available)."""
+
+    def rows(self, content: bytes) -> list[Any]:
+        """Returns the course elements of a calendar page (see HtmlBackend.rows)."""
+        return bs4.BeautifulSoup(content, "html.parser").find_all("div", class_="views-row")
+
+    def descendants(self, element: Any) -> Iterator[tuple[str, str, Any]]:
+        """Yields every element inside element (see HtmlBackend.descendants)."""
+        for descendant in element.descendants:
+            if isinstance(descendant, bs4.Tag):
+                yield descendant.name, " ".join(descendant.get("class", ())), descendant
+
+    def text(self, element: Any) -> str:
+        """Returns all of the text inside element (see HtmlBackend.text)."""
+        return element.get_text()
+
+
+class LxmlBackend(HtmlBackend):
+    """Extracts courses with lxml's HTML parser. Raises ImportError if lxml is not installed."""
+    # Private Instance Attributes:
+    #   - _html:
+    #       The lxml.html module.
+    _html: Any
+
+    def __init__(self) -> None:
+        # lxml is an optional dependency, only needed by this backend
+        import lxml.html
+
+        self._html = lxml.html
+
+    def rows(self, content: bytes) -> list[Any]:
+        """Returns the course elements of a calendar page (see HtmlBackend.rows)."""
+        return [div for div in self._html.document_fromstring(content).iter("div")
+                if "views-row" in div.get("class", "").split()]
+
+    def descendants(self, element: Any) -> Iterator[tuple[str, str, Any]]:
+        """Yields every element inside element (see HtmlBackend.descendants)."""
+        for descendant in element.iterdescendants():
+            # comments and processing instructions have a function as their tag
+            if isinstance(descendant.tag, str):
+                yield descendant.tag, " ".join(descendant.get("class", "").split()), descendant
+
+    def text(self, element: Any) -> str:
+        """Returns all of the text inside element (see HtmlBackend.text)."""
+        return element.text_content()
+
+
+class SelectolaxBackend(HtmlBackend):
+    """Extracts courses with selectolax's lexbor HTML parser (the fastest backend). Raises ImportError if
+    selectolax is not installed."""
+    # Private Instance Attributes:
+    #   - _parser:
+    #       The selectolax LexborHTMLParser class.
+    _parser: Any
+
+    def __init__(self) -> None:
+        # selectolax is an optional dependency, only needed by this backend
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser = LexborHTMLParser
+
+    def rows(self, content: bytes) -> list[Any]:
+        """Returns the course elements of a calendar page (see HtmlBackend.rows)."""
+        return self._parser(content).css("div.views-row")
+
+    def descendants(self, element: Any) -> Iterator[tuple[str, str, Any]]:
+        """Yields every element inside element (see HtmlBackend.descendants)."""
+        nodes = element.traverse()
+        next(nodes)     # traverse starts with element itself
+        for node in nodes:
+            if not node.tag.startswith("-"):    # text and comment nodes are named -text and -comment
+                yield node.tag, " ".join((node.attributes.get("class") or "").split()), node
+
+    def text(self, element: Any) -> str:
+        """Returns all of the text inside element (see HtmlBackend.text)."""
+        return element.text(deep=True)
+
+
+# the backends parse_page can use, by name
+HTML_BACKENDS = {"html.parser": SoupBackend, "lxml": LxmlBackend, "selectolax": SelectolaxBackend}
+
+
+def _has_class(classes: str, class_: str) -> bool:
+    """Returns whether class_ is one of the space separated classes, or all of them, like BeautifulSoup's class_
+    argument."""
+    return classes == class_ or class_ in classes.split()
+
+
+def extract_course(backend: HtmlBackend, element: Any) -> dict[str, Any]:
+    """Returns the collector of the course element, with the same fields the *_finder functions would find (see
+    course_collector). Empty fields are "".
+
+    Instead of searching the element once per field, every element inside it is looked at once, and the
+    first element found for each field is used.
+    """
+    collector = dict.fromkeys(COLUMNS, "")
+    found = set()
+    for tag, classes, descendant in backend.descendants(element):
+        if tag == "span" and classes in _SPAN_FIELDS and _SPAN_FIELDS[classes] not in found:
+            column = _SPAN_FIELDS[classes]
+            found.add(column)
+            if column == "Hours":
+                collector[column] = backend.text(backend.find(descendant, "span", "field-content")).strip()
+            elif column in _REQUISITE_LABELS:
+                collector[column] = clean_requisites(backend.text(descendant), _REQUISITE_LABELS[column])
+            elif column == "Distribution Requirements":
+                collector[column] = clean_distribution(backend.text(descendant))
+            else:
+                collector[column] = clean_breadth(backend.text(descendant))
+        elif tag == "h3" and "Course Name" not in found and _has_class(classes, "js-views-accordion-group-header"):
+            found.add("Course Name")
+            collector["Course Name"] = backend.text(backend.find(descendant, "div")).strip().split()[0]
+        elif tag == "div" and "Course Description" not in found and _has_class(classes, "field-content"):
+            found.add("Course Description")
+            collector["Course Description"] = backend.text(backend.find(descendant, "p")).strip()
+    return collector
+
+
+def parse_page(content: bytes, backend: str = "html.parser") -> list[dict[str, Any]]:
+    """Returns the courses on one page of the calendar, in order, as collectors (see course_collector), parsing
+    the page with the named backend (see HTML_BACKENDS). Every backend gives the same courses.
+    Elements that are not a course with a valid course code are skipped.
+
+    Raises ImportError if the backend's parser is not installed.
+    Preconditions:
+        - backend in HTML_BACKENDS
+    """
+    html_backend = HTML_BACKENDS[backend]()
+    courses = []
+    for element in html_backend.rows(content):
+        collector = extract_course(html_backend, element)
+        if collector["Course Name"] != "" and course_code_identifier(collector["Course Name"]):
+            courses.append(collector)
+    return courses
+
+
+class RateLimiter:
+    """Spaces out the requests made by any number of threads so that at most requests_per_second start each
+    second, to be polite to the server.
+
+    Instance Attributes:
+        - interval: the minimum number of seconds between the start of two requests
+    """
+    interval: float
+    # Private Instance Attributes:
+    #   - _next_time:
+    #       The earliest time (by time.monotonic) the next request may start.
+    #   - _lock:
+    #       Guards _next_time.
+    _next_time: float
+    _lock: threading.Lock
+
+    def __init__(self, requests_per_second: Optional[float]) -> None:
+        """Initialize a rate limiter. If requests_per_second is None, requests are not limited."""
+        self.interval = 0.0 if requests_per_second is None else 1 / requests_per_second
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Wait until the calling thread may start a request."""
+        with self._lock:
+            start_time = max(self._next_time, time.monotonic())
+            self._next_time = start_time + self.interval
+        delay = start_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Returns a session that keeps up to pool_size connections to each host open, so consecutive requests from the
+    crawler's threads reuse connections instead of opening a new one every time."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def fetch_page(session: requests.Session, url: str, limiter: RateLimiter, retries: int = 3,
+               backoff: float = 1.0, timeout: float = 30.0) -> bytes:
+    """Returns the content of the page at url (see fetch_response)."""
+    return fetch_response(session, url, limiter, retries, backoff, timeout).content
+
+
+def fetch_response(session: requests.Session, url: str, limiter: RateLimiter, retries: int = 3,
+                   backoff: float = 1.0, timeout: float = 30.0,
+                   headers: Optional[dict[str, str]] = None) -> requests.Response:
+    """Returns the response to a GET request for url with the given extra headers.
+
+    A request that fails to connect, times out, or gets a 429 or 5xx response is tried again up to retries more
+    times, waiting backoff, 2 * backoff, 4 * backoff, ... seconds before each retry. Every attempt waits for
+    limiter first. Raises the error of the last attempt if every attempt fails, and raises requests.HTTPError
+    straight away for any other error response.
+    """
+    attempt = 0
+    while True:
+        limiter.wait()
+        try:
+            response = session.get(url, timeout=timeout, headers=headers)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if (response.status_code != 429 and response.status_code < 500) or attempt == retries:
+                response.raise_for_status()
+                return response
+        time.sleep(backoff * 2 ** attempt)
+        attempt += 1
+
+
+def crawl(urls: list[str], concurrency: int = 8, requests_per_second: Optional[float] = 10.0, retries: int = 3,
+          backoff: float = 1.0,
+          headers: Optional[list[dict[str, str]]] = None) -> Iterator[tuple[int, requests.Response]]:
+    """Fetches every url with a pool of concurrency threads sharing one connection pool and rate limiter (see
+    fetch_response), yielding (index in urls, response) for each page as soon as it has been fetched.
+    If headers is given, headers[i] are the extra headers of the request for urls[i].
+
+    The pages are fetched in the background while the caller works on the pages already yielded, so parsing one
+    page overlaps with fetching the next ones.
+    Preconditions:
+        - concurrency >= 1
+        - requests_per_second is None or requests_per_second > 0
+        - headers is None or len(headers) == len(urls)
+    """
+    limiter = RateLimiter(requests_per_second)
+    with make_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch_response, session, url, limiter, retries, backoff,
+                                   headers=None if headers is None else headers[i]): i
+                   for i, url in enumerate(urls)}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def scrape_calendar(url: str = base_URL, num_pages: int = NUM_PAGES, concurrency: int = 8,
+                    requests_per_second: Optional[float] = 10.0, retries: int = 3,
+                    backoff: float = 1.0, backend: str = "html.parser") -> list[dict[str, Any]]:
+    """Returns every course on pages 0 to num_pages - 1 of the calendar at url, in the order they are listed.
+    The pages are fetched in parallel (see crawl) and each page is parsed with the named backend (see parse_page)
+    as soon as it arrives.
+    """
+    pages = [[] for _ in range(num_pages)]
+    for i, response in crawl([url + str(i) for i in range(num_pages)], concurrency, requests_per_second, retries,
+                             backoff):
+        pages[i] = parse_page(response.content, backend)
+    return [course for page in pages for course in page]
+
+
+def scrape_to(writer: RowWriter, url: str = base_URL, num_pages: int = NUM_PAGES, concurrency: int = 8,
+              requests_per_second: Optional[float] = 10.0, retries: int = 3, backoff: float = 1.0,
+              backend: str = "html.parser") -> int:
+    """Scrapes pages 0 to num_pages - 1 of the calendar at url like scrape_calendar, but writes each course to
+    writer as soon as it can instead of returning them, and returns the number of courses written.
+
+    The courses are written in the order they are listed, so a page that arrives before the pages listed ahead of
+    it is held until they have been written. Only those pages are kept in memory, never the whole calendar.
+    """
+    waiting = {}
+    next_page = 0
+    for i, response in crawl([url + str(i) for i in range(num_pages)], concurrency, requests_per_second, retries,
+                             backoff):
+        waiting[i] = parse_page(response.content, backend)
+        while next_page in waiting:
+            writer.write_rows(waiting.pop(next_page))
+            next_page += 1
+    return writer.num_rows
+
+
+class PageCache:
+    """The pages of the calendar fetched by earlier scrapes, saved in a JSON file so a later scrape only has to
+    download and parse the pages that changed.
+
+    For each page URL, the cache keeps the ETag and Last-Modified validators the server sent with the page (used
+    to make conditional requests), a sha256 hash of its content (to notice an unchanged page the server sent in
+    full anyway) and the courses parsed from it.
+
+    Instance Attributes:
+        - path: the file the cache is saved in
+        - pages: maps each page URL to its 'etag', 'last_modified', 'sha256' and 'courses'
+    """
+    path: str
+    pages: dict[str, dict[str, Any]]
+
+    def __init__(self, path: str) -> None:
+        """Load the cache saved at path, or start an empty cache if there is no usable cache there."""
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as file:
+                saved = json.load(file)
+            self.pages = saved['pages'] if saved.get('version') == PAGE_CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.pages = {}
+
+    def request_headers(self, url: str) -> dict[str, str]:
+        """Returns the headers that make a request for url conditional on the page having changed since it was
+        cached."""
+        page = self.pages.get(url, {})
+        headers = {}
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+        return headers
+
+    def save(self) -> None:
+        """Save the cache to its file, replacing the file atomically."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': PAGE_CACHE_VERSION, 'pages': self.pages}, file)
+        os.replace(temp_path, self.path)
+
+
+class CalendarDelta:
+    """The difference between the courses found by a scrape and the courses found by the scrape before it.
+
+    Instance Attributes:
+        - courses: every course found by the scrape, in the order they are listed (see scrape_calendar)
+        - added: the courses that were not found by the previous scrape
+        - changed: the courses whose information is different from the previous scrape
+        - removed: the codes of the courses found by the previous scrape that are no longer listed
+        - pages_fetched: the number of pages the server sent in full
+        - pages_parsed: the number of those pages whose content had changed, and so were parsed
+    """
+    courses: list[dict[str, Any]]
+    added: list[dict[str, Any]]
+    changed: list[dict[str, Any]]
+    removed: list[str]
+    pages_fetched: int
+    pages_parsed: int
+
+    def __init__(self, old_courses: list[dict[str, Any]], courses: list[dict[str, Any]]) -> None:
+        """Find the delta from old_courses to courses."""
+        old = {course["Course Name"]: course for course in old_courses}
+        new = {course["Course Name"]: course for course in courses}
+        self.courses = courses
+        self.added = [course for code, course in new.items() if code not in old]
+        self.changed = [course for code, course in new.items() if code in old and old[code] != course]
+        self.removed = [code for code in old if code not in new]
+        self.pages_fetched, self.pages_parsed = 0, 0
+
+    def is_empty(self) -> bool:
+        """Returns whether no course was added, changed or removed."""
+        return not self.added and not self.changed and not self.removed
+
+    def write_to(self, writer: RowWriter) -> int:
+        """Writes only the courses in this delta to writer, with the DELTA_COLUMNS: every added and changed course
+        in full, and a row with just the code of every removed course. Returns the number of rows written.
+        """
+        for change, courses in (("added", self.added), ("changed", self.changed)):
+            for course in courses:
+                writer.write({"Change": change, **course})
+        for code in self.removed:
+            writer.write({"Change": "removed", "Course Name": code})
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+
+def scrape_incremental(cache: PageCache, url: str = base_URL, num_pages: int = NUM_PAGES,
+                       concurrency: int = 8, requests_per_second: Optional[float] = 10.0, retries: int = 3,
+                       backoff: float = 1.0, backend: str = "html.parser") -> CalendarDelta:
+    """Scrapes pages 0 to num_pages - 1 of the calendar at url like scrape_calendar, but only downloads and parses
+    the pages that changed since the scrape that filled cache, and returns the delta from that scrape's courses.
+
+    Every page is requested conditionally on its cached ETag and Last-Modified, so the server answers an unchanged
+    page with 304 Not Modified and no body. A page sent in full whose content hashes the same as before is not
+    parsed again either. The pages in cache are updated, but cache is not saved: the caller saves it once the
+    delta is written, so a delta that is never written is found again by the next scrape.
+    """
+    urls = [url + str(i) for i in range(num_pages)]
+    old_courses = [course for page in cache.pages.values() for course in page['courses']]
+
+    pages_fetched = pages_parsed = 0
+    new_pages = {}
+    for i, response in crawl(urls, concurrency, requests_per_second, retries, backoff,
+                             [cache.request_headers(page_url) for page_url in urls]):
+        page = dict(cache.pages.get(urls[i], {'sha256': None, 'courses': []}))
+        if response.status_code != 304:
+            pages_fetched += 1
+            digest = hashlib.sha256(response.content).hexdigest()
+            if digest != page['sha256']:
+                pages_parsed += 1
+                page['sha256'], page['courses'] = digest, parse_page(response.content, backend)
+        page['etag'] = response.headers.get('ETag', page.get('etag'))
+        page['last_modified'] = response.headers.get('Last-Modified', page.get('last_modified'))
+        new_pages[urls[i]] = page
+
+    cache.pages = {page_url: new_pages[page_url] for page_url in urls}
+
+    delta = CalendarDelta(old_courses, [course for page_url in urls for course in cache.pages[page_url]['courses']])
+    delta.pages_fetched, delta.pages_parsed = pages_fetched, pages_parsed
+    return delta
+
+
 if __name__ == "__main__":
-    dataframe = pd.DataFrame(columns=["Course Name", "Course Description", "Hours", "Prerequisites", "Corequisites",
-                                      "Distribution Requirements", "Breadth Requirements", "Exclusion"])
-
-    for i in range(0, 170):
-        URL = base_URL + str(i)
-        page = requests.get(URL)
-        soup = bs4.BeautifulSoup(page.content, "html.parser")
-        class_elements = soup.find_all("div", class_="views-row")
-        names = []
-        for element in class_elements:
-            collector = {"Course Name": "",
-                         "Course Description": "",
-                         "Hours": "",
-                         "Prerequisites": "",
-                         "Corequisites": "",
-                         "Distribution Requirements": "",
-                         "Breadth Requirements": "",
-                         "Exclusion": ""}
-            course_collector(element, collector)
-            if collector["Course Name"] == "" or not course_code_identifier(collector["Course Name"]):
-                continue
-            dataframe.loc[len(dataframe.index)] = [collector["Course Name"],
-                                                   collector["Course Description"],
-                                                   collector["Hours"],
-                                                   collector["Prerequisites"],
-                                                   collector["Corequisites"],
-                                                   collector["Distribution Requirements"],
-                                                   collector["Breadth Requirements"],
-                                                   collector["Exclusion"]]
-    dataframe.to_excel('output.xlsx', index=False)
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--format', choices=FORMATS, default='xlsx',
+                        help='the format of the output file, output.<format> (default: xlsx)')
+    parser.add_argument('--parser', choices=list(HTML_BACKENDS), default='html.parser',
+                        help='the HTML parser to extract courses with (default: html.parser)')
+    parser.add_argument('--full', action='store_true',
+                        help='scrape every page again and rewrite output.<format>, instead of only scraping the pages '
+                             'that changed since the last scrape, which only rewrites output.<format> if a course '
+                             'changed and writes the changes it made to output.delta.<format>')
+    args = parser.parse_args()
+    output_file = 'output.' + args.format
+    # the changes the latest scrape made to output_file, or no file if it made none
+    delta_file = 'output.delta.' + args.format
+
+    if args.full:
+        with open_writer(output_file, COLUMNS) as output:
+            print(f"{scrape_to(output, backend=args.parser)} courses written to {output_file}")
+        if os.path.exists(delta_file):
+            os.remove(delta_file)
+    else:
+        page_cache = PageCache(PAGE_CACHE_FILE)
+        calendar_delta = scrape_incremental(page_cache, backend=args.parser)
+        print(f"{len(calendar_delta.added)} added, {len(calendar_delta.changed)} changed, "
+              f"{len(calendar_delta.removed)} removed ({calendar_delta.pages_parsed} pages parsed)")
+        first_scrape = not os.path.exists(output_file)
+        if first_scrape or calendar_delta.is_empty():
+            # the first scrape has nothing to be a delta from, and an empty delta must not leave the changes of an
+            # earlier scrape behind to be applied again
+            if os.path.exists(delta_file):
+                os.remove(delta_file)
+        else:
+            with open_writer(delta_file, DELTA_COLUMNS) as output:
+                print(f"{calendar_delta.write_to(output)} changes written to {delta_file}")
+        if first_scrape or not calendar_delta.is_empty():
+            with open_writer(output_file, COLUMNS) as output:
+                output.write_rows(calendar_delta.courses)
+            print(f"{len(calendar_delta.courses)} courses written to {output_file}")
+        # only saved now, so the changes are scraped again if writing them failed
+        page_cache.save()
 
     import doctest
 
@@ -185,8 +673,12 @@ if __name__ == "__main__":
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['pandas', 'graph_course'],  # the names (strs) of imported modules
-        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'extra-imports': ['graph_course', 'hashlib', 'json', 'os', 'threading', 'time',
+                          'concurrent.futures', 'requests.adapters', 'row_writer', 'argparse', 're',
+                          'lxml.html', 'selectolax.lexbor'],
+        # the names (strs) of imported modules
+        'allowed-io': ['PageCache.__init__', 'PageCache.save'],
+        # the names (strs) of functions that call print/open/input
         'max-line-length': 120,
         'max-nested-blocks': 4
     })